@@ -0,0 +1,60 @@
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import batch_risk_metrics as batch
+import risk_metrics
+
+
+def setup_db(path=':memory:'):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE InstrumentPrice (id INTEGER PRIMARY KEY, instrument_id INTEGER, price REAL, currency TEXT, as_of TEXT)"
+    )
+    rows = []
+    for instrument_id in (1, 2, 3):
+        for day in range(1, 21):
+            rows.append((instrument_id, 100 + instrument_id * ((day * 7) % 5 - 2), f'2025-01-{day:02d}T16:00:00Z'))
+    rows.append((1, 999.0, '2025-01-20T09:00:00Z'))
+    conn.executemany("INSERT INTO InstrumentPrice (instrument_id, price, as_of) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def test_instrument_jobs_keep_last_price_per_day():
+    conn = setup_db()
+    jobs = list(batch.instrument_jobs(conn, [1, 3]))
+    assert [j[0] for j in jobs] == ['1', '3']
+    assert len(jobs[0][2]) == 20
+    assert jobs[0][2][-1] == 100 + ((20 * 7) % 5 - 2)
+
+    trimmed = list(batch.instrument_jobs(conn, [1, 3], days=5))
+    assert [j[2] for j in trimmed] == [j[2][-6:] for j in jobs]
+    results = list(batch.run_batch(trimmed, days=5))
+    assert results == list(batch.run_batch(jobs, days=5))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch_matches_calculate_metrics(workers):
+    conn = setup_db()
+    jobs = list(batch.instrument_jobs(conn))
+    results = list(batch.run_batch(jobs, days=10, workers=workers, chunksize=2))
+    assert [r['id'] for r in results] == ['1', '2', '3']
+    prices = jobs[1][2][-11:]
+    expected = risk_metrics.calculate_metrics(batch.prices_to_returns(prices))
+    assert results[1]['observations'] == 10
+    assert results[1]['metrics'] == pytest.approx(expected)
+
+
+def test_main_streams_ndjson(tmp_path, capsys):
+    db = tmp_path / 'prices.sqlite'
+    setup_db(str(db)).close()
+    assert batch.main(['--db', str(db), '--workers', '1', '--period', '3M']) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)['id'] for line in lines] == ['1', '2', '3']
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from DragonShield.python_scripts import benchmark_analytics as bench
+
+
+def test_generate_portfolio_is_seeded():
+    positions, rates = bench.generate_portfolio(200, currencies=3, sectors=4, missing_price_share=0.5, seed=7)
+    again, _ = bench.generate_portfolio(200, currencies=3, sectors=4, missing_price_share=0.5, seed=7)
+    assert positions == again
+    assert {p["currency"] for p in positions} <= {"CHF", "USD", "EUR"}
+    assert set(rates) == {"USD", "EUR"}
+    assert len({p["sector"] for p in positions}) <= 4
+    missing = sum(p["current_price"] is None for p in positions)
+    assert 50 < missing < 150
+
+
+def test_compare_flags_regressions():
+    base = [{"function": "top_positions", "size": 10, "seconds": 1.0, "peak_bytes": 100}]
+    ok = [{"function": "top_positions", "size": 10, "seconds": 1.2, "peak_bytes": 100}]
+    slow = [{"function": "top_positions", "size": 10, "seconds": 1.3, "peak_bytes": 100}]
+    assert bench.compare(ok, base, 0.25) == []
+    assert len(bench.compare(slow, base, 0.25)) == 1
+
+    other = [dict(ok[0], params={"summation": "fixed"})]
+    with pytest.raises(ValueError):
+        bench.compare(other, base, 0.25)
+
+
+def test_main_saves_and_compares(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    assert bench.main(["--sizes", "50", "--repeat", "1", "--save-baseline", str(path)]) == 0
+    saved = json.loads(path.read_text())
+    assert {r["function"] for r in saved} == {
+        "total_asset_value", "top_positions", "currency_exposure", "risk_buckets", "stale_accounts"
+    }
+    for r in saved:
+        r["seconds"] = 0.0
+    path.write_text(json.dumps(saved))
+    assert bench.main(["--sizes", "50", "--repeat", "1", "--baseline", str(path)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+
+    # Runs with other parameters are not compared against this baseline.
+    assert bench.main(["--sizes", "50", "--repeat", "1", "--frame", "--baseline", str(path)]) == 2
+    assert bench.main(["--sizes", "50", "--repeat", "1", "--summation", "fixed", "--baseline", str(path)]) == 2
+    assert "Cannot compare" in capsys.readouterr().out
@@ -0,0 +1,247 @@
+import csv
+import io
+import json
+import sqlite3
+import sys
+import types
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+openpyxl_stub = types.ModuleType('openpyxl')
+cell_mod = types.ModuleType('cell')
+class Cell: ...
+class MergedCell: ...
+cell_mod.Cell = Cell
+cell_mod.MergedCell = MergedCell
+openpyxl_stub.cell = cell_mod
+sys.modules.setdefault('openpyxl', openpyxl_stub)
+sys.modules.setdefault('openpyxl.cell', openpyxl_stub.cell)
+
+import credit_suisse_parser as parser
+
+
+def setup_instruments(conn):
+    conn.executescript(
+        """
+        CREATE TABLE Instruments (instrument_id INTEGER PRIMARY KEY, isin TEXT, valor_nr TEXT);
+        INSERT INTO Instruments VALUES
+            (1, 'CH0038863350', '3.886.335'),
+            (2, 'us0378331005', NULL),
+            (3, 'CH0038863350', '3886335'),
+            (4, NULL, 908440);
+        """
+    )
+    conn.commit()
+
+
+def test_instrument_index_sanitised_lookups():
+    conn = sqlite3.connect(':memory:')
+    setup_instruments(conn)
+    index = parser.InstrumentIndex(conn)
+
+    assert index.find_by_valor('3886335') == 1
+    assert index.find_by_valor(' 908 440 ') == 4
+    assert index.find_by_isin('US 0378331005') == 2
+    assert index.find_by_isin('DE0000000000') is None
+    assert parser.lookup_instrument_id(conn, 'Nestle', '', 'ch0038863350', index) == (1, 'ISIN')
+    assert parser.lookup_instrument_id(None, 'X', '1', '', None) == (None, '')
+
+
+def test_instrument_index_first_match_wins_like_row_lookups():
+    conn = sqlite3.connect(':memory:')
+    setup_instruments(conn)
+    index = parser.InstrumentIndex(conn)
+
+    assert index.find_by_valor('3886335') == parser.find_instrument_id_by_valor(conn, '3886335') == 1
+    assert index.find_by_isin('CH0038863350') == parser.find_instrument_id_by_isin(conn, 'CH0038863350') == 1
+
+
+def test_instrument_index_rebuilds_after_other_connection_commits(tmp_path):
+    db = tmp_path / 'instruments.sqlite'
+    conn = sqlite3.connect(db)
+    setup_instruments(conn)
+    index = parser.InstrumentIndex(conn)
+    assert index.find_by_isin('GB0002374006') is None
+
+    other = sqlite3.connect(db)
+    other.execute("INSERT INTO Instruments VALUES (5, 'GB0002374006', '1234')")
+    other.commit()
+    other.close()
+
+    # Lookups never touch the database; the version is checked explicitly.
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert index.find_by_isin('GB0002374006') is None
+    assert statements == []
+    index.check_version()
+    assert index.find_by_isin('GB0002374006') == 5
+    assert index.find_by_valor('1234') == 5
+
+    # Commits through the index's own connection need refresh().
+    conn.execute("INSERT INTO Instruments VALUES (6, 'FR0000120271', NULL)")
+    conn.commit()
+    index.check_version()
+    assert index.find_by_isin('FR0000120271') is None
+    index.refresh()
+    assert index.find_by_isin('FR0000120271') == 6
+    conn.close()
+
+
+def test_statement_checks_shared_index_once(tmp_path):
+    db = tmp_path / 'instruments.sqlite'
+    conn = sqlite3.connect(db)
+    setup_instruments(conn)
+    index = parser.InstrumentIndex(conn)
+    other = sqlite3.connect(db)
+    other.execute("UPDATE Instruments SET valor_nr = NULL WHERE instrument_id = 4")
+    other.commit()
+    other.close()
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    data, _ = parser.parse_statement(write_statement(tmp_path / 'statement.csv'), instrument_index=index)
+    # One check per statement plus the rebuild it triggers, none per row.
+    assert sum('data_version' in sql for sql in statements) == 2
+    # Apple is now found by ISIN instead of the removed valor.
+    assert [r.get('instrument_id') for r in data['records'][:2]] == [2, 1]
+    conn.close()
+
+
+def test_row_decoder_resolves_layout_once():
+    headers = ['Anlagekategorie', 'Whrg.', 'Anzahl / Nominal', 'Beschreibung', 'Whrg.', 'Kurs', 'Valor', 'ISIN']
+    decode = parser.compile_row_decoder(headers)
+
+    row = decode(('Aktien & ähnliche', 'EUR', "1'000", 'Nestle', 'CHF', '12.5', 3886335, ' CH0038863350 '))
+    assert row['nominal_currency'] == 'EUR'
+    assert row['price_currency'] == 'CHF'
+    assert row['quantity'] == 1000.0
+    assert row['current_price'] == 12.5
+    assert row['valor'] == row['lookup_valor'] == '3886335'
+    assert row['isin'] == row['lookup_isin'] == 'CH0038863350'
+    # Columns missing from the header decode to "" or None.
+    assert row['symbol'] == '' and row['sector'] == ''
+    assert row['cost_price'] is None and row['maturity_date'] is None
+
+    # Short rows are padded with None.
+    short = decode(('Aktien & ähnliche',))
+    assert short['beschreibung'] == '' and short['nominal_currency'] is None and short['quantity'] is None
+
+
+def test_row_decoder_fallback_columns():
+    decode = parser.compile_row_decoder(['Anlagekategorie', 'Beschreibung'])
+    cells = [None] * 23
+    cells[0], cells[1] = 'Liquidität & ähnliche', 'Konto'
+    cells[parser.IDX_WHRG_NOMINAL_FALLBACK] = 'USD'
+    cells[parser.IDX_WHRG_KURS_FALLBACK] = 'JPY'
+    cells[parser.IDX_VALOR_FALLBACK] = '123'
+    cells[parser.IDX_ISIN_FALLBACK] = 'US0378331005'
+    row = decode(cells)
+
+    assert (row['nominal_currency'], row['price_currency']) == ('USD', 'JPY')
+    assert (row['lookup_valor'], row['lookup_isin']) == ('123', 'US0378331005')
+    # Record fields only come from named columns.
+    assert (row['valor'], row['isin']) == ('', '')
+
+
+def write_statement(path, account_line='Portfolio S 123456-01'):
+    rows = [[''] for _ in range(8)]
+    rows[5] = [account_line]
+    rows[7] = ['Anlagekategorie', 'Asset-Unterkategorie', 'Beschreibung', 'Whrg.', 'Anzahl / Nominal', 'Kurs', 'Whrg.', 'Valor', 'ISIN']
+    rows += [
+        ['Aktien & ähnliche', 'Aktien / USA', 'Apple', 'USD', '10', '190', 'USD', '908440', 'US0378331005'],
+        ['Aktien & ähnliche', 'Aktien / Schweiz', 'Nestle', 'CHF', '5', '100', 'CHF', '3886335', 'CH0038863350'],
+        ['Liquidität & ähnliche', 'Konten', 'Konto', 'CHF', '1000', '', '', '0835-1', ''],
+    ]
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        csv.writer(fh).writerows(rows)
+    return str(path)
+
+
+def test_statement_events_stream_records_and_logs(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser, 'DB_PATH', str(tmp_path / 'missing.sqlite'))
+    events = list(parser.iter_statement_events(write_statement(tmp_path / 'statement.csv')))
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ['log', 'log', 'record', 'log', 'record', 'record', 'summary']
+    assert events[1][1].startswith('Unmatched instrument description: Apple')
+    assert events[2][1]['instrument_name_from_file'] == 'Apple'
+    summary = events[-1][1]
+    assert summary['exit_code'] == parser.EXIT_SUCCESS
+    assert summary['main_custody_account_nr'] == 'S 123456-01'
+    assert summary['summary']['security_holding_records'] == 2
+    assert summary['summary']['cash_account_records'] == 1
+
+
+
+def test_csv_rows_are_streamed(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser, 'DB_PATH', str(tmp_path / 'missing.sqlite'))
+    path = write_statement(tmp_path / 'statement.csv')
+    with open(path, 'a', newline='', encoding='utf-8') as fh:
+        csv.writer(fh).writerows(['Aktien & ähnliche', 'Aktien / USA', f'Stock {i}'] for i in range(1000))
+    read = []
+    real_reader = csv.reader
+
+    def counting_reader(f):
+        for row in real_reader(f):
+            read.append(row)
+            yield row
+
+    monkeypatch.setattr(parser.csv, 'reader', counting_reader)
+    events = parser.iter_statement_events(path)
+    assert next(kind for kind, _ in events) == 'log'
+    assert next(kind for kind, _ in events if kind == 'record') == 'record'
+    assert len(read) == 9
+    events.close()
+
+def test_parse_statement_collects_logs_without_printing(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(parser, 'DB_PATH', str(tmp_path / 'missing.sqlite'))
+    conn = sqlite3.connect(':memory:')
+    setup_instruments(conn)
+    path = write_statement(tmp_path / 'statement.csv', account_line='')
+
+    data, code = parser.parse_statement(path, instrument_index=parser.InstrumentIndex(conn))
+
+    assert code == parser.EXIT_SUCCESS
+    assert 'exit_code' not in data
+    assert [r['record_type'] for r in data['records']] == ['security_holding', 'security_holding', 'cash_account']
+    assert [r.get('instrument_id') for r in data['records'][:2]] == [4, 1]
+    assert data['records'][2]['cash_account_number_from_file'] == '0835-1'
+    assert 'Warning: Could not parse Account Nr from Line 6.' in data['logs']
+    assert capsys.readouterr().out == ''
+
+
+def test_write_ndjson_emits_compact_lines_summary_last(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser, 'DB_PATH', str(tmp_path / 'missing.sqlite'))
+    out = io.StringIO()
+    code = parser.write_ndjson(write_statement(tmp_path / 'statement.csv'), out=out)
+
+    lines = out.getvalue().splitlines()
+    events = [json.loads(line) for line in lines]
+    assert code == parser.EXIT_SUCCESS
+    assert lines == [json.dumps(e, ensure_ascii=False, separators=(',', ':')) for e in events]
+    assert [e['event'] for e in events].count('record') == 3
+    assert events[-1]['event'] == 'summary'
+    assert events[-1]['data']['exit_code'] == parser.EXIT_SUCCESS
+
+
+def test_write_ndjson_missing_file_writes_only_summary(tmp_path):
+    conn = sqlite3.connect(':memory:')
+    setup_instruments(conn)
+    out = io.StringIO()
+    code = parser.write_ndjson(str(tmp_path / 'absent.csv'), out=out, instrument_index=parser.InstrumentIndex(conn))
+
+    lines = out.getvalue().splitlines()
+    assert code == parser.EXIT_FILE_NOT_FOUND == 1
+    assert len(lines) == 1
+    event = json.loads(lines[0])
+    assert event['event'] == 'summary'
+    assert event['data']['exit_code'] == 1
+    assert 'File not found' in event['data']['summary']['error']
+
+
+def test_main_without_file_prints_usage(capsys):
+    assert parser.main([]) == 1
+    error = json.loads(capsys.readouterr().out)
+    assert error['error'] == 'Please provide the XLSX file path as an argument.'
+    assert '--ndjson' in error['usage']
@@ -0,0 +1,53 @@
+import random
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import drawdown_analysis as dd
+import pandas as pd
+import risk_metrics
+
+
+def test_episode_table():
+    points = [('d0', 100), ('d1', 90), ('d2', 80), ('d3', 100), ('d4', 110), ('d5', 99), ('d6', 105)]
+    episodes = list(dd.iter_episodes(points))
+    assert len(episodes) == 2
+    first, second = episodes
+    assert (first.peak_date, first.trough_date, first.recovery_date) == ('d0', 'd2', 'd3')
+    assert first.depth == pytest.approx(-0.2)
+    assert (first.duration, first.time_to_recover) == (3, 1)
+    assert (second.peak_date, second.trough_date, second.recovery_date) == ('d4', 'd5', None)
+    assert second.depth == pytest.approx(99 / 110 - 1)
+    assert (second.duration, second.time_to_recover) == (2, None)
+    assert dd.deepest_episodes(episodes, 1) == [first]
+
+
+def test_max_drawdown_matches_deepest_episode():
+    rng = random.Random(4)
+    returns = [rng.gauss(0.0, 0.02) for _ in range(400)]
+    deepest = dd.deepest_episodes(dd.iter_episodes(dd.wealth_from_returns(returns)), 1)[0]
+    series = pd.Series(returns)
+    cumulative = (1 + series).cumprod()
+    peak = cumulative.cummax()
+    reference = ((cumulative - peak) / peak).min()
+    assert risk_metrics.max_drawdown(series) == pytest.approx(reference, abs=1e-15)
+    assert deepest.depth == pytest.approx(reference)
+    assert risk_metrics.max_drawdown(pd.Series([])) == 0.0
+
+
+def test_value_history_reader():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE PortfolioValueHistory (value_date TEXT PRIMARY KEY, total_value_chf REAL NOT NULL)")
+    conn.executemany(
+        "INSERT INTO PortfolioValueHistory VALUES (?, ?)",
+        [('2025-01-03', 95.0), ('2025-01-01', 100.0), ('2025-01-02', 90.0), ('2025-01-04', 101.0)],
+    )
+    result = dd.analyse(dd.read_value_history(conn), top_n=3)
+    assert result['episodes'] == result['deepest']
+    assert result['episodes'][0]['trough_date'] == '2025-01-02'
+    assert result['episodes'][0]['recovery_date'] == '2025-01-04'
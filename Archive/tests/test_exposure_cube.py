@@ -0,0 +1,54 @@
+import pytest
+
+from DragonShield.python_scripts.exposure_cube import build_exposure_cube
+from DragonShield.python_scripts.position_frame import PositionFrame
+from DragonShield.python_scripts.risk_buckets import top_risk_buckets
+
+
+POSITIONS = [
+    {"quantity": 10, "current_price": 5.0, "currency": "CHF", "sector": "Tech", "country_code": "CH"},
+    {"quantity": 20, "current_price": 2.0, "currency": "USD", "sector": "Tech", "country_code": "US"},
+    {"quantity": 5, "current_price": 100.0, "currency": "EUR", "sector": "Health", "country_code": "DE"},
+    {"quantity": 1, "current_price": 200.0, "currency": "USD", "sector": None, "country_code": "US"},
+    {"quantity": 4, "current_price": 10.0, "currency": "JPY", "sector": "Energy", "country_code": "JP"},
+]
+RATES = {"USD": 0.9, "EUR": 0.95}
+
+
+@pytest.mark.parametrize("as_frame", [False, True])
+def test_single_dimension_rollups_match_risk_buckets(as_frame):
+    source = PositionFrame.from_positions(POSITIONS, dimensions=("sector", "country_code")) if as_frame else POSITIONS
+    cube = build_exposure_cube(source, RATES)
+
+    for dim in ("sector", "currency", "country_code"):
+        assert cube.buckets(dim, top_n=5) == pytest.approx(top_risk_buckets(POSITIONS, RATES, dimension=dim))
+
+
+def test_drill_down_and_flags():
+    cube = build_exposure_cube(POSITIONS, RATES)
+    total = 10 * 5.0 + 20 * 2.0 * 0.9 + 5 * 100.0 * 0.95 + 200.0 * 0.9
+
+    assert cube.total_chf == pytest.approx(total)
+    assert cube.value() == pytest.approx(total)
+    assert cube.value(sector="Tech") == pytest.approx(50.0 + 36.0)
+    assert cube.value(sector="Tech", currency="USD") == pytest.approx(36.0)
+    assert cube.value(sector="Tech", currency="USD", country_code="DE") == 0.0
+
+    us_tech = cube.buckets("currency", sector="Tech")
+    assert [b["label"] for b in us_tech] == ["CHF", "USD"]
+    pairs = cube.buckets(("currency", "sector"), top_n=2)
+    assert pairs[0]["label"] == ("EUR", "Health")
+
+    flags = cube.overconcentrated()
+    assert ("Health",) in flags[("sector",)]
+    assert ("Health", "EUR", "DE") in flags[("sector", "currency", "country_code")]
+
+    with pytest.raises(KeyError):
+        cube.value(issuer="X")
+
+
+def test_buckets_requires_a_dimension():
+    cube = build_exposure_cube(POSITIONS, RATES)
+
+    with pytest.raises(ValueError):
+        cube.buckets(())
@@ -0,0 +1,119 @@
+import sqlite3
+
+import pytest
+
+from DragonShield.python_scripts.exposure_sql import currency_exposure_sql, top_risk_buckets_sql
+from DragonShield.python_scripts.currency_exposure import currency_exposure
+from DragonShield.python_scripts.risk_buckets import top_risk_buckets
+
+
+INSTRUMENTS = [
+    # id, name, currency, sector, country, sub_class
+    (1, "A", "CHF", "Tech", "CH", 1),
+    (2, "B", "USD", "Tech", "US", 1),
+    (3, "C", "EUR", "Health", "DE", 2),
+    (4, "D", "usd", None, "US", 2),
+    (5, "E", "GBP", "Energy", "GB", 1),
+    (6, "F", "JPY", "Energy", "JP", 1),
+]
+REPORTS = [
+    # instrument_id, quantity, price, session
+    (1, 10, 5.0, 1),
+    (2, 20, 2.0, 1),
+    (3, 5, 100.0, 1),
+    (4, 1, 200.0, 1),
+    (5, 3, 80.0, 1),
+    (6, 100, None, 1),
+    (2, 7, 3.0, 2),
+]
+RATES = {"USD": 0.9, "EUR": 0.95, "GBP": 1.1}
+
+
+def setup_db():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(
+        """
+        CREATE TABLE AssetClasses (class_id INTEGER PRIMARY KEY, class_name TEXT);
+        CREATE TABLE AssetSubClasses (sub_class_id INTEGER PRIMARY KEY, class_id INTEGER, sub_class_name TEXT);
+        CREATE TABLE Instruments (
+            instrument_id INTEGER PRIMARY KEY, instrument_name TEXT, currency TEXT,
+            sector TEXT, country_code TEXT, sub_class_id INTEGER
+        );
+        CREATE TABLE PositionReports (
+            position_id INTEGER PRIMARY KEY AUTOINCREMENT, import_session_id INTEGER,
+            instrument_id INTEGER, quantity REAL, current_price REAL
+        );
+        CREATE TABLE ExchangeRates (
+            currency_code TEXT, rate_date TEXT, rate_to_chf REAL, is_latest INTEGER
+        );
+        INSERT INTO AssetClasses VALUES (1, 'Equity'), (2, 'Bond');
+        INSERT INTO AssetSubClasses VALUES (1, 1, 'Single Stock'), (2, 2, 'Corporate Bond');
+        """
+    )
+    conn.executemany("INSERT INTO Instruments VALUES (?,?,?,?,?,?)", INSTRUMENTS)
+    conn.executemany(
+        "INSERT INTO PositionReports (instrument_id, quantity, current_price, import_session_id) VALUES (?,?,?,?)",
+        REPORTS,
+    )
+    for code, rate in RATES.items():
+        conn.execute("INSERT INTO ExchangeRates VALUES (?, '2025-01-01', ?, 0)", (code, rate * 2))
+        conn.execute("INSERT INTO ExchangeRates VALUES (?, '2025-02-01', ?, 1)", (code, rate))
+    return conn
+
+
+def as_positions(session_id=None):
+    by_id = {row[0]: row for row in INSTRUMENTS}
+    classes = {1: "Equity", 2: "Bond"}
+    positions = []
+    for instrument_id, qty, price, session in REPORTS:
+        if session_id is not None and session != session_id:
+            continue
+        _, name, currency, sector, country, sub_class = by_id[instrument_id]
+        positions.append(
+            {
+                "instrument": name,
+                "quantity": qty,
+                "current_price": price,
+                "currency": currency,
+                "sector": sector,
+                "country_code": country,
+                "asset_class": classes[sub_class],
+            }
+        )
+    return positions
+
+
+def test_currency_exposure_matches_python():
+    conn = setup_db()
+    for top_n in (2, 6):
+        assert currency_exposure_sql(conn, top_n=top_n) == pytest.approx(
+            currency_exposure(as_positions(), RATES, top_n=top_n)
+        )
+    assert currency_exposure_sql(conn, session_id=2) == pytest.approx(
+        currency_exposure(as_positions(2), RATES)
+    )
+
+
+def test_currency_exposure_missing_rate():
+    conn = setup_db()
+    conn.execute("UPDATE PositionReports SET current_price = 1.0 WHERE instrument_id = 6")
+    with pytest.raises(KeyError) as exc:
+        currency_exposure_sql(conn)
+    assert exc.value.args[0] == "JPY"
+
+
+@pytest.mark.parametrize("dimension", ["sector", "country_code", "currency", "asset_class"])
+def test_risk_buckets_match_python(dimension):
+    conn = setup_db()
+    conn.execute("UPDATE PositionReports SET current_price = 1.0 WHERE instrument_id = 6")
+    positions = as_positions()
+    positions[5]["current_price"] = 1.0
+    assert top_risk_buckets_sql(conn, dimension=dimension, top_n=3) == pytest.approx(
+        top_risk_buckets(positions, RATES, dimension=dimension, top_n=3)
+    )
+
+
+def test_risk_buckets_rejects_unknown_dimension():
+    conn = setup_db()
+    with pytest.raises(ValueError):
+        top_risk_buckets_sql(conn, dimension="issuer; DROP TABLE Instruments")
@@ -0,0 +1,62 @@
+import pytest
+
+from DragonShield.python_scripts.fx_scenarios import FxScenarioEngine
+from DragonShield.python_scripts.position_frame import PositionFrame
+from DragonShield.python_scripts.total_asset_value import calculate_total_asset_value
+from DragonShield.python_scripts.risk_buckets import top_risk_buckets
+
+
+POSITIONS = [
+    {"quantity": 10, "current_price": 5.0, "currency": "CHF", "sector": "Tech"},
+    {"quantity": 20, "current_price": 2.0, "currency": "USD", "sector": "Tech"},
+    {"quantity": 5, "current_price": 100.0, "currency": "EUR", "sector": "Health"},
+    {"quantity": 1, "current_price": None, "currency": "GBP", "sector": "Energy"},
+]
+RATES = {"USD": 0.9, "EUR": 0.95}
+SCENARIOS = [{}, {"USD": -0.10, "eur": 0.05}, {"EUR": -0.2, "JPY": 0.5}]
+
+
+def shocked_rates(shocks):
+    upper = {k.upper(): v for k, v in shocks.items()}
+    return {c: r * (1 + upper.get(c, 0.0)) for c, r in RATES.items()}
+
+
+@pytest.mark.parametrize("as_frame", [False, True])
+def test_scenarios_match_revaluation(as_frame):
+    source = PositionFrame.from_positions(POSITIONS) if as_frame else POSITIONS
+    engine = FxScenarioEngine(source, RATES, dimension="sector")
+
+    results = engine.run(SCENARIOS)
+    assert [r.index for r in results] == [0, 1, 2]
+    for shocks, result in zip(SCENARIOS, results):
+        rates = shocked_rates(shocks)
+        assert result.total_chf == pytest.approx(calculate_total_asset_value(POSITIONS, rates))
+        expected = {b["label"]: b["value_chf"] for b in top_risk_buckets(POSITIONS, rates, top_n=10)}
+        assert result.bucket_values == pytest.approx(expected)
+    assert results[1].currency_exposure["USD"] == pytest.approx(20 * 2.0 * 0.9 * 0.9)
+
+
+def test_chunked_and_pooled_runs_agree():
+    engine = FxScenarioEngine(POSITIONS, RATES)
+    scenarios = [{"USD": i / 100.0, "EUR": -i / 200.0} for i in range(25)]
+
+    serial = engine.run(scenarios)
+    chunked = list(engine.iter_results(iter(scenarios), chunk_size=4))
+    pooled = list(engine.iter_results(scenarios, chunk_size=7, workers=2))
+    assert [r.total_chf for r in chunked] == [r.total_chf for r in serial]
+    assert [r.total_chf for r in pooled] == [r.total_chf for r in serial]
+
+
+def test_missing_rate_raises_key_error():
+    with pytest.raises(KeyError):
+        FxScenarioEngine([{"quantity": 1, "current_price": 1.0, "currency": "NOK"}], RATES)
+
+
+def test_chf_is_never_shocked():
+    engine = FxScenarioEngine(POSITIONS, RATES)
+    assert engine.factor_row({"CHF": 0.1, "chf": 0.2, "USD": -0.1}) == [
+        1.0 if c == "CHF" else pytest.approx(0.9) if c == "USD" else 1.0 for c in engine.currencies
+    ]
+    shocked, = engine.run([{"CHF": 0.1, "USD": -0.1}])
+    assert shocked.currency_exposure["CHF"] == 10 * 5.0
+    assert shocked.total_chf == pytest.approx(calculate_total_asset_value(POSITIONS, shocked_rates({"USD": -0.1})))
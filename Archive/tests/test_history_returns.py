@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import risk_metrics
+
+
+def setup_db(navs):
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE PortfolioValueHistory (value_date TEXT PRIMARY KEY, total_value_chf REAL NOT NULL)")
+    conn.executemany("INSERT INTO PortfolioValueHistory VALUES (?, ?)", navs)
+    return conn
+
+
+def test_history_returns_and_cache(tmp_path):
+    navs = [(f'2025-01-{d:02d}', 100.0 + d * (-1) ** d) for d in range(1, 21)]
+    conn = setup_db(navs)
+    cache = tmp_path / 'cache.json'
+    expected = [b / a - 1 for (_, a), (_, b) in zip(navs, navs[1:])]
+
+    returns = risk_metrics.load_history_returns(conn, 5, str(cache))
+    assert list(returns) == pytest.approx(expected[-5:])
+    stored = json.loads(cache.read_text())
+    assert stored['last_date'] == '2025-01-20'
+    assert stored['row_count'] == 20
+    assert len(stored['returns']) == 19
+
+    conn.execute("INSERT INTO PortfolioValueHistory VALUES ('2025-01-21', 130.0)")
+    returns = risk_metrics.load_history_returns(conn, 3, str(cache))
+    assert list(returns) == pytest.approx(expected[-2:] + [130.0 / navs[-1][1] - 1])
+    assert json.loads(cache.read_text())['last_date'] == '2025-01-21'
+    assert json.loads(cache.read_text())['row_count'] == 21
+
+    # A rewritten history invalidates the cache.
+    conn.execute("UPDATE PortfolioValueHistory SET total_value_chf = total_value_chf * 2")
+    conn.execute("UPDATE PortfolioValueHistory SET total_value_chf = 1 WHERE value_date = '2025-01-01'")
+    fresh = risk_metrics.load_history_returns(conn, 50)
+    assert list(risk_metrics.load_history_returns(conn, 50, str(cache))) == list(fresh)
+    assert fresh[0] == pytest.approx(navs[1][1] * 2 - 1)
+
+
+@pytest.mark.parametrize('change', [
+    "INSERT OR IGNORE INTO PortfolioValueHistory VALUES ('2025-01-02', 50.0)",
+    "UPDATE PortfolioValueHistory SET total_value_chf = 120.0 WHERE value_date = '2025-01-04'",
+    "DELETE FROM PortfolioValueHistory WHERE value_date = '2025-01-03'",
+])
+def test_cache_refreshed_after_older_rows_change(tmp_path, change):
+    conn = setup_db([('2025-01-01', 100.0), ('2025-01-03', 110.0), ('2025-01-04', 121.0)])
+    cache = tmp_path / 'cache.json'
+    assert list(risk_metrics.load_history_returns(conn, 5, str(cache))) == pytest.approx([0.1, 0.1])
+
+    conn.execute(change)
+    fresh = list(risk_metrics.load_history_returns(conn, 5))
+    assert list(risk_metrics.load_history_returns(conn, 5, str(cache))) == fresh
+    assert fresh != pytest.approx([0.1, 0.1])
+
+
+def test_rebuild_reads_only_the_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(risk_metrics, 'PERIOD_MAP', {'1M': 4})
+    navs = [(f'2025-01-{d:02d}', 100.0 + d * d) for d in range(1, 31)]
+    conn = setup_db(navs)
+    expected = [b / a - 1 for (_, a), (_, b) in zip(navs, navs[1:])]
+    assert list(risk_metrics.load_history_returns(conn, 3)) == pytest.approx(expected[-3:])
+
+    cache = tmp_path / 'cache.json'
+    assert list(risk_metrics.load_history_returns(conn, 3, str(cache))) == pytest.approx(expected[-3:])
+    statements = []
+    conn.set_trace_callback(statements.append)
+    conn.execute("INSERT INTO PortfolioValueHistory VALUES ('2025-01-31', 1000.0)")
+    returns = risk_metrics.load_history_returns(conn, 2, str(cache))
+    assert list(returns) == pytest.approx([expected[-1], 1000.0 / navs[-1][1] - 1])
+    # The cached call only appends the rows after the cached date.
+    assert any('value_date > ' in sql for sql in statements)
+    assert not any('LIMIT' in sql for sql in statements)
+
+
+def test_main_db_source(tmp_path, capsys, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    db = tmp_path / 'nav.sqlite'
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE PortfolioValueHistory (value_date TEXT PRIMARY KEY, total_value_chf REAL NOT NULL)")
+    conn.executemany(
+        "INSERT INTO PortfolioValueHistory VALUES (?, ?)",
+        [(f'2025-02-{d:02d}', 100.0 + (d % 3)) for d in range(1, 28)],
+    )
+    conn.commit()
+    conn.close()
+    assert risk_metrics.main(['--db', str(db), '--all-periods']) == 0
+    out = json.loads(capsys.readouterr().out)
+    assert set(out) == set(risk_metrics.PERIOD_MAP)
+    cache = Path(risk_metrics.default_cache_path(str(db)))
+    assert not cache.exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['nav.sqlite']
+
+    assert risk_metrics.main(['--db', str(db), '--all-periods', '--cache']) == 0
+    assert json.loads(capsys.readouterr().out) == out
+    assert cache.exists()
+    assert cache.parent == tmp_path / 'cache' / 'dragonshield'
@@ -4,7 +4,6 @@
 
 import os
 import sys
-import json
 import sqlite3
 from pathlib import Path
 import types
@@ -103,13 +102,38 @@ def test_insert_and_update_session():
 def test_parse_file(monkeypatch, tmp_path):
     sample = {'records': [1, 2], 'summary': {}}
 
-    def fake_process_file(path):
-        print(json.dumps(sample))
+    seen = []
 
-    monkeypatch.setattr(import_tool, 'credit_suisse_parser', type('M', (), {'process_file': fake_process_file}))
+    def fake_parse_statement(path, instrument_index=None):
+        seen.append(instrument_index)
+        return sample, 0
+
+    monkeypatch.setattr(import_tool, 'credit_suisse_parser', type('M', (), {'parse_statement': fake_parse_statement}))
 
     f = tmp_path / 'doc.csv'
     f.write_text('x')
     data = import_tool.parse_file(str(f))
 
     assert data == sample
+    index = object()
+    import_tool.parse_file(str(f), index)
+    assert seen == [None, index]
+
+
+@pytest.mark.parametrize('answer, refreshes', [('y', 1), ('n', 0)])
+def test_process_file_path_refreshes_shared_index(monkeypatch, tmp_path, answer, refreshes):
+    conn = setup_db()
+    f = tmp_path / 'doc.csv'
+    f.write_text('x')
+    monkeypatch.setattr(import_tool, 'parse_file', lambda path, index=None: {'records': [], 'summary': {}})
+    monkeypatch.setattr('builtins.input', lambda prompt='': answer)
+
+    class Index:
+        refreshed = 0
+
+        def refresh(self):
+            self.refreshed += 1
+
+    index = Index()
+    import_tool.process_file_path(conn, 1, str(f), index)
+    assert index.refreshed == refreshes
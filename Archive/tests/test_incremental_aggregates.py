@@ -0,0 +1,86 @@
+import pytest
+
+from DragonShield.python_scripts.incremental_aggregates import IncrementalAggregator
+from DragonShield.python_scripts.total_asset_value import calculate_total_asset_value
+from DragonShield.python_scripts.top_positions import top_positions_by_chf
+from DragonShield.python_scripts.currency_exposure import currency_exposure
+from DragonShield.python_scripts.risk_buckets import top_risk_buckets
+
+
+def assert_matches(agg, positions, rates):
+    positions = list(positions)
+    assert agg.total_chf() == pytest.approx(calculate_total_asset_value(positions, rates))
+    assert agg.currency_exposure(top_n=3) == pytest.approx(currency_exposure(positions, rates, top_n=3))
+    assert agg.top_positions(top_n=4) == pytest.approx(top_positions_by_chf(positions, rates, top_n=4))
+    for dim in ("sector", "issuer", "currency"):
+        assert agg.top_risk_buckets(dim) == pytest.approx(top_risk_buckets(positions, rates, dimension=dim))
+
+
+def test_updates_track_full_recomputation():
+    rates = {"USD": 0.9, "EUR": 0.95, "GBP": 1.1}
+    book = {
+        1: {"position_id": 1, "instrument": "A", "quantity": 10, "current_price": 5.0, "currency": "CHF", "sector": "Tech", "issuer": "X"},
+        2: {"position_id": 2, "instrument": "B", "quantity": 20, "current_price": 2.0, "currency": "USD", "sector": "Tech", "issuer": "Y"},
+        3: {"position_id": 3, "instrument": "C", "quantity": 5, "current_price": 100.0, "currency": "EUR", "sector": "Health", "issuer": "Z"},
+        4: {"position_id": 4, "instrument": "D", "quantity": 1, "current_price": None, "currency": "GBP", "sector": None, "issuer": "Z"},
+    }
+    agg = IncrementalAggregator(rates, book.values())
+    assert len(agg) == 4
+    assert_matches(agg, book.values(), rates)
+
+    book[2] = dict(book[2], current_price=40.0)
+    agg.apply_upsert(book[2])
+    assert_matches(agg, book.values(), rates)
+
+    book[4] = dict(book[4], current_price=300.0)
+    agg.apply_upsert(book[4])
+    assert_matches(agg, book.values(), rates)
+
+    rates["USD"] = 0.8
+    agg.apply_fx_change("usd", 0.8)
+    assert_matches(agg, book.values(), rates)
+
+    del book[3]
+    agg.apply_delete(3)
+    assert_matches(agg, book.values(), rates)
+    assert all(b["label"] != "Health" for b in agg.top_risk_buckets("sector"))
+
+
+def test_unknown_rate_semantics():
+    agg = IncrementalAggregator({}, [{"position_id": 1, "instrument": "A", "quantity": 1, "current_price": 10.0, "currency": "JPY"}])
+    with pytest.raises(KeyError):
+        agg.total_chf()
+    assert agg.top_positions() == []
+    assert agg.top_risk_buckets("currency") == []
+
+    agg.apply_fx_change("JPY", 0.006)
+    assert agg.total_chf() == pytest.approx(0.06)
+    with pytest.raises(KeyError):
+        agg.apply_delete(99)
+
+
+def test_repeated_upserts_keep_order_and_bounded_heaps():
+    rates = {"USD": 1.0}
+    book = {
+        i: {"position_id": i, "instrument": str(i), "quantity": 1, "current_price": 10.0,
+            "currency": "CHF" if i % 2 else "USD", "sector": f"S{i}", "issuer": "X"}
+        for i in range(6)
+    }
+    agg = IncrementalAggregator(rates, book.values())
+    before = (agg.currency_exposure(), agg.top_risk_buckets("sector", top_n=6), agg.top_positions(top_n=6))
+
+    # Re-upserting a tied position must not move it behind the others.
+    for _ in range(50):
+        agg.apply_upsert(dict(book[0]))
+        agg.apply_upsert(dict(book[1]))
+    assert (agg.currency_exposure(), agg.top_risk_buckets("sector", top_n=6), agg.top_positions(top_n=6)) == before
+    assert [b["label"] for b in before[1]] == [f"S{i}" for i in range(6)]
+    # Stale heap entries are compacted once they outnumber the live ones.
+    assert all(len(heap) <= 2 * 3 + 1 for heap in agg._ranked.values())
+
+    for i in range(200):
+        book[0] = dict(book[0], quantity=i % 7 + 0.1 * (i % 3))
+        agg.apply_upsert(book[0])
+        if i % 25 == 0:
+            assert_matches(agg, book.values(), rates)
+    assert_matches(agg, book.values(), rates)
@@ -0,0 +1,66 @@
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import risk_metrics
+
+
+def _write_returns(path, rows):
+    path.write_text('date,return\n' + ''.join(f'{d},{r}\n' for d, r in rows))
+
+
+def test_load_returns_reads_tail_of_sorted_file(tmp_path, monkeypatch):
+    start = date(2000, 1, 3)
+    rows = [((start + timedelta(days=i)).isoformat(), i / 1e5) for i in range(5000)]
+    path = tmp_path / 'sorted.csv'
+    _write_returns(path, rows)
+    parsed = []
+    parse_rows = risk_metrics._parse_rows
+
+    def counting(lines):
+        result = parse_rows(lines)
+        parsed.append(len(result))
+        return result
+
+    monkeypatch.setattr(risk_metrics, 'TAIL_BLOCK_SIZE', 256)
+    monkeypatch.setattr(risk_metrics, '_parse_rows', counting)
+    returns = risk_metrics.load_returns(str(path), 10, assume_sorted=True)
+    assert list(returns) == [r for _, r in rows[-10:]]
+    assert sum(parsed) == 1 + 11
+    assert list(risk_metrics.load_returns(str(path), 10_000, assume_sorted=True)) == [r for _, r in rows]
+
+
+
+def test_load_returns_tail_with_multibyte_text(tmp_path, monkeypatch):
+    start = date(2000, 1, 3)
+    rows = [((start + timedelta(days=i)).isoformat(), i / 1e5) for i in range(40)]
+    path = tmp_path / 'notes.csv'
+    path.write_text(
+        'date,return,note\n' + ''.join(f'{d},{r},Zürich €\n' for d, r in rows), encoding='utf-8'
+    )
+    # Some block boundary falls inside "ü" or "€".
+    for block_size in range(1, 12):
+        monkeypatch.setattr(risk_metrics, 'TAIL_BLOCK_SIZE', block_size)
+        assert list(risk_metrics.load_returns(str(path), 5, assume_sorted=True)) == [r for _, r in rows[-5:]]
+
+def test_load_returns_falls_back_for_unsorted_file(tmp_path):
+    rows = [('2025-01-03', 0.03), ('2025-01-01', 0.01), ('2025-01-04', 0.04), ('2025-01-02', 0.02)]
+    path = tmp_path / 'unsorted.csv'
+    _write_returns(path, rows)
+    assert list(risk_metrics.load_returns(str(path), 3, assume_sorted=True)) == [0.02, 0.03, 0.04]
+    _write_returns(path, [('2025-01-05', 0.05)] + sorted(rows))
+    assert list(risk_metrics.load_returns(str(path), 2, assume_sorted=True)) == [0.04, 0.05]
+    empty = tmp_path / 'empty.csv'
+    empty.write_text('date,return\n')
+    assert len(risk_metrics.load_returns(str(empty), 5)) == 0
+
+
+def test_load_returns_sorts_unless_told_the_file_is_sorted(tmp_path):
+    # Out of order only in the middle: the first row and the tail look sorted.
+    rows = [('2025-01-01', 0.01), ('2025-01-05', 0.99), ('2025-01-02', 0.02), ('2025-01-03', 0.03), ('2025-01-04', 0.04)]
+    path = tmp_path / 'middle.csv'
+    _write_returns(path, rows)
+    assert list(risk_metrics.load_returns(str(path), 2)) == [0.04, 0.99]
@@ -0,0 +1,101 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+from DragonShield.python_scripts import currency_exposure as currency_exposure_mod
+from DragonShield.python_scripts import risk_buckets as risk_buckets_mod
+from DragonShield.python_scripts import total_asset_value as total_asset_value_mod
+from DragonShield.python_scripts.currency_exposure import currency_exposure
+from DragonShield.python_scripts.money_sum import CompensatedSum, FixedPointSum, summation_factory
+from DragonShield.python_scripts.position_frame import PositionFrame
+from DragonShield.python_scripts.risk_buckets import top_risk_buckets
+from DragonShield.python_scripts.total_asset_value import calculate_total_asset_value
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import import_session_report as report
+
+
+def test_accumulators():
+    values = [1e16, 1.0, -1e16, 0.1, 0.2]
+    assert sum(values) != pytest.approx(1.3)
+    comp = CompensatedSum()
+    for v in values:
+        comp.add(v)
+    assert comp.value == pytest.approx(1.3)
+    fixed = FixedPointSum()
+    for v in [0.1] * 10:
+        fixed.add(v)
+    assert fixed.value == 1.0
+    with pytest.raises(ValueError):
+        summation_factory('decimal')
+
+
+def test_helpers_accept_summation_modes():
+    positions = [
+        {"instrument": "A", "quantity": 3, "current_price": 0.1, "currency": "CHF", "sector": "Tech"},
+        {"instrument": "B", "quantity": 7, "current_price": 0.1, "currency": "USD", "sector": "Tech"},
+        {"instrument": "C", "quantity": 1, "current_price": None, "currency": "CHF", "sector": "Energy"},
+    ]
+    rates = {"USD": 1.0}
+    frame = PositionFrame.from_positions(positions, dimensions=("sector",))
+    for source in (positions, frame):
+        assert calculate_total_asset_value(source, rates) == calculate_total_asset_value(positions, rates)
+        assert calculate_total_asset_value(source, rates, summation="fixed") == 1.0
+        assert calculate_total_asset_value(source, rates, summation="compensated") == pytest.approx(1.0)
+        exposure = currency_exposure(source, rates, summation="fixed")
+        assert [(e["currency"], e["value_chf"]) for e in exposure] == [("USD", 0.7), ("CHF", 0.3)]
+        buckets = top_risk_buckets(source, rates, summation="fixed")
+        assert buckets[0]["value_chf"] == 1.0
+    with pytest.raises(ValueError):
+        calculate_total_asset_value(positions, rates, summation="bogus")
+
+
+def test_float_summation_skips_accumulators(monkeypatch):
+    def no_accumulators(mode):
+        raise AssertionError(f"accumulator built for {mode}")
+
+    for module in (total_asset_value_mod, currency_exposure_mod, risk_buckets_mod):
+        monkeypatch.setattr(module, "summation_factory", no_accumulators)
+    positions = [
+        {"instrument": "A", "quantity": 3, "current_price": 0.1, "currency": "CHF", "sector": "Tech"},
+        {"instrument": "B", "quantity": 7, "current_price": 0.1, "currency": "USD", "sector": "Energy"},
+    ]
+    rates = {"USD": 1.0}
+    assert calculate_total_asset_value(positions, rates) == 0.3 + 0.7000000000000001
+    assert [e["currency"] for e in currency_exposure(positions, rates)] == ["USD", "CHF"]
+    assert [b["label"] for b in top_risk_buckets(positions, rates)] == ["Energy", "Tech"]
+    frame = PositionFrame.from_positions(positions, dimensions=("sector",))
+    assert [b["label"] for b in top_risk_buckets(frame, rates)] == ["Energy", "Tech"]
+
+
+@pytest.mark.parametrize("summation", ["float", "compensated", "fixed"])
+def test_frame_and_mapping_round_alike(summation):
+    # Each amount is 0.8 micro-CHF after conversion but only 0.4 in USD, so
+    # rounding before conversion would give a different fixed-point total.
+    positions = [{"instrument": str(i), "quantity": 1, "current_price": 4e-7, "currency": "USD"} for i in range(3)]
+    positions.append({"instrument": "C", "quantity": 2, "current_price": 0.15, "currency": "CHF"})
+    rates = {"USD": 2.0}
+    frame = PositionFrame.from_positions(positions)
+
+    assert calculate_total_asset_value(frame, rates, summation=summation) == calculate_total_asset_value(
+        positions, rates, summation=summation
+    )
+    assert currency_exposure(frame, rates, summation=summation) == currency_exposure(
+        positions, rates, summation=summation
+    )
+    if summation == "fixed":
+        assert calculate_total_asset_value(frame, rates, summation=summation) == 0.300003
+    with pytest.raises(KeyError):
+        calculate_total_asset_value(frame, {}, summation=summation)
+
+
+def test_summarize_positions_fixed():
+    conn = sqlite3.connect(':memory:')
+    positions = [{"instrument": "A", "currency": "CHF", "quantity": 1, "price": 0.1}] * 10
+    summary = report.summarize_positions(conn, positions, summation="fixed")
+    assert summary["total_chf"] == 1.0
+    assert summary["breakdown"] == {"CHF": 1.0}
@@ -0,0 +1,115 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import nav_history
+
+
+def setup_db():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(
+        """
+        CREATE TABLE Instruments (instrument_id INTEGER PRIMARY KEY, currency TEXT);
+        CREATE TABLE PositionReports (
+            position_id INTEGER PRIMARY KEY AUTOINCREMENT, account_id INTEGER, instrument_id INTEGER,
+            quantity REAL, current_price REAL, report_date TEXT
+        );
+        CREATE TABLE InstrumentPrice (
+            id INTEGER PRIMARY KEY, instrument_id INTEGER, price REAL, currency TEXT, as_of TEXT
+        );
+        CREATE TABLE ExchangeRates (currency_code TEXT, rate_date TEXT, rate_to_chf REAL);
+        CREATE TABLE PortfolioValueHistory (
+            value_date TEXT PRIMARY KEY, total_value_chf REAL NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO Instruments VALUES (1, 'CHF'), (2, 'USD');
+        INSERT INTO PositionReports (account_id, instrument_id, quantity, current_price, report_date) VALUES
+            (1, 1, 10, 5.0, '2025-01-01'),
+            (2, 2, 2, 100.0, '2025-01-01'),
+            (1, 1, 4, NULL, '2025-01-03');
+        INSERT INTO InstrumentPrice (instrument_id, price, currency, as_of) VALUES
+            (1, 6.0, 'CHF', '2025-01-02T16:00:00Z'),
+            (2, 110.0, 'USD', '2025-01-04');
+        INSERT INTO ExchangeRates VALUES ('USD', '2024-12-31', 0.9), ('USD', '2025-01-03', 0.8);
+        """
+    )
+    return conn
+
+
+def test_nav_series_as_of_joins():
+    conn = setup_db()
+    series = nav_history.nav_series(conn)
+
+    assert [d for d, _ in series] == ['2025-01-01', '2025-01-02', '2025-01-03', '2025-01-04']
+    values = [v for _, v in series]
+    assert values[0] == pytest.approx(10 * 5.0 + 2 * 100.0 * 0.9)
+    assert values[1] == pytest.approx(10 * 6.0 + 2 * 100.0 * 0.9)
+    assert values[2] == pytest.approx(4 * 6.0 + 2 * 100.0 * 0.8)
+    assert values[3] == pytest.approx(4 * 6.0 + 2 * 110.0 * 0.8)
+
+    assert nav_history.nav_series(conn, start='2025-01-02', end='2025-01-03') == series[1:3]
+
+
+def test_missing_rate_and_backfill():
+    conn = setup_db()
+    conn.execute("DELETE FROM ExchangeRates")
+    with pytest.raises(KeyError):
+        nav_history.nav_series(conn)
+    missing = set()
+    series = nav_history.nav_series(conn, skip_missing_rates=True, missing_rates=missing)
+    assert series[0][1] == pytest.approx(50.0)
+    assert missing == {'USD'}
+
+    conn.execute("INSERT INTO PortfolioValueHistory (value_date, total_value_chf) VALUES ('2025-01-01', 1.0)")
+    assert nav_history.backfill_value_history(conn, series) == 3
+    assert conn.execute("SELECT total_value_chf FROM PortfolioValueHistory WHERE value_date='2025-01-01'").fetchone()[0] == 1.0
+    assert nav_history.backfill_value_history(conn, series, overwrite=True) == 4
+    assert conn.execute("SELECT total_value_chf FROM PortfolioValueHistory WHERE value_date='2025-01-01'").fetchone()[0] == 50.0
+
+
+def test_sold_position_leaves_no_residue():
+    conn = setup_db()
+    conn.executescript(
+        """
+        INSERT INTO Instruments VALUES (3, 'JPY'), (4, 'JPY');
+        INSERT INTO PositionReports (account_id, instrument_id, quantity, current_price, report_date) VALUES
+            (3, 3, 0.1, 0.7, '2025-01-01'),
+            (3, 4, 0.2, 0.7, '2025-01-02'),
+            (3, 3, 0.1, 0.7, '2025-01-02'),
+            (3, 3, 0, 0.7, '2025-01-03'),
+            (3, 4, 0, 0.7, '2025-01-03');
+        """
+    )
+    with pytest.raises(KeyError):
+        nav_history.nav_series(conn, end='2025-01-02')
+    # JPY has no rate, but once the position is sold its rounding residue must not count as a holding.
+    series = nav_history.nav_series(conn, start='2025-01-03')
+    assert series[0][1] == pytest.approx(4 * 6.0 + 2 * 100.0 * 0.8)
+
+
+def test_closed_large_positions_drop_their_currency():
+    conn = setup_db()
+    conn.executescript(
+        """
+        INSERT INTO Instruments VALUES (3, 'JPY'), (4, 'JPY');
+        INSERT INTO PositionReports (account_id, instrument_id, quantity, current_price, report_date) VALUES
+            (3, 3, 12345.67, 8901.23, '2025-01-01'),
+            (3, 4, 777.1, 13.37, '2025-01-01'),
+            (3, 3, 0, 8901.23, '2025-01-03');
+        INSERT INTO InstrumentPrice (instrument_id, price, currency, as_of) VALUES (4, 14.11, 'JPY', '2025-01-02');
+        """
+    )
+    missing = set()
+    nav_history.nav_series(conn, end='2025-01-02', skip_missing_rates=True, missing_rates=missing)
+    assert missing == {'JPY'}
+    # Account 3 holds no JPY from 2025-01-03 on: no KeyError and nothing reported missing.
+    missing.clear()
+    series = nav_history.nav_series(conn, start='2025-01-03', skip_missing_rates=True, missing_rates=missing)
+    assert missing == set()
+    assert nav_history.nav_series(conn, start='2025-01-03') == series
+    assert series[0][1] == pytest.approx(4 * 6.0 + 2 * 100.0 * 0.8)
@@ -0,0 +1,121 @@
+import math
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import pandas as pd
+import risk_metrics
+
+
+def test_series_arithmetic_and_masks():
+    s = pd.Series([1, 2, 4])
+    assert (s - 1) == [0.0, 1.0, 3.0]
+    assert (1 - s) == [0.0, -1.0, -3.0]
+    assert (2 / s) == [2.0, 1.0, 0.5]
+    assert (s / s) == [1.0, 1.0, 1.0]
+    assert (1 + s).cumprod() == [2.0, 6.0, 30.0]
+    assert pd.Series([1, 3, 2]).cummax() == [1.0, 3.0, 3.0]
+    assert s[s < 3] == [1.0, 2.0]
+    assert s[1:] == [2.0, 4.0]
+    assert s[-1] == 4.0
+    assert s.min() == 1.0
+
+
+def test_cached_moments_invalidated_in_place():
+    s = pd.Series([1.0, 2.0, 3.0, 4.0])
+    assert s.mean() == 2.5
+    assert s.std() == pytest.approx(math.sqrt(1.25))
+    alias = s
+    s -= 1
+    assert alias is s
+    assert s.mean() == 1.5
+    s *= 2
+    assert s.std() == pytest.approx(2 * math.sqrt(1.25))
+    s[0] = 100.0
+    assert s.mean() == pytest.approx((100 + 2 + 4 + 6) / 4)
+
+
+def test_ratios_match_reference():
+    data = [0.01, 0.02, -0.005, 0.015, 0.0, -0.01]
+    returns = pd.Series(data)
+    m = sum(data) / len(data)
+    sd = math.sqrt(sum((x - m) ** 2 for x in data) / len(data))
+    assert risk_metrics.sharpe_ratio(returns) == pytest.approx(m / sd * math.sqrt(252))
+    downside = [-0.005, -0.01]
+    dm = sum(downside) / 2
+    dsd = math.sqrt(sum((x - dm) ** 2 for x in downside) / 2)
+    assert risk_metrics.sortino_ratio(returns) == pytest.approx(m / dsd * math.sqrt(252))
+
+
+def test_quantile_selection_matches_sorting():
+    values = [0.03, -0.02, 0.01, -0.05, 0.0, 0.04, -0.01, 0.02, -0.03, 0.05, 0.015]
+    s = pd.Series(values)
+    ordered = sorted(values)
+    n = len(values)
+    for q in (0.0, 0.05, 0.1, 0.33, 0.5, 0.9, 1.0):
+        pos = (n - 1) * q
+        lo = int(pos)
+        hi = min(lo + 1, n - 1)
+        assert s.quantile(q) == ordered[lo]
+        assert s.quantile(q, interpolation='higher') == (ordered[hi] if pos > lo else ordered[lo])
+        assert s.quantile(q, interpolation='linear') == pytest.approx(
+            ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+        )
+    assert s.quantile([0.1, 0.9]) == [s.quantile(0.1), s.quantile(0.9)]
+    with pytest.raises(ValueError):
+        s.quantile(0.5, interpolation='cubic')
+
+
+def test_quantile_uses_heap_only_for_tails(monkeypatch):
+    values = [math.sin(i) for i in range(1000)]
+    s = pd.Series(values)
+    ordered = sorted(values)
+    calls = []
+    nsmallest = pd.heapq.nsmallest
+    monkeypatch.setattr(pd.heapq, 'nsmallest', lambda k, data: calls.append(k) or nsmallest(k, data))
+
+    assert s.quantile(0.05) == ordered[49]
+    assert calls == [51]
+    assert s.quantile(0.5) == ordered[499]
+    assert s.quantile([0.01, 0.05]) == [ordered[9], ordered[49]]
+    assert calls == [51]
+
+
+def test_tail_risk_levels():
+    values = [i / 100 for i in range(-20, 80)]
+    returns = pd.Series(values)
+    tail = risk_metrics.tail_risk(returns)
+    assert set(tail) == set(risk_metrics.TAIL_CONFIDENCES)
+    var95 = risk_metrics.value_at_risk(returns)
+    assert tail[0.95]['var'] == var95 == sorted(values)[int(99 * 0.05)]
+    below = [v for v in values if v <= var95]
+    assert tail[0.95]['cvar'] == pytest.approx(sum(below) / len(below))
+    assert risk_metrics.expected_shortfall(returns, 0.99) == tail[0.99]['cvar']
+    assert tail[0.99]['cvar'] <= tail[0.90]['cvar']
+    assert risk_metrics.calculate_metrics(returns)['cvar'] == tail[0.95]['cvar']
+
+
+@pytest.mark.parametrize('interpolation', pd.INTERPOLATIONS)
+@pytest.mark.parametrize('n', [7, 400])
+def test_tail_risk_orders_once(monkeypatch, interpolation, n):
+    rng = random.Random(n)
+    values = [round(rng.gauss(0, 0.01), 3) for _ in range(n)]
+    returns = pd.Series(values)
+    calls = []
+    real_sorted = sorted
+    monkeypatch.setattr(risk_metrics, 'sorted', lambda v: calls.append(len(v)) or real_sorted(v), raising=False)
+
+    tail = risk_metrics.tail_risk(returns, interpolation=interpolation)
+    assert len(calls) <= 1
+    for confidence in risk_metrics.TAIL_CONFIDENCES:
+        var = returns.quantile(1 - confidence, interpolation=interpolation)
+        below = [v for v in values if v <= var]
+        assert tail[confidence]['var'] == var
+        assert tail[confidence]['cvar'] == pytest.approx(sum(below) / len(below) if below else var)
+    with pytest.raises(ValueError):
+        risk_metrics.tail_risk(returns, interpolation='bogus')
@@ -0,0 +1,46 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import pandas as pd
+import risk_metrics
+
+
+def test_period_metrics_match_single_period_runs():
+    rng = random.Random(5)
+    returns = pd.Series([rng.gauss(0.0003, 0.012) for _ in range(800)])
+    periods = risk_metrics.calculate_period_metrics(returns, risk_free_rate=0.01)
+    assert list(periods) == list(risk_metrics.PERIOD_MAP)
+    for name, days in risk_metrics.PERIOD_MAP.items():
+        expected = risk_metrics.calculate_metrics(returns.iloc[-days:], 0.01)
+        for key, value in expected.items():
+            assert periods[name][key] == pytest.approx(value, rel=1e-6, abs=1e-12)
+
+
+def test_all_periods_cli(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(risk_metrics, 'load_returns', lambda path, days, assume_sorted: pd.Series([0.01, -0.02, 0.005] * 30))
+    assert risk_metrics.main(['--csv', 'unused.csv', '--all-periods']) == 0
+    out = json.loads(capsys.readouterr().out)
+    assert set(out) == set(risk_metrics.PERIOD_MAP)
+
+
+def test_period_metrics_short_and_empty_series():
+    periods = risk_metrics.calculate_period_metrics(pd.Series([]))
+    assert all(metrics == {"sharpe": 0.0, "sortino": 0.0, "max_drawdown": 0.0, "var": 0.0, "cvar": 0.0}
+               for metrics in periods.values())
+    short = pd.Series([0.01, -0.02, 0.03])
+    periods = risk_metrics.calculate_period_metrics(short, {"1W": 5, "2D": 2})
+    assert periods["1W"] == pytest.approx(risk_metrics.calculate_metrics(short))
+    assert periods["2D"] == pytest.approx(risk_metrics.calculate_metrics(short.iloc[-2:]))
+
+
+def test_std_from_sums_clamps_round_off():
+    assert risk_metrics.std_from_sums(0, 0.0, 0.0) == 0.0
+    assert risk_metrics.std_from_sums(4, 4 * 0.1, 4 * 0.1 * 0.1) == 0.0
+    assert risk_metrics.std_from_sums(2, 0.0, 2.0) == pytest.approx(1.0)
@@ -0,0 +1,48 @@
+import pytest
+
+from DragonShield.python_scripts.portfolio_aggregator import PortfolioAggregator
+from DragonShield.python_scripts.position_frame import PositionFrame
+from DragonShield.python_scripts.total_asset_value import calculate_total_asset_value
+from DragonShield.python_scripts.top_positions import top_positions_by_chf
+from DragonShield.python_scripts.currency_exposure import currency_exposure
+from DragonShield.python_scripts.risk_buckets import top_risk_buckets
+
+
+def make_positions():
+    currencies = ["CHF", "USD", "EUR", "GBP", "JPY", "AUD", "CAD", "SEK"]
+    sectors = ["Tech", "Health", "Energy", None]
+    positions = []
+    for idx in range(40):
+        positions.append(
+            {
+                "instrument": f"I{idx}",
+                "quantity": 1 + idx % 7,
+                "current_price": None if idx % 11 == 0 else 10.0 + (idx * 37) % 50,
+                "currency": currencies[idx % len(currencies)].lower(),
+                "sector": sectors[idx % len(sectors)],
+                "issuer": f"Issuer {idx % 5}",
+                "country_code": ["CH", "US", "DE"][idx % 3],
+            }
+        )
+    rates = {cur: 0.5 + i * 0.1 for i, cur in enumerate(currencies) if cur != "CHF"}
+    return positions, rates
+
+
+@pytest.mark.parametrize("as_frame", [False, True])
+def test_aggregates_match_individual_helpers(as_frame):
+    positions, rates = make_positions()
+    source = PositionFrame.from_positions(positions) if as_frame else positions
+
+    result = PortfolioAggregator(rates).aggregate(source)
+
+    assert result.total_chf == calculate_total_asset_value(positions, rates)
+    assert result.top_positions == top_positions_by_chf(positions, rates)
+    assert result.currency_exposure == currency_exposure(positions, rates)
+    for dim in ("sector", "issuer", "country_code"):
+        assert result.risk_buckets[dim] == top_risk_buckets(positions, rates, dimension=dim)
+
+
+def test_missing_rate_raises_key_error():
+    positions = [{"instrument": "X", "quantity": 1, "current_price": 10.0, "currency": "NOK"}]
+    with pytest.raises(KeyError):
+        PortfolioAggregator({}).aggregate(positions)
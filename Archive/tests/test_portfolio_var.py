@@ -0,0 +1,115 @@
+import math
+import random
+import sqlite3
+import sys
+from pathlib import Path
+from statistics import NormalDist
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import portfolio_var as pv
+
+
+def sample_returns():
+    rng = random.Random(9)
+    common = [rng.gauss(0, 0.01) for _ in range(120)]
+    return {
+        1: [c + rng.gauss(0, 0.005) for c in common],
+        2: [0.5 * c + rng.gauss(0, 0.01) for c in common],
+        3: [rng.gauss(0, 0.02) for _ in common],
+    }
+
+
+@pytest.mark.parametrize('ewma, shrinkage', [(None, 0.0), (0.94, 0.0), (None, 0.3), (0.97, 0.5)])
+def test_matches_full_covariance(ewma, shrinkage):
+    returns = sample_returns()
+    exposures = {1: 1000.0, 2: -400.0, 3: 250.0, 99: 50.0}
+    result = pv.parametric_var(returns, exposures, 0.99, horizon=4, ewma_lambda=ewma, shrinkage=shrinkage)
+    ids, cov = pv.covariance_matrix(returns, ewma, shrinkage)
+    e = [exposures[i] for i in ids]
+    cov_e = [sum(cov[a][b] * e[b] for b in range(3)) for a in range(3)]
+    variance = sum(e[a] * cov_e[a] for a in range(3))
+    z = NormalDist().inv_cdf(0.99) * 2
+    assert result.volatility_chf == pytest.approx(math.sqrt(variance))
+    assert result.var_chf == pytest.approx(-z * math.sqrt(variance))
+    for holding, ce in zip(result.holdings, cov_e):
+        assert holding.marginal_var == pytest.approx(-z * ce / math.sqrt(variance))
+    assert sum(h.component_var for h in result.holdings) == pytest.approx(result.var_chf)
+    assert sum(h.contribution_pct for h in result.holdings) == pytest.approx(1.0)
+    assert result.unmodelled == [99]
+
+
+def test_correlation_matrix_diagonal():
+    ids, corr = pv.correlation_matrix(sample_returns())
+    assert ids == [1, 2, 3]
+    assert all(corr[k][k] == pytest.approx(1.0) for k in range(3))
+    assert corr[0][1] > 0.3
+
+
+def test_db_alignment_and_exposures():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(
+        """
+        CREATE TABLE Instruments (instrument_id INTEGER PRIMARY KEY, currency TEXT);
+        CREATE TABLE PositionReports (
+            position_id INTEGER PRIMARY KEY, account_id INTEGER, instrument_id INTEGER,
+            quantity REAL, current_price REAL, report_date TEXT
+        );
+        CREATE TABLE InstrumentPrice (id INTEGER PRIMARY KEY, instrument_id INTEGER, price REAL, currency TEXT, as_of TEXT);
+        CREATE TABLE ExchangeRates (currency_code TEXT, rate_date TEXT, rate_to_chf REAL, is_latest INTEGER);
+        INSERT INTO Instruments VALUES (1, 'CHF'), (2, 'USD'), (3, 'CHF');
+        INSERT INTO ExchangeRates VALUES ('USD', '2025-01-05', 0.9, 1);
+        INSERT INTO PositionReports (account_id, instrument_id, quantity, current_price, report_date) VALUES
+            (1, 1, 100, 1.0, '2024-12-01'),
+            (1, 1, 10, 1.0, '2025-01-05'),
+            (2, 2, 5, 1.0, '2025-01-04'),
+            (2, 3, 7, 3.0, '2025-01-04');
+        INSERT INTO InstrumentPrice (instrument_id, price, currency, as_of) VALUES
+            (1, 10.0, 'CHF', '2025-01-01'),
+            (1, 11.0, 'CHF', '2025-01-02'),
+            (2, 20.0, 'USD', '2025-01-02'),
+            (1, 12.0, 'CHF', '2025-01-03T09:00:00Z'),
+            (1, 12.1, 'CHF', '2025-01-03T17:00:00Z'),
+            (2, 22.0, 'USD', '2025-01-04');
+        """
+    )
+    exposures = pv.current_exposures(conn)
+    assert exposures == {1: pytest.approx(121.0), 2: pytest.approx(5 * 22.0 * 0.9), 3: pytest.approx(21.0)}
+    returns = pv.load_aligned_returns(conn, list(exposures), min_returns=1)
+    assert set(returns) == {1, 2}
+    assert returns[1] == pytest.approx([12.1 / 11 - 1, 0.0])
+    assert returns[2] == pytest.approx([0.0, 0.1])
+    assert pv.load_aligned_returns(conn, [1, 2], days=1, min_returns=1)[2] == pytest.approx([0.1])
+    # Instrument 2 has two quote days, too few for two returns of its own.
+    assert set(pv.load_aligned_returns(conn, [1, 2], min_returns=2)) == {1}
+
+
+def test_short_history_is_unmodelled_not_zero_var():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE InstrumentPrice (id INTEGER PRIMARY KEY, instrument_id INTEGER, price REAL, as_of TEXT)')
+    rng = random.Random(3)
+    for day in range(1, 31):
+        for instrument_id in (1, 2):
+            conn.execute(
+                'INSERT INTO InstrumentPrice (instrument_id, price, as_of) VALUES (?, ?, ?)',
+                (instrument_id, 100 + rng.gauss(0, 1), f'2025-01-{day:02d}'),
+            )
+    # A new listing with a single quote.
+    conn.execute("INSERT INTO InstrumentPrice (instrument_id, price, as_of) VALUES (3, 50.0, '2025-01-30')")
+    exposures = {1: 1000.0, 2: 500.0, 3: 200.0}
+
+    returns = pv.load_aligned_returns(conn, list(exposures))
+    assert {i: len(r) for i, r in returns.items()} == {1: 29, 2: 29}
+    result = pv.parametric_var(returns, exposures)
+    assert result.observations == 29
+    assert result.var_chf < 0
+    assert result.unmodelled == [3]
+
+    # Aligned samples below the minimum are refused instead of giving zero VaR.
+    with pytest.raises(ValueError):
+        pv.parametric_var(pv.load_aligned_returns(conn, list(exposures), min_returns=0), exposures)
+    with pytest.raises(ValueError):
+        pv.parametric_var(returns, exposures, min_returns=30)
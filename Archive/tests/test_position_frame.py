@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from DragonShield.python_scripts.position_frame import PositionFrame
+from DragonShield.python_scripts.total_asset_value import calculate_total_asset_value
+from DragonShield.python_scripts.top_positions import top_positions_by_chf
+from DragonShield.python_scripts.currency_exposure import currency_exposure
+from DragonShield.python_scripts.risk_buckets import top_risk_buckets
+
+
+POSITIONS = [
+    {"instrument": "A", "quantity": 10, "current_price": 5.0, "currency": "CHF", "sector": "Tech", "country_code": "CH"},
+    {"instrument": "B", "quantity": 20, "current_price": 2.0, "currency": "usd", "sector": "Tech", "country_code": "US"},
+    {"instrument": "C", "quantity": 5, "current_price": 100.0, "currency": "EUR", "sector": "Health", "country_code": "DE"},
+    {"instrument": "D", "quantity": 1, "current_price": 200.0, "currency": "USD", "sector": None, "country_code": "US"},
+    {"instrument": "E", "quantity": 3, "current_price": None, "currency": "GBP", "sector": "Energy"},
+]
+RATES = {"USD": 0.9, "EUR": 0.95}
+
+
+def test_frame_matches_mapping_helpers():
+    frame = PositionFrame.from_positions(POSITIONS)
+
+    assert len(frame) == len(POSITIONS)
+    assert frame.currencies == ["CHF", "USD", "EUR", "GBP"]
+    assert calculate_total_asset_value(frame, RATES) == pytest.approx(
+        calculate_total_asset_value(POSITIONS, RATES)
+    )
+    assert top_positions_by_chf(frame, RATES, top_n=3) == top_positions_by_chf(POSITIONS, RATES, top_n=3)
+    assert currency_exposure(frame, RATES, top_n=2) == pytest.approx(currency_exposure(POSITIONS, RATES, top_n=2))
+    for dimension in ("sector", "country_code", "currency"):
+        assert top_risk_buckets(frame, RATES, dimension=dimension) == pytest.approx(
+            top_risk_buckets(POSITIONS, RATES, dimension=dimension)
+        )
+
+
+def test_frame_missing_rate_behaviour():
+    positions = POSITIONS + [{"instrument": "F", "quantity": 1, "current_price": 10.0, "currency": "JPY"}]
+    frame = PositionFrame.from_positions(positions)
+
+    with pytest.raises(KeyError):
+        calculate_total_asset_value(frame, RATES)
+    with pytest.raises(KeyError):
+        currency_exposure(frame, RATES)
+    assert all(p["instrument"] != "F" for p in top_positions_by_chf(frame, RATES))
+    assert all(b["label"] != "JPY" for b in top_risk_buckets(frame, RATES, dimension="currency"))
+
+
+def test_frame_from_sqlite_rows():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE p (instrument TEXT, quantity REAL, current_price REAL, currency TEXT, sector TEXT)")
+    conn.executemany(
+        "INSERT INTO p VALUES (?,?,?,?,?)",
+        [(p["instrument"], p["quantity"], p["current_price"], p["currency"], p["sector"]) for p in POSITIONS],
+    )
+    cur = conn.execute("SELECT instrument, quantity, current_price, currency, sector FROM p")
+    frame = PositionFrame.from_rows(cur, [d[0] for d in cur.description], dimensions=("sector",))
+
+    buckets = top_risk_buckets(frame, RATES, dimension="sector")
+    assert [b["label"] for b in buckets] == [b["label"] for b in top_risk_buckets(POSITIONS, RATES)]
+    with pytest.raises(KeyError):
+        top_risk_buckets(frame, RATES, dimension="issuer")
+    conn.close()
@@ -0,0 +1,40 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import pandas as pd
+import risk_metrics
+import rolling_risk
+
+
+def test_rolling_matches_calculate_metrics():
+    rng = random.Random(3)
+    returns = [rng.gauss(0.0005, 0.01) for _ in range(300)]
+    returns[100:110] = [0.0] * 10
+    rolled = rolling_risk.rolling_metrics(returns, 40, risk_free_rate=0.02)
+    assert len(rolled) == len(returns) - 39
+    for row in rolled[::7]:
+        window = pd.Series(returns[row['end'] - 39: row['end'] + 1])
+        expected = risk_metrics.calculate_metrics(window, 0.02)
+        assert row['sharpe'] == pytest.approx(expected['sharpe'], rel=1e-6)
+        assert row['sortino'] == pytest.approx(expected['sortino'], rel=1e-6)
+        assert row['max_drawdown'] == pytest.approx(expected['max_drawdown'], abs=1e-12)
+        assert row['var'] == expected['var']
+        assert row['cvar'] == pytest.approx(expected['cvar'], rel=1e-12)
+        assert set(row) == set(expected) | {'end'}
+
+
+def test_constant_window_has_zero_ratios():
+    rolled = rolling_risk.rolling_metrics([0.01, -0.02, 0.001, 0.001, 0.001], 3)
+    assert rolled[-1]['sharpe'] == 0.0
+    assert rolled[-1]['sortino'] == 0.0
+    assert rolled[-1]['max_drawdown'] == 0.0
+    assert rolling_risk.rolling_metrics([0.01], 3) == []
+    with pytest.raises(ValueError):
+        rolling_risk.rolling_metrics([0.01], 0)
+
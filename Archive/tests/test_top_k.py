@@ -0,0 +1,38 @@
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+from DragonShield.python_scripts.top_k import TopK, top_k
+from DragonShield.python_scripts.stale_accounts import Account, top_stale_accounts
+
+
+def test_matches_stable_sort_in_both_directions():
+    rng = random.Random(7)
+    items = [(rng.randint(0, 20), idx) for idx in range(500)]
+    for k in (0, 1, 10, 600):
+        assert top_k(items, k, key=lambda x: x[0]) == sorted(items, key=lambda x: x[0], reverse=True)[:k]
+        assert top_k(items, k, key=lambda x: x[0], reverse=False) == sorted(items, key=lambda x: x[0])[:k]
+
+
+def test_streams_cursor_and_tracks_rank():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE v (name TEXT, value REAL)")
+    conn.executemany("INSERT INTO v VALUES (?, ?)", [(f"n{i}", float(i % 50)) for i in range(200)])
+
+    best = TopK(3, key=lambda row: row[1], rank_for=45.0)
+    best.extend(conn.execute("SELECT name, value FROM v"))
+
+    assert best.count == 200
+    assert [row[0] for row in best.results()] == ["n49", "n99", "n149"]
+    assert best.rank == 4 * 4 + 1  # values 46..49 appear four times each
+    conn.close()
+
+
+def test_stale_accounts_limit():
+    today = datetime(2025, 1, 1)
+    accounts = [Account(name, today - timedelta(days=days)) for name, days in
+                [("B", 10), ("A", 40), ("C", 40), ("D", 5), ("E", 60)]]
+    accounts.append(Account("N", None))
+
+    assert top_stale_accounts(accounts, limit=3) == top_stale_accounts(accounts)[:3]
+    assert [a.name for a in top_stale_accounts(iter(accounts), limit=2)] == ["E", "A"]
@@ -0,0 +1,59 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parents[2] / 'DragonShield' / 'python_scripts'
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import var_simulation
+
+
+def history():
+    rng = random.Random(11)
+    return [rng.gauss(0.0004, 0.01) for _ in range(500)]
+
+
+def test_results_independent_of_chunking_and_workers():
+    returns = history()
+    serial = var_simulation.simulate_var(returns, paths=4000, chunk_size=500, seed=3)
+    pooled = var_simulation.simulate_var(returns, paths=4000, chunk_size=500, seed=3, workers=2)
+    assert serial == pooled
+    assert serial.cvar <= serial.var < 0
+    assert serial.var_ci[0] <= serial.var <= serial.var_ci[1]
+    assert serial.cvar_ci[0] < serial.cvar_ci[1]
+
+
+@pytest.mark.parametrize('method', ['normal', 'student_t'])
+def test_parametric_var_near_normal_quantile(method):
+    returns = history()
+    result = var_simulation.simulate_var(returns, paths=20000, method=method, chunk_size=5000, seed=1)
+    mean = sum(returns) / len(returns)
+    std = (sum((r - mean) ** 2 for r in returns) / len(returns)) ** 0.5
+    assert result.var == pytest.approx(mean - 1.645 * std, rel=0.15)
+
+
+def test_horizon_and_validation():
+    returns = history()
+    one = var_simulation.simulate_var(returns, paths=2000, seed=2)
+    ten = var_simulation.simulate_var(returns, paths=2000, horizon=10, block_size=3, seed=2)
+    assert ten.var < one.var
+    assert ten.horizon == 10
+    with pytest.raises(ValueError):
+        var_simulation.simulate_var(returns, method='historical')
+    with pytest.raises(ValueError):
+        var_simulation.simulate_var([], paths=10)
+    for bad in ({'paths': 0}, {'confidence': 1.0}, {'confidence': 0.0}, {'ci_level': 1.0}, {'chunk_size': 0}):
+        with pytest.raises(ValueError):
+            var_simulation.simulate_var(returns, **{'paths': 10, **bad})
+    assert var_simulation.simulate_var(returns, paths=1).paths == 1
+
+
+def test_cli_rejects_invalid_paths(tmp_path, capsys):
+    path = tmp_path / 'returns.csv'
+    path.write_text('date,return\n2025-01-01,0.01\n2025-01-02,-0.02\n')
+    with pytest.raises(SystemExit) as exc:
+        var_simulation.main(['--csv', str(path), '--paths', '0'])
+    assert exc.value.code == 2
+    assert 'paths must be positive' in capsys.readouterr().err
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Compute ``risk_metrics.calculate_metrics`` for many return series at once.
+
+Sources are either every ``*.csv`` in a directory (same layout as
+``risk_metrics --csv``) or instruments whose daily returns are derived from
+``InstrumentPrice`` history. Series are valued in chunks on a process pool
+and every result is written to stdout as one NDJSON line, in input order,
+as soon as its chunk is done.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from risk_metrics import PERIOD_MAP, calculate_metrics, load_returns
+
+DB_PATH = (
+    "/Users/renekeller/Library/Containers/com.rene.DragonShield/Data/Library/Application Support/DragonShield"
+    "/dragonshield.sqlite"
+)
+
+# (id, csv path or None, prices or None)
+Job = Tuple[str, Optional[str], Optional[List[float]]]
+
+
+def csv_jobs(directory: str) -> Iterator[Job]:
+    """Yield one job per ``*.csv`` file in ``directory``, sorted by name."""
+    for path in sorted(Path(directory).glob("*.csv")):
+        yield path.stem, str(path), None
+
+
+def instrument_jobs(
+    conn: sqlite3.Connection, instrument_ids: Sequence[int] = (), days: Optional[int] = None
+) -> Iterator[Job]:
+    """Yield one job per instrument with its daily closing prices.
+
+    The last ``InstrumentPrice`` row of each day is that day's price. All
+    instruments are read with one ordered query and grouped while streaming.
+    With ``days`` only the last ``days + 1`` prices are kept, so a job never
+    carries more history than its returns window.
+    """
+    sql = """
+        SELECT instrument_id, substr(as_of, 1, 10) AS d, price
+          FROM InstrumentPrice
+         WHERE price IS NOT NULL
+    """
+    params: List[int] = list(instrument_ids)
+    if params:
+        sql += f" AND instrument_id IN ({','.join('?' * len(params))})"
+    sql += " ORDER BY instrument_id, as_of, id"
+    keep = days + 1 if days is not None else None
+    current: Optional[int] = None
+    last_date: Optional[str] = None
+    prices: deque = deque(maxlen=keep)
+    for instrument_id, date, price in conn.execute(sql, params):
+        if instrument_id != current:
+            if current is not None:
+                yield str(current), None, list(prices)
+            current, last_date, prices = instrument_id, None, deque(maxlen=keep)
+        if date == last_date:
+            prices[-1] = price
+        else:
+            prices.append(price)
+            last_date = date
+    if current is not None:
+        yield str(current), None, list(prices)
+
+
+def prices_to_returns(prices: Sequence[float]) -> pd.Series:
+    return pd.Series(b / a - 1 for a, b in zip(prices, prices[1:]) if a)
+
+
+def _metrics_for(job: Job, days: int, risk_free_rate: float, assume_sorted: bool) -> Dict[str, Any]:
+    key, path, prices = job
+    try:
+        if path is not None:
+            returns = load_returns(path, days, assume_sorted)
+        else:
+            returns = prices_to_returns(prices[-(days + 1):])
+        return {"id": key, "observations": len(returns), "metrics": calculate_metrics(returns, risk_free_rate)}
+    except Exception as exc:  # report and continue with the other series
+        return {"id": key, "error": str(exc)}
+
+
+def _metrics_chunk(jobs: List[Job], days: int, risk_free_rate: float, assume_sorted: bool) -> List[Dict[str, Any]]:
+    return [_metrics_for(job, days, risk_free_rate, assume_sorted) for job in jobs]
+
+
+def run_batch(
+    jobs: Iterable[Job],
+    days: int,
+    risk_free_rate: float = 0.0,
+    workers: int = 1,
+    chunksize: int = 16,
+    assume_sorted: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Yield one result record per job, in input order.
+
+    With ``workers > 1`` chunks of ``chunksize`` jobs run on a process pool
+    with at most two chunks queued per worker, so the input is never
+    materialised as a whole. ``assume_sorted`` is passed on to
+    ``load_returns`` for CSV jobs.
+    """
+    it = iter(jobs)
+    chunks = iter(lambda: list(islice(it, max(1, chunksize))), [])
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _metrics_chunk(chunk, days, risk_free_rate, assume_sorted)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_metrics_chunk, chunk, days, risk_free_rate, assume_sorted))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compute risk metrics for many return series")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directory of CSV files with date and return columns")
+    source.add_argument("--db", nargs="?", const=DB_PATH, help="Read InstrumentPrice history from database")
+    parser.add_argument("--instrument-ids", type=int, nargs="*", default=[], help="Instruments to include (default: all)")
+    parser.add_argument("--period", default="1Y", choices=list(PERIOD_MAP), help="Lookback period")
+    parser.add_argument("--risk-free", type=float, default=0.0, help="Annual risk free rate")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunksize", type=int, default=16, help="Series per worker task")
+    parser.add_argument("--assume-sorted", action="store_true", help="CSV files are sorted by date; read only their last rows")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db) if args.db else None
+    try:
+        days = PERIOD_MAP[args.period]
+        jobs = instrument_jobs(conn, args.instrument_ids, days) if conn is not None else csv_jobs(args.dir)
+        failed = 0
+        for record in run_batch(jobs, days, args.risk_free, args.workers, args.chunksize, args.assume_sorted):
+            failed += "error" in record
+            sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+    finally:
+        if conn is not None:
+            conn.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
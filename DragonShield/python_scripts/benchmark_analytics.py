@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Benchmark the portfolio analytics helpers on synthetic portfolios.
+
+Run from the repository root::
+
+    python -m DragonShield.python_scripts.benchmark_analytics --sizes 1000,100000
+    python -m DragonShield.python_scripts.benchmark_analytics --save-baseline bench.json
+    python -m DragonShield.python_scripts.benchmark_analytics --baseline bench.json
+
+Every helper is timed with ``time.perf_counter`` (best of ``--repeat`` runs)
+and measured once more under ``tracemalloc`` for its peak allocation. With
+``--baseline`` the run is compared against stored results and the exit code
+is 1 when a timing or peak exceeds the baseline by more than ``--tolerance``.
+Results are only compared with baseline entries recorded with the same run
+parameters (portfolio shape, seed, ``--frame`` and ``--summation``); a
+baseline taken with other parameters is refused with exit code 2.
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple
+
+from .currency_exposure import currency_exposure
+from .money_sum import SUMMATION_MODES
+from .position_frame import PositionFrame
+from .risk_buckets import top_risk_buckets
+from .stale_accounts import Account, top_stale_accounts
+from .top_positions import top_positions_by_chf
+from .total_asset_value import calculate_total_asset_value
+
+DEFAULT_SIZES: Tuple[int, ...] = (1_000, 100_000, 1_000_000)
+CURRENCY_POOL: Tuple[str, ...] = (
+    "CHF", "USD", "EUR", "GBP", "JPY", "CAD", "AUD", "SEK", "NOK", "DKK", "HKD", "SGD",
+)
+COUNTRY_POOL: Tuple[str, ...] = ("CH", "US", "DE", "FR", "GB", "JP", "CA", "AU", "NL", "SE")
+
+
+def generate_portfolio(
+    n: int,
+    currencies: int = 6,
+    sectors: int = 20,
+    missing_price_share: float = 0.05,
+    seed: int = 0,
+) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """Return ``n`` reproducible positions and the matching CHF rates.
+
+    ``currencies`` (at most ``len(CURRENCY_POOL)``) and ``sectors`` set the
+    label cardinalities; ``missing_price_share`` of the positions get
+    ``current_price=None``.
+    """
+    rng = random.Random(seed)
+    codes = CURRENCY_POOL[: max(1, min(currencies, len(CURRENCY_POOL)))]
+    rates = {c: round(rng.uniform(0.005, 1.5), 6) for c in codes if c != "CHF"}
+    sector_names = [f"Sector {i:03d}" for i in range(sectors)]
+    issuers = max(1, n // 10)
+    positions = []
+    for idx in range(n):
+        price = None if rng.random() < missing_price_share else round(rng.lognormvariate(4, 1), 4)
+        positions.append(
+            {
+                "instrument": f"INST{idx:07d}",
+                "quantity": rng.randint(1, 5_000),
+                "current_price": price,
+                "currency": rng.choice(codes),
+                "sector": rng.choice(sector_names),
+                "issuer": f"Issuer {rng.randrange(issuers):06d}",
+                "country_code": rng.choice(COUNTRY_POOL),
+            }
+        )
+    return positions, rates
+
+
+def generate_accounts(n: int, seed: int = 0) -> List[Account]:
+    """Return ``n`` accounts with random (sometimes missing) update times."""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    return [
+        Account(
+            name=f"Account {idx:07d}",
+            earliest_instrument_last_updated_at=(
+                None if rng.random() < 0.05 else start + timedelta(minutes=rng.randrange(3_000_000))
+            ),
+        )
+        for idx in range(n)
+    ]
+
+
+def _benchmarks(
+    positions: Any, rates: Mapping[str, float], accounts: Sequence[Account], summation: str
+) -> Dict[str, Callable[[], Any]]:
+    return {
+        "total_asset_value": lambda: calculate_total_asset_value(positions, rates, summation),
+        "top_positions": lambda: top_positions_by_chf(positions, rates),
+        "currency_exposure": lambda: currency_exposure(positions, rates, summation=summation),
+        "risk_buckets": lambda: top_risk_buckets(positions, rates, "sector", summation=summation),
+        "stale_accounts": lambda: top_stale_accounts(accounts, 10),
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int = 3) -> Tuple[float, int]:
+    """Return ``(best seconds, peak bytes)`` for calling ``func``."""
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_suite(
+    sizes: Sequence[int],
+    currencies: int = 6,
+    sectors: int = 20,
+    missing_price_share: float = 0.05,
+    seed: int = 0,
+    repeat: int = 3,
+    use_frame: bool = False,
+    summation: str = "float",
+) -> List[Dict[str, Any]]:
+    """Benchmark every helper at every size and return one record per pair.
+
+    Each record carries the run ``params`` it was measured with.
+    """
+    params = {
+        "currencies": currencies,
+        "sectors": sectors,
+        "missing_price_share": missing_price_share,
+        "seed": seed,
+        "frame": use_frame,
+        "summation": summation,
+    }
+    results = []
+    for size in sizes:
+        positions, rates = generate_portfolio(size, currencies, sectors, missing_price_share, seed)
+        accounts = generate_accounts(size, seed)
+        source = PositionFrame.from_positions(positions, ("sector",)) if use_frame else positions
+        for name, func in _benchmarks(source, rates, accounts, summation).items():
+            seconds, peak = measure(func, repeat)
+            results.append(
+                {
+                    "function": name,
+                    "size": size,
+                    "seconds": seconds,
+                    "rows_per_sec": size / seconds if seconds else float("inf"),
+                    "peak_bytes": peak,
+                    "params": params,
+                }
+            )
+    return results
+
+
+def compare(
+    results: Sequence[Mapping[str, Any]], baseline: Sequence[Mapping[str, Any]], tolerance: float = 0.25
+) -> List[str]:
+    """Return a message for every result slower or larger than its baseline.
+
+    A result regresses when ``seconds`` or ``peak_bytes`` exceeds the baseline
+    by more than ``tolerance`` (a fraction). Results are matched on function,
+    size and run ``params``; pairs missing from the baseline are ignored.
+    Raises ``ValueError`` when the baseline has a function and size only
+    under other run parameters.
+    """
+    reference = {_baseline_key(b): b for b in baseline}
+    measured = {(b["function"], b["size"]) for b in baseline}
+    regressions = []
+    for result in results:
+        base = reference.get(_baseline_key(result))
+        if base is None:
+            if (result["function"], result["size"]) in measured:
+                raise ValueError(
+                    f"Baseline for {result['function']} @ {result['size']} was recorded with other run "
+                    f"parameters than {result.get('params', {})}"
+                )
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            limit = base[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{result['function']} @ {result['size']}: {metric} {result[metric]:.6g} "
+                    f"> {base[metric]:.6g} (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+def _baseline_key(record: Mapping[str, Any]) -> Tuple[Any, ...]:
+    params = record.get("params", {})
+    return (record["function"], record["size"], tuple(sorted(params.items())))
+
+
+def _print_table(results: Sequence[Mapping[str, Any]]) -> None:
+    print(f"{'function':<20}{'size':>10}{'seconds':>12}{'rows/s':>14}{'peak KiB':>12}")
+    for r in results:
+        print(
+            f"{r['function']:<20}{r['size']:>10}{r['seconds']:>12.4f}"
+            f"{r['rows_per_sec']:>14.0f}{r['peak_bytes'] / 1024:>12.1f}"
+        )
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the portfolio analytics helpers")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(s) for s in DEFAULT_SIZES),
+        help="Comma separated portfolio sizes",
+    )
+    parser.add_argument("--currencies", type=int, default=6, help="Number of distinct currencies")
+    parser.add_argument("--sectors", type=int, default=20, help="Number of distinct sectors")
+    parser.add_argument("--missing-price-share", type=float, default=0.05, help="Share of positions without a price")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per function (best is kept)")
+    parser.add_argument("--frame", action="store_true", help="Benchmark the PositionFrame code paths")
+    parser.add_argument("--summation", default="float", choices=list(SUMMATION_MODES), help="Summation mode")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results to PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare the results against PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression as a fraction")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = run_suite(
+        sizes,
+        args.currencies,
+        args.sectors,
+        args.missing_price_share,
+        args.seed,
+        args.repeat,
+        args.frame,
+        args.summation,
+    )
+    _print_table(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        try:
+            regressions = compare(results, baseline, args.tolerance)
+        except ValueError as exc:
+            print(f"Cannot compare: {exc}")
+            return 2
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,28 @@
 # python_scripts/credit_suisse_parser.py
 
-# MARK: - Version 0.11
+# MARK: - Version 0.18
 # MARK: - History
 # - 0.9 -> 0.10: Added CSV support and institution metadata.
 # - 0.10 -> 0.11: Return explicit exit codes on errors.
+# - 0.11 -> 0.12: Look up instruments through an in-memory InstrumentIndex.
+# - 0.12 -> 0.13: Stream XLSX rows in read-only, values-only mode.
+# - 0.13 -> 0.14: Decode rows with a decoder compiled from the header row.
+# - 0.14 -> 0.15: Add iter_statement_events/parse_statement; warnings go to logs.
+# - 0.15 -> 0.16: Add --ndjson streaming output.
+# - 0.16 -> 0.17: Stream CSV rows like XLSX rows.
+# - 0.17 -> 0.18: Check the InstrumentIndex data_version once per statement, not per lookup.
 
 import sys
 import re
+import argparse
 import openpyxl
 import json
 import os
 import csv
 import sqlite3
 from datetime import datetime
-from typing import Dict, Tuple, Any, List, Set, Optional
+from operator import itemgetter
+from typing import Callable, Dict, Tuple, Any, Iterator, List, Sequence, Set, Optional, TextIO
 from openpyxl.cell import Cell, MergedCell # Import Cell types for isinstance checks
 
 # --- Configuration Section (Keep as is) ---
@@ -43,11 +52,14 @@ COL_BRANCHE = "Branche"
 COL_FAELLIGKEIT = "Fälligkeit"
 COL_DEVISENKURS = "Devisenkurs"
 COL_DATUM_ZEIT_KURS = "Datum/Zeit des Kurses (Ortszeit der Börse)"
+COL_WHRG = "Whrg."
 
 HEADER_ROW_NUMBER = 8
 LINE_6_PORTFOLIO_NR_LINE_NUMBER = 6
 IDX_WHRG_NOMINAL_FALLBACK = 2 # Fallback if specific header isn't found by name
 IDX_WHRG_KURS_FALLBACK = 7    # Fallback
+IDX_VALOR_FALLBACK = 5
+IDX_ISIN_FALLBACK = 22
 
 # Default database path can be overridden by the DRAGONSHIELD_DB_PATH environment variable
 DB_PATH = os.environ.get(
@@ -143,6 +155,73 @@ def get_mapped_instrument_group(anlagekategorie: str, asset_unterkategorie: str,
     if norm_anlage or norm_unter: unmapped_pairs.add((norm_anlage, norm_unter))
     return f"UNMAPPED_CATEGORY"
 
+# --- Row decoding ---
+RowDecoder = Callable[[Sequence[Any]], Dict[str, Any]]
+
+def _as_text(cell_content: Any) -> str:
+    return str(cell_content).strip() if cell_content is not None else ""
+
+def _as_currency(cell_content: Any) -> Optional[str]:
+    return str(cell_content).strip() if cell_content is not None else None
+
+def _as_maturity_date(cell_content: Any) -> Optional[str]:
+    return parse_date_from_excel_cell(cell_content, input_format='%d.%m.%y')
+
+# (field, header, fallback column index, converter) decoded from every data row.
+# "Whrg." appears twice: the first is the nominal currency, the second the price currency.
+ROW_FIELDS: Tuple[Tuple[str, str, Optional[int], Callable[[Any], Any]], ...] = (
+    ("anlagekategorie", COL_ANLAGEKATEGORIE, None, _as_text),
+    ("asset_unterkategorie", COL_ASSET_UNTERKATEGORIE, None, _as_text),
+    ("beschreibung", COL_BESCHREIBUNG, None, _as_text),
+    ("valor", COL_VALOR, None, _as_text),
+    ("isin", COL_ISIN, None, _as_text),
+    ("symbol", COL_SYMBOL, None, _as_text),
+    ("quantity", COL_ANZAHL_NOMINAL, None, parse_number_from_cell_value),
+    ("cost_price", COL_KOSTEN_KURS, None, parse_number_from_cell_value),
+    ("cost_price_currency", COL_KOSTEN_KURS_WHRG, None, _as_text),
+    ("current_price", COL_AKTUELLER_KURS, None, parse_number_from_cell_value),
+    ("value_in_chf", COL_WERT_CHF, None, parse_number_from_cell_value),
+    ("fx_rate_to_chf", COL_DEVISENKURS, None, parse_number_from_cell_value),
+    ("sector", COL_BRANCHE, None, _as_text),
+    ("maturity_date", COL_FAELLIGKEIT, None, _as_maturity_date),
+    ("price_date", COL_DATUM_ZEIT_KURS, None, parse_date_from_excel_cell),
+    ("nominal_currency", COL_WHRG, IDX_WHRG_NOMINAL_FALLBACK, _as_currency),
+    ("price_currency", COL_WHRG, IDX_WHRG_KURS_FALLBACK, _as_currency),
+    # Identifiers for the instrument lookup, which also reads fixed positions without a header.
+    ("lookup_valor", COL_VALOR, IDX_VALOR_FALLBACK, _as_text),
+    ("lookup_isin", COL_ISIN, IDX_ISIN_FALLBACK, _as_text),
+)
+
+def compile_row_decoder(headers: Sequence[str]) -> RowDecoder:
+    """Resolve the header layout once and return a decoder for data rows.
+
+    The decoder maps a row of cell values to a dict keyed by the ROW_FIELDS
+    names. Columns that are neither in the header nor covered by a fallback
+    index, and cells beyond the end of a short row, decode from ``None``.
+    """
+    header_map = {name: idx for idx, name in enumerate(headers)}
+    whrg_indices = iter([i for i, name in enumerate(headers) if name == COL_WHRG])
+    indices: List[Optional[int]] = []
+    for _, header, fallback, _ in ROW_FIELDS:
+        if header == COL_WHRG:
+            indices.append(next(whrg_indices, fallback))
+        else:
+            indices.append(header_map.get(header, fallback))
+
+    # Rows are cut or padded to ``width`` cells plus one empty cell that
+    # stands in for every unresolved column.
+    width = max((i for i in indices if i is not None), default=-1) + 1
+    getter = itemgetter(*[width if i is None else i for i in indices])
+    padding = (None,) * (width + 1)
+    names = tuple(field for field, _, _, _ in ROW_FIELDS)
+    converters = tuple(convert for _, _, _, convert in ROW_FIELDS)
+
+    def decode(row: Sequence[Any]) -> Dict[str, Any]:
+        cells = (*row[:width], *padding[min(len(row), width):])
+        return {name: convert(value) for name, convert, value in zip(names, converters, getter(cells))}
+
+    return decode
+
 # --- Instrument lookup helpers ---
 def _sanitize(text: str) -> str:
     return "".join(c for c in text if c.isalnum()).upper()
@@ -163,15 +242,54 @@ def find_instrument_id_by_isin(conn: sqlite3.Connection, isin: str) -> Optional[
             return inst_id
     return None
 
-def lookup_instrument_id(conn: Optional[sqlite3.Connection], name: str, valor: str, isin: str) -> Tuple[Optional[int], str]:
-    if conn is None:
+class InstrumentIndex:
+    """Sanitised valor and ISIN -> instrument_id maps of the Instruments table.
+
+    Built with one query per identifier; the first instrument wins when two
+    share an identifier, like the row-by-row lookups. Lookups are plain dict
+    reads. ``check_version()`` compares ``PRAGMA data_version`` with the value
+    seen at build time and rebuilds the maps when another connection has
+    committed changes; ``iter_statement_events`` calls it once per statement.
+    Changes committed through ``conn`` itself do not change ``data_version``
+    and need an explicit ``refresh()``.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.by_valor: Dict[str, int] = {}
+        self.by_isin: Dict[str, int] = {}
+        self._data_version: Optional[int] = None
+        self.refresh()
+
+    def refresh(self) -> None:
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self.by_valor = {}
+        for inst_id, db_valor in self.conn.execute("SELECT instrument_id, valor_nr FROM Instruments WHERE valor_nr IS NOT NULL"):
+            self.by_valor.setdefault(_sanitize(str(db_valor)), inst_id)
+        self.by_isin = {}
+        for inst_id, db_isin in self.conn.execute("SELECT instrument_id, isin FROM Instruments WHERE isin IS NOT NULL"):
+            self.by_isin.setdefault(_sanitize(str(db_isin)), inst_id)
+
+    def check_version(self) -> None:
+        if self.conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self.refresh()
+
+    def find_by_valor(self, valor: str) -> Optional[int]:
+        return self.by_valor.get(_sanitize(valor))
+
+    def find_by_isin(self, isin: str) -> Optional[int]:
+        return self.by_isin.get(_sanitize(isin))
+
+def lookup_instrument_id(conn: Optional[sqlite3.Connection], name: str, valor: str, isin: str,
+                         index: Optional[InstrumentIndex] = None) -> Tuple[Optional[int], str]:
+    if index is None and conn is None:
         return None, ""
     if valor:
-        val_id = find_instrument_id_by_valor(conn, valor)
+        val_id = index.find_by_valor(valor) if index is not None else find_instrument_id_by_valor(conn, valor)
         if val_id is not None:
             return val_id, "Valor"
     if isin:
-        isin_id = find_instrument_id_by_isin(conn, isin)
+        isin_id = index.find_by_isin(isin) if index is not None else find_instrument_id_by_isin(conn, isin)
         if isin_id is not None:
             return isin_id, "ISIN"
     return None, ""
@@ -182,9 +300,21 @@ EXIT_FILE_NOT_FOUND = 1
 EXIT_DEPENDENCY_ERROR = 2
 EXIT_GENERAL_ERROR = 3
 
-def process_file(filepath: str, sheet_name_or_index: Optional[Any] = None) -> int:
-    # (Initialization of parsed_data and stats variables remains the same)
-    parsed_data = {
+# Kinds of events yielded by iter_statement_events
+EVENT_RECORD = "record"
+EVENT_LOG = "log"
+EVENT_SUMMARY = "summary"
+StatementEvent = Tuple[str, Any]
+
+def iter_statement_events(filepath: str, sheet_name_or_index: Optional[Any] = None,
+                          instrument_index: Optional[InstrumentIndex] = None) -> Iterator[StatementEvent]:
+    """Parse a statement and yield ``(kind, payload)`` events as rows stream.
+
+    ``EVENT_RECORD`` carries one record dict and ``EVENT_LOG`` one log
+    message. The last event is ``EVENT_SUMMARY``: the statement fields, the
+    ``summary`` counters and the ``exit_code``.
+    """
+    statement: Dict[str, Any] = {
         "main_custody_account_nr": None,
         "institution_name": "Credit-Suisse",
         "parsed_statement_date": parse_statement_date_from_filename(filepath.split('/')[-1]),  # Pass only filename
@@ -200,105 +330,86 @@ def process_file(filepath: str, sheet_name_or_index: Optional[Any] = None) -> in
             "unmatched_categories": [],
             "unmatched_instruments": 0,
         },
-        "records": [],
-        "logs": [],
     }
     main_custody_account_nr_internal: Optional[str] = None
     unmapped_category_pairs_internal: Set[Tuple[str,str]] = set()
     unmatched_instruments_internal = 0
 
+    # A shared index keeps its own connection open across files.
     conn: Optional[sqlite3.Connection] = None
-    if os.path.exists(DB_PATH):
-        try:
-            conn = sqlite3.connect(DB_PATH)
-        except Exception as e:
-            parsed_data["logs"].append(f"Failed to open database at {DB_PATH}: {e}")
+    index = instrument_index
+    if index is not None:
+        index.check_version()
     else:
-        parsed_data["logs"].append(f"Database not found at {DB_PATH}; instrument lookup skipped")
+        if os.path.exists(DB_PATH):
+            try:
+                conn = sqlite3.connect(DB_PATH)
+                index = InstrumentIndex(conn)
+            except Exception as e:
+                yield EVENT_LOG, f"Failed to open database at {DB_PATH}: {e}"
+        else:
+            yield EVENT_LOG, f"Database not found at {DB_PATH}; instrument lookup skipped"
 
     exit_code = EXIT_SUCCESS
+    workbook = None
+    csv_file = None
     try:
-        rows: List[List[Any]]
+        # Rows are consumed from one iterator: lines 6 and 8 are captured as
+        # they pass, the remaining rows are the data rows.
+        row_stream: Iterator[Tuple[int, Sequence[Any]]]
         if filepath.lower().endswith('.csv'):
-            with open(filepath, newline='', encoding='utf-8-sig') as f:
-                reader = csv.reader(f)
-                rows = [list(r) for r in reader]
-            sheet = None
-            max_column = max(len(r) for r in rows) if rows else 0
-            def cell(row: int, col: int):
-                return rows[row-1][col-1] if 0 <= row-1 < len(rows) and 0 <= col-1 < len(rows[row-1]) else None
+            csv_file = open(filepath, newline='', encoding='utf-8-sig')
+            row_stream = enumerate(csv.reader(csv_file), start=1)
         else:
-            workbook = openpyxl.load_workbook(filepath, data_only=True)
+            workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
             sheet = workbook[sheet_name_or_index] if sheet_name_or_index is not None and isinstance(sheet_name_or_index, str) else \
                     workbook.worksheets[sheet_name_or_index] if sheet_name_or_index is not None and isinstance(sheet_name_or_index, int) else \
                     workbook.active
-            max_column = sheet.max_column
-            def cell(row: int, col: int):
-                return sheet.cell(row=row, column=col).value
-        
+            sheet.reset_dimensions()  # stored dimensions of exported sheets are often wrong
+            row_stream = enumerate(sheet.iter_rows(values_only=True), start=1)
+
+        line_6_values: Sequence[Any] = ()
+        header_values: Sequence[Any] = ()
+        for row_number, values in row_stream:
+            if row_number == LINE_6_PORTFOLIO_NR_LINE_NUMBER:
+                line_6_values = values
+            elif row_number == HEADER_ROW_NUMBER:
+                header_values = values
+                break
+
         # (Portfolio Nr extraction logic remains the same)
-        for col_idx in range(1, min(max_column + 1, 6)):
-            cell_val_line6 = cell(LINE_6_PORTFOLIO_NR_LINE_NUMBER, col_idx)
+        for cell_val_line6 in line_6_values[:5]:
             parsed_nr = parse_portfolio_nr_from_cell_value(cell_val_line6)
             if parsed_nr:
                 main_custody_account_nr_internal = parsed_nr
-                parsed_data["main_custody_account_nr"] = main_custody_account_nr_internal
+                statement["main_custody_account_nr"] = main_custody_account_nr_internal
                 break
         if not main_custody_account_nr_internal:
-            print(f"Warning: Could not parse Account Nr from Line {LINE_6_PORTFOLIO_NR_LINE_NUMBER}.\n")
+            yield EVENT_LOG, f"Warning: Could not parse Account Nr from Line {LINE_6_PORTFOLIO_NR_LINE_NUMBER}."
 
+        headers = [str(h).strip() if h is not None else "" for h in header_values]
+        decode_row = compile_row_decoder(headers)
 
-        if sheet is None:
-            header_cells = [cell(HEADER_ROW_NUMBER, i) for i in range(1, max_column + 1)]
-            headers = [str(h).strip() if h is not None else "" for h in header_cells]
-        else:
-            header_cells = [c for c in sheet[HEADER_ROW_NUMBER]]
-            headers = [str(c.value).strip() if c.value is not None else "" for c in header_cells]
-        header_map = {name: idx for idx, name in enumerate(headers)}
-        
-        whrg_indices = [i for i, h_name in enumerate(headers) if h_name == "Whrg."]
-        idx_whrg_nominal = whrg_indices[0] if len(whrg_indices) > 0 else IDX_WHRG_NOMINAL_FALLBACK
-        idx_whrg_kurs = whrg_indices[1] if len(whrg_indices) > 1 else IDX_WHRG_KURS_FALLBACK
-        if idx_whrg_nominal == -1: print("Warning: Could not find first 'Whrg.' column header for nominal currency.")
-        if idx_whrg_kurs == -1: print("Warning: Could not find second 'Whrg.' column header for price currency.")
+        for row_idx_iter, row_cells_tuple in row_stream:
 
-
-        if sheet is None:
-            row_iter = enumerate(rows[HEADER_ROW_NUMBER:], start=HEADER_ROW_NUMBER + 1)
-        else:
-            row_iter = ((idx, [_get_actual_cell_value(c) for c in row])
-                        for idx, row in enumerate(sheet.iter_rows(min_row=HEADER_ROW_NUMBER + 1), start=HEADER_ROW_NUMBER + 1))
-
-        for row_idx_iter, row_cells_tuple in row_iter:
-
-            parsed_data["summary"]["total_data_rows_attempted"] += 1
-            
-            def get_str_val_from_tuple(col_name, default_val=""):
-                col_idx = header_map.get(col_name)
-                val = row_cells_tuple[col_idx] if col_idx is not None and col_idx < len(row_cells_tuple) else None
-                return str(val).strip() if val is not None else default_val
-
-            def get_raw_val_from_tuple(col_name): # Already returns primitive from values_only=True usually, but now from cell.value
-                col_idx = header_map.get(col_name)
-                if col_idx is not None and col_idx < len(row_cells_tuple): return row_cells_tuple[col_idx]
-                return None
-
-            anlagekategorie_str = get_str_val_from_tuple(COL_ANLAGEKATEGORIE)
-            beschreibung_str = get_str_val_from_tuple(COL_BESCHREIBUNG)
+            statement["summary"]["total_data_rows_attempted"] += 1
+            row = decode_row(row_cells_tuple)
+            anlagekategorie_str = row["anlagekategorie"]
+            beschreibung_str = row["beschreibung"]
 
             if (not anlagekategorie_str and not beschreibung_str and 
                 all(c is None or str(c).strip() == "" for c in row_cells_tuple[:min(5, len(row_cells_tuple))])):
-                parsed_data["summary"]["skipped_footer_empty_rows"] +=1
+                statement["summary"]["skipped_footer_empty_rows"] +=1
                 continue
             if len(anlagekategorie_str) > 100 or "real-time daten" in anlagekategorie_str.lower():
-                parsed_data["summary"]["skipped_footer_empty_rows"] +=1
+                statement["summary"]["skipped_footer_empty_rows"] +=1
                 continue
 
-            parsed_data["summary"]["data_rows_successfully_parsed"] += 1
+            statement["summary"]["data_rows_successfully_parsed"] += 1
             record_data: Dict[str, Any] = {}
             record_data["institution_name"] = "Credit-Suisse"
             record_data["main_custody_account_nr_from_file"] = main_custody_account_nr_internal
-            asset_unterkategorie_str = get_str_val_from_tuple(COL_ASSET_UNTERKATEGORIE)
+            asset_unterkategorie_str = row["asset_unterkategorie"]
             mapped_group = get_mapped_instrument_group(anlagekategorie_str, asset_unterkategorie_str, unmapped_category_pairs_internal)
             
             record_data["original_anlagekategorie"] = anlagekategorie_str
@@ -308,45 +419,39 @@ def process_file(filepath: str, sheet_name_or_index: Optional[Any] = None) -> in
 
             if asset_unterkategorie_str == "Konten":
                 # (Cash account processing logic largely the same, ensuring values from tuple are used)
-                parsed_data["summary"]["cash_account_records"] += 1
+                statement["summary"]["cash_account_records"] += 1
                 record_data["record_type"] = "cash_account"
-                record_data["cash_account_number_from_file"] = get_str_val_from_tuple(COL_VALOR)
-                record_data["currency"] = str(row_cells_tuple[idx_whrg_nominal]).strip() if idx_whrg_nominal != -1 and idx_whrg_nominal < len(row_cells_tuple) and row_cells_tuple[idx_whrg_nominal] is not None else None
-                record_data["balance"] = parse_number_from_cell_value(get_raw_val_from_tuple(COL_ANZAHL_NOMINAL))
-                record_data["value_in_chf"] = parse_number_from_cell_value(get_raw_val_from_tuple(COL_WERT_CHF))
-                record_data["fx_rate_to_chf"] = parse_number_from_cell_value(get_raw_val_from_tuple(COL_DEVISENKURS))
+                record_data["cash_account_number_from_file"] = row["valor"]
+                record_data["currency"] = row["nominal_currency"]
+                record_data["balance"] = row["quantity"]
+                record_data["value_in_chf"] = row["value_in_chf"]
+                record_data["fx_rate_to_chf"] = row["fx_rate_to_chf"]
                 record_data["asset_class_code"] = "LIQ"
                 record_data["asset_sub_class_code"] = "CASH"
             else: 
                 # (Security holding processing logic largely the same)
-                parsed_data["summary"]["security_holding_records"] += 1
+                statement["summary"]["security_holding_records"] += 1
                 record_data["record_type"] = "security_holding"
                 record_data["main_custody_account_nr_from_file"] = main_custody_account_nr_internal
-                record_data["isin"] = get_str_val_from_tuple(COL_ISIN)
+                record_data["isin"] = row["isin"]
                 if record_data["isin"]:
-                    parsed_data["summary"]["instruments_with_isin"] += 1
-                record_data["symbol"] = get_str_val_from_tuple(COL_SYMBOL)
-                record_data["valor_nr"] = get_str_val_from_tuple(COL_VALOR)
-                record_data["quantity_nominal"] = parse_number_from_cell_value(get_raw_val_from_tuple(COL_ANZAHL_NOMINAL))
-                cost_price_val = get_raw_val_from_tuple(COL_KOSTEN_KURS)
-                record_data["cost_price"] = parse_number_from_cell_value(cost_price_val)
-                if record_data["cost_price"] is not None: parsed_data["summary"]["instruments_with_cost_price"] +=1 # Corrected counter
-                record_data["cost_price_currency"] = get_str_val_from_tuple(COL_KOSTEN_KURS_WHRG)
-                current_price_val = get_raw_val_from_tuple(COL_AKTUELLER_KURS)
-                record_data["current_price"] = parse_number_from_cell_value(current_price_val)
-                record_data["current_price_currency"] = str(row_cells_tuple[idx_whrg_kurs]).strip() if idx_whrg_kurs != -1 and idx_whrg_kurs < len(row_cells_tuple) and row_cells_tuple[idx_whrg_kurs] is not None else None
-                record_data["value_in_chf"] = parse_number_from_cell_value(get_raw_val_from_tuple(COL_WERT_CHF))
-                record_data["sector"] = get_str_val_from_tuple(COL_BRANCHE)
-                maturity_date_val = get_raw_val_from_tuple(COL_FAELLIGKEIT)
-                record_data["maturity_date"] = parse_date_from_excel_cell(maturity_date_val, input_format='%d.%m.%y')
-                price_date_val = get_raw_val_from_tuple(COL_DATUM_ZEIT_KURS)
-                record_data["price_date"] = parse_date_from_excel_cell(price_date_val)
-
-                valor_col = row_cells_tuple[5] if len(row_cells_tuple) > 5 else None
-                isin_col = row_cells_tuple[22] if len(row_cells_tuple) > 22 else None
-                valor_str = str(valor_col).strip() if valor_col is not None else ""
-                isin_str = str(isin_col).strip() if isin_col is not None else ""
-                instr_id, method = lookup_instrument_id(conn, beschreibung_str, valor_str, isin_str)
+                    statement["summary"]["instruments_with_isin"] += 1
+                record_data["symbol"] = row["symbol"]
+                record_data["valor_nr"] = row["valor"]
+                record_data["quantity_nominal"] = row["quantity"]
+                record_data["cost_price"] = row["cost_price"]
+                if record_data["cost_price"] is not None: statement["summary"]["instruments_with_cost_price"] +=1 # Corrected counter
+                record_data["cost_price_currency"] = row["cost_price_currency"]
+                record_data["current_price"] = row["current_price"]
+                record_data["current_price_currency"] = row["price_currency"]
+                record_data["value_in_chf"] = row["value_in_chf"]
+                record_data["sector"] = row["sector"]
+                record_data["maturity_date"] = row["maturity_date"]
+                record_data["price_date"] = row["price_date"]
+
+                valor_str = row["lookup_valor"]
+                isin_str = row["lookup_isin"]
+                instr_id, method = lookup_instrument_id(conn, beschreibung_str, valor_str, isin_str, index)
 
                 if instr_id is not None:
                     record_data["instrument_id"] = instr_id
@@ -360,38 +465,87 @@ def process_file(filepath: str, sheet_name_or_index: Optional[Any] = None) -> in
                         f"Unmatched instrument description: {beschreibung_str} "
                         f"| Valor: {valor_str or 'N/A'}, ISIN: {isin_str or 'N/A'}"
                     )
-                parsed_data["logs"].append(log_msg)
+                yield EVENT_LOG, log_msg
             
-            parsed_data["records"].append(record_data)
+            yield EVENT_RECORD, record_data
         
-        parsed_data["summary"]["unmapped_categories"] = sorted(list(unmapped_category_pairs_internal))
-        parsed_data["summary"]["unmatched_instruments"] = unmatched_instruments_internal
+        statement["summary"]["unmapped_categories"] = sorted(list(unmapped_category_pairs_internal))
+        statement["summary"]["unmatched_instruments"] = unmatched_instruments_internal
 
-        if conn is not None:
-            conn.close()
-
-    # (Exception handling and JSON printing remain the same)
+    # (Exception handling remains the same)
     except FileNotFoundError:
-        parsed_data["summary"]["error"] = f"File not found at {filepath}"
+        statement["summary"]["error"] = f"File not found at {filepath}"
         exit_code = EXIT_FILE_NOT_FOUND
     except ImportError:
-        parsed_data["summary"]["error"] = "The 'openpyxl' library is required. Please install it (e.g., pip install openpyxl)."
+        statement["summary"]["error"] = "The 'openpyxl' library is required. Please install it (e.g., pip install openpyxl)."
         exit_code = EXIT_DEPENDENCY_ERROR
     except Exception as e:
         import traceback
-        parsed_data["summary"]["error"] = f"An error occurred: {str(e)}"
-        parsed_data["summary"]["traceback"] = traceback.format_exc()
+        statement["summary"]["error"] = f"An error occurred: {str(e)}"
+        statement["summary"]["traceback"] = traceback.format_exc()
         exit_code = EXIT_GENERAL_ERROR
-    
+    finally:
+        if workbook is not None:
+            workbook.close()
+        if csv_file is not None:
+            csv_file.close()
+        if conn is not None:
+            conn.close()
+
+    statement["exit_code"] = exit_code
+    yield EVENT_SUMMARY, statement
+
+def parse_statement(filepath: str, sheet_name_or_index: Optional[Any] = None,
+                    instrument_index: Optional[InstrumentIndex] = None) -> Tuple[Dict[str, Any], int]:
+    """Return the parsed statement with its ``records`` and ``logs``, and the exit code."""
+    records: List[Dict[str, Any]] = []
+    logs: List[str] = []
+    statement: Dict[str, Any] = {}
+    for kind, payload in iter_statement_events(filepath, sheet_name_or_index, instrument_index):
+        if kind == EVENT_RECORD:
+            records.append(payload)
+        elif kind == EVENT_LOG:
+            logs.append(payload)
+        else:
+            statement = payload
+    exit_code = statement.pop("exit_code")
+    statement["records"] = records
+    statement["logs"] = logs
+    return statement, exit_code
+
+def process_file(filepath: str, sheet_name_or_index: Optional[Any] = None,
+                 instrument_index: Optional[InstrumentIndex] = None) -> int:
+    parsed_data, exit_code = parse_statement(filepath, sheet_name_or_index, instrument_index)
     print(json.dumps(parsed_data, indent=2, ensure_ascii=False))
     return exit_code
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        filepath_arg = sys.argv[1]
-        code = process_file(filepath_arg)
-        sys.exit(code)
-    else:
-        print(json.dumps({"error": "Please provide the XLSX file path as an argument.", "usage": "python credit_suisse_parser.py <path_to_your_Credit-Suisse_file.xlsx>"}))
-        sys.exit(1)
 
+def write_ndjson(filepath: str, sheet_name_or_index: Optional[Any] = None,
+                 instrument_index: Optional[InstrumentIndex] = None, out: Optional[TextIO] = None) -> int:
+    """Write every event as one compact ``{"event": kind, "data": payload}`` line.
+
+    Lines are flushed as soon as they are parsed; the summary line comes last.
+    """
+    out = out if out is not None else sys.stdout
+    exit_code = EXIT_GENERAL_ERROR
+    for kind, payload in iter_statement_events(filepath, sheet_name_or_index, instrument_index):
+        if kind == EVENT_SUMMARY:
+            exit_code = payload["exit_code"]
+        out.write(json.dumps({"event": kind, "data": payload}, ensure_ascii=False, separators=(",", ":")) + "\n")
+        out.flush()
+    return exit_code
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parse a Credit-Suisse position statement")
+    parser.add_argument("filepath", nargs="?", help="XLSX or CSV statement")
+    parser.add_argument("--ndjson", action="store_true", help="Write one JSON line per record and log event")
+    args = parser.parse_args(argv)
+    if args.filepath is None:
+        print(json.dumps({"error": "Please provide the XLSX file path as an argument.", "usage": "python credit_suisse_parser.py [--ndjson] <path_to_your_Credit-Suisse_file.xlsx>"}))
+        return 1
+    if args.ndjson:
+        return write_ndjson(args.filepath)
+    return process_file(args.filepath)
+
+if __name__ == "__main__":
+    sys.exit(main())
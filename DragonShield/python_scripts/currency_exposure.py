@@ -1,19 +1,50 @@
 """Utility to compute currency exposure of a portfolio."""
 
-from typing import Iterable, Mapping, List, Dict
+from typing import Iterable, Mapping, List, Dict, Union
+
+from .money_sum import Accumulator, summation_factory
+from .position_frame import PositionFrame
 
 
 def currency_exposure(
-    positions: Iterable[Mapping], rates: Mapping[str, float], top_n: int = 6
+    positions: Union[Iterable[Mapping], PositionFrame],
+    rates: Mapping[str, float],
+    top_n: int = 6,
+    summation: str = "float",
 ) -> List[Dict[str, float]]:
     """Return breakdown of position values by currency.
 
     Each position mapping must provide ``quantity``, ``current_price`` and
-    ``currency`` keys. ``rates`` maps currency codes to ``rate_to_chf``.
+    ``currency`` keys. ``positions`` may also be a :class:`PositionFrame`.
+    ``rates`` maps currency codes to ``rate_to_chf``.
     Raises ``KeyError`` if a non-CHF currency is missing from ``rates``.
+    ``summation`` selects how values are added up (see ``money_sum``).
     """
-    totals: Dict[str, float] = {}
-    total_chf = 0.0
+    if isinstance(positions, PositionFrame):
+        return _exposure_from_frame(positions, rates, top_n, summation)
+
+    if summation == "float":
+        # Plain float addition, without the accumulator calls per position.
+        float_totals: Dict[str, float] = {}
+        float_total_chf = 0.0
+        for pos in positions:
+            qty = pos.get("quantity", 0)
+            price = pos.get("current_price")
+            if price is None:
+                continue
+            value = qty * price
+            currency = str(pos.get("currency", "CHF")).upper()
+            if currency != "CHF":
+                if currency not in rates:
+                    raise KeyError(currency)
+                value *= rates[currency]
+            float_totals[currency] = float_totals.get(currency, 0.0) + value
+            float_total_chf += value
+        return currency_breakdown(float_totals, float_total_chf, top_n)
+
+    new_sum = summation_factory(summation)
+    totals: Dict[str, Accumulator] = {}
+    total_chf = new_sum()
     for pos in positions:
         qty = pos.get("quantity", 0)
         price = pos.get("current_price")
@@ -25,9 +56,36 @@ def currency_exposure(
             if currency not in rates:
                 raise KeyError(currency)
             value *= rates[currency]
-        totals[currency] = totals.get(currency, 0.0) + value
-        total_chf += value
+        acc = totals.get(currency)
+        if acc is None:
+            acc = totals[currency] = new_sum()
+        acc.add(value)
+        total_chf.add(value)
 
+    return currency_breakdown({c: acc.value for c, acc in totals.items()}, total_chf.value, top_n)
+
+
+def _exposure_from_frame(
+    frame: PositionFrame, rates: Mapping[str, float], top_n: int, summation: str
+) -> List[Dict[str, float]]:
+    chf, priced = frame.chf_totals(rates, summation)
+    totals: Dict[str, float] = {}
+    total_chf = summation_factory(summation)()
+    for currency, value, has_price in zip(frame.currencies, chf, priced):
+        if not has_price:
+            continue
+        if value != value:
+            raise KeyError(currency)
+        totals[currency] = value
+        total_chf.add(value)
+    return currency_breakdown(totals, total_chf.value, top_n)
+
+
+def currency_breakdown(totals: Mapping[str, float], total_chf: float, top_n: int) -> List[Dict[str, float]]:
+    """Format per-currency CHF ``totals`` as returned by :func:`currency_exposure`.
+
+    Currencies beyond ``top_n`` are folded into a single ``"Other"`` entry.
+    """
     breakdown = [
         {
             "currency": code,
@@ -52,4 +110,4 @@ def currency_exposure(
     return breakdown
 
 
-__all__ = ["currency_exposure"]
+__all__ = ["currency_exposure", "currency_breakdown"]
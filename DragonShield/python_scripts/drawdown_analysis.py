@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Drawdown episodes of a value series in a single streaming pass.
+
+An episode starts when the value falls below its running peak and ends on
+the first date it is back at or above that peak. Only the current peak and
+trough are kept while scanning, so memory beyond the returned episodes is
+constant. ``PortfolioValueHistory`` can be analysed directly.
+"""
+
+import argparse
+import heapq
+import json
+import sqlite3
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from risk_metrics import DB_PATH
+
+
+@dataclass
+class DrawdownEpisode:
+    """One peak-to-recovery drawdown.
+
+    ``duration`` counts periods from peak to recovery (or to the last date
+    for an open episode); ``time_to_recover`` counts periods from trough to
+    recovery and is ``None`` while the episode is open.
+    """
+
+    peak_date: Any
+    trough_date: Any
+    recovery_date: Optional[Any]
+    peak_value: float
+    trough_value: float
+    depth: float
+    duration: int
+    time_to_recover: Optional[int]
+
+
+def iter_episodes(points: Iterable[Tuple[Any, float]]) -> Iterator[DrawdownEpisode]:
+    """Yield the drawdown episodes of ``(date, value)`` points in date order."""
+    peak_idx = trough_idx = -1
+    peak_date = trough_date = None
+    peak_value = trough_value = 0.0
+    in_drawdown = False
+    idx = -1
+    for idx, (date, value) in enumerate(points):
+        if peak_idx < 0 or value >= peak_value:
+            if in_drawdown:
+                yield DrawdownEpisode(
+                    peak_date, trough_date, date, peak_value, trough_value,
+                    trough_value / peak_value - 1, idx - peak_idx, idx - trough_idx,
+                )
+                in_drawdown = False
+            peak_idx, peak_date, peak_value = idx, date, value
+        elif not in_drawdown or value < trough_value:
+            in_drawdown = True
+            trough_idx, trough_date, trough_value = idx, date, value
+    if in_drawdown:
+        yield DrawdownEpisode(
+            peak_date, trough_date, None, peak_value, trough_value,
+            trough_value / peak_value - 1, idx - peak_idx, None,
+        )
+
+
+def wealth_from_returns(
+    returns: Iterable[float], dates: Optional[Iterable[Any]] = None
+) -> Iterator[Tuple[Any, float]]:
+    """Turn daily returns into ``(date, wealth)`` points starting from 1.0.
+
+    Without ``dates`` the points are numbered from 0. The starting level is
+    not emitted, matching ``risk_metrics.max_drawdown``.
+    """
+    wealth = 1.0
+    labelled = zip(dates, returns) if dates is not None else enumerate(returns)
+    for label, r in labelled:
+        wealth *= 1 + r
+        yield label, wealth
+
+
+def deepest_episodes(episodes: Iterable[DrawdownEpisode], top_n: int = 5) -> List[DrawdownEpisode]:
+    """Return the ``top_n`` deepest episodes, deepest first."""
+    return heapq.nsmallest(top_n, episodes, key=lambda e: e.depth)
+
+
+def read_value_history(conn: sqlite3.Connection) -> Iterator[Tuple[str, float]]:
+    """Stream ``(value_date, total_value_chf)`` from ``PortfolioValueHistory``."""
+    yield from conn.execute(
+        """SELECT value_date, total_value_chf FROM PortfolioValueHistory
+           WHERE total_value_chf IS NOT NULL ORDER BY value_date"""
+    )
+
+
+def analyse(points: Iterable[Tuple[Any, float]], top_n: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+    """Return the full episode table and the ``top_n`` deepest episodes."""
+    episodes = list(iter_episodes(points))
+    return {
+        "episodes": [asdict(e) for e in episodes],
+        "deepest": [asdict(e) for e in deepest_episodes(episodes, top_n)],
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Drawdown episodes of PortfolioValueHistory")
+    parser.add_argument("--db", default=DB_PATH, help="Path to database")
+    parser.add_argument("--top", type=int, default=5, help="Number of deepest episodes to list")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        print(json.dumps(analyse(read_value_history(conn), args.top)))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
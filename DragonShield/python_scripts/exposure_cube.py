@@ -0,0 +1,187 @@
+"""Multi-dimensional exposure cube with precomputed rollups."""
+
+from itertools import combinations
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .position_frame import PositionFrame
+from .risk_buckets import OVERCONCENTRATION_THRESHOLD
+
+DEFAULT_CUBE_DIMENSIONS: Tuple[str, ...] = ("sector", "currency", "country_code")
+
+LabelKey = Tuple[str, ...]
+
+
+class ExposureCube:
+    """CHF exposure aggregated for every combination of ``dimensions``.
+
+    ``levels`` maps each subset of ``dimensions`` (in cube order, including
+    the empty grand-total level) to its cells, ``label tuple -> value_chf``.
+    Cells are ordered by value descending, with ties in order of first
+    appearance. Queries read these precomputed cells and never rescan
+    positions.
+    """
+
+    def __init__(self, dimensions: Sequence[str], total_chf: float, levels: Dict[Tuple[str, ...], Dict[LabelKey, float]]):
+        self.dimensions: Tuple[str, ...] = tuple(dimensions)
+        self.total_chf = total_chf
+        self.levels = levels
+
+    def value(self, **labels: str) -> float:
+        """Return the CHF exposure of the cell selected by ``labels``.
+
+        ``cube.value(sector="Tech", currency="USD")`` sums every position in
+        Tech priced in USD; dimensions that are not given are rolled up.
+        """
+        level = self._level(labels)
+        key = tuple(labels[d] for d in level)
+        return self.levels[level].get(key, 0.0)
+
+    def buckets(
+        self,
+        dimensions: Union[str, Sequence[str]],
+        top_n: Optional[int] = None,
+        **filters: str,
+    ) -> List[Dict[str, object]]:
+        """Return buckets of ``dimensions`` in the shape of ``top_risk_buckets``.
+
+        ``filters`` restrict the buckets to one slice, e.g.
+        ``cube.buckets("country_code", sector="Tech")``. ``exposure_pct`` is
+        relative to the whole portfolio. For a single dimension ``label`` is
+        the label string, otherwise a tuple in the requested order. An empty
+        ``dimensions`` raises ``ValueError``; use ``total_chf`` for the grand
+        total.
+        """
+        if isinstance(dimensions, str):
+            dimensions = (dimensions,)
+        dimensions = tuple(dimensions)
+        if not dimensions:
+            raise ValueError("At least one dimension is required")
+        overlap = set(dimensions) & set(filters)
+        if overlap:
+            raise ValueError(f"Dimensions used both for grouping and filtering: {sorted(overlap)}")
+        if self.total_chf == 0:
+            return []
+
+        wanted = {d: None for d in dimensions}
+        wanted.update(filters)
+        level = self._level(wanted)
+        positions = [level.index(d) for d in dimensions]
+        checks = [(level.index(d), label) for d, label in filters.items()]
+
+        result = []
+        for key, value in self.levels[level].items():
+            if any(key[i] != label for i, label in checks):
+                continue
+            label = key[positions[0]] if len(positions) == 1 else tuple(key[i] for i in positions)
+            share = value / self.total_chf
+            result.append(
+                {
+                    "label": label,
+                    "value_chf": value,
+                    "exposure_pct": share,
+                    "is_overconcentrated": share > OVERCONCENTRATION_THRESHOLD,
+                }
+            )
+            if top_n is not None and len(result) >= top_n:
+                break
+        return result
+
+    def overconcentrated(self) -> Dict[Tuple[str, ...], List[LabelKey]]:
+        """Return, per level, the cells above ``OVERCONCENTRATION_THRESHOLD``."""
+        flags: Dict[Tuple[str, ...], List[LabelKey]] = {}
+        if self.total_chf == 0:
+            return flags
+        for level, cells in self.levels.items():
+            if not level:
+                continue
+            hits = [key for key, value in cells.items() if value / self.total_chf > OVERCONCENTRATION_THRESHOLD]
+            if hits:
+                flags[level] = hits
+        return flags
+
+    def _level(self, labels: Mapping[str, object]) -> Tuple[str, ...]:
+        unknown = [d for d in labels if d not in self.dimensions]
+        if unknown:
+            raise KeyError(unknown[0])
+        return tuple(d for d in self.dimensions if d in labels)
+
+
+def build_exposure_cube(
+    positions: Union[Iterable[Mapping], PositionFrame],
+    rates: Mapping[str, float],
+    dimensions: Sequence[str] = DEFAULT_CUBE_DIMENSIONS,
+) -> ExposureCube:
+    """Scan ``positions`` once and build an :class:`ExposureCube`.
+
+    Valuation and labels follow ``top_risk_buckets``: positions without a
+    price or in a currency missing from ``rates`` are ignored and ``None``
+    labels become ``"Unknown"``. A :class:`PositionFrame` must encode every
+    requested dimension other than ``currency``.
+    """
+    dimensions = tuple(dimensions)
+    if isinstance(positions, PositionFrame):
+        cells, total = _cells_from_frame(positions, rates, dimensions)
+    else:
+        cells, total = _cells_from_mappings(positions, rates, dimensions)
+
+    levels: Dict[Tuple[str, ...], Dict[LabelKey, float]] = {}
+    for size in range(len(dimensions) + 1):
+        for level in combinations(range(len(dimensions)), size):
+            rolled: Dict[LabelKey, float] = {}
+            for key, value in cells.items():
+                sub = tuple(key[i] for i in level)
+                rolled[sub] = rolled.get(sub, 0.0) + value
+            ordered = sorted(rolled.items(), key=lambda item: item[1], reverse=True)
+            levels[tuple(dimensions[i] for i in level)] = dict(ordered)
+    return ExposureCube(dimensions, total, levels)
+
+
+def _cells_from_mappings(
+    positions: Iterable[Mapping], rates: Mapping[str, float], dimensions: Tuple[str, ...]
+) -> Tuple[Dict[LabelKey, float], float]:
+    cells: Dict[LabelKey, float] = {}
+    total = 0.0
+    for pos in positions:
+        price = pos.get("current_price")
+        if price is None:
+            continue
+        currency = str(pos.get("currency", "CHF")).upper()
+        value = pos.get("quantity", 0) * price
+        if currency != "CHF":
+            rate = rates.get(currency)
+            if rate is None:
+                continue
+            value *= rate
+        total += value
+        key = []
+        for dim in dimensions:
+            label = str(pos.get(dim)) if dim != "currency" else currency
+            key.append("Unknown" if label == "None" else label)
+        key_t = tuple(key)
+        cells[key_t] = cells.get(key_t, 0.0) + value
+    return cells, total
+
+
+def _cells_from_frame(
+    frame: PositionFrame, rates: Mapping[str, float], dimensions: Tuple[str, ...]
+) -> Tuple[Dict[LabelKey, float], float]:
+    rate_by_code = frame.rate_table(rates)
+    columns = [frame.labels(d) for d in dimensions]
+    code_columns = [codes for codes, _ in columns]
+    code_cells: Dict[Tuple[int, ...], float] = {}
+    total = 0.0
+    for idx, (qty, price, currency_code) in enumerate(zip(frame.quantity, frame.price, frame.currency_codes)):
+        value = qty * price * rate_by_code[currency_code]
+        # NaN marks a missing price or an unknown rate
+        if value != value:
+            continue
+        total += value
+        key = tuple(codes[idx] for codes in code_columns)
+        code_cells[key] = code_cells.get(key, 0.0) + value
+    cells = {
+        tuple(labels[c] for (_, labels), c in zip(columns, key)): value for key, value in code_cells.items()
+    }
+    return cells, total
+
+
+__all__ = ["ExposureCube", "build_exposure_cube", "DEFAULT_CUBE_DIMENSIONS"]
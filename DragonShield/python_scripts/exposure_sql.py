@@ -0,0 +1,165 @@
+"""Currency exposure and risk buckets computed inside SQLite.
+
+These functions mirror ``currency_exposure.currency_exposure`` and
+``risk_buckets.top_risk_buckets`` but group, sort and limit in SQL. Only the
+top rows and the totals leave the database, so memory does not grow with the
+number of positions.
+
+Positions are read from ``PositionReports`` joined to ``Instruments`` and
+valued with the ``ExchangeRates`` rows flagged ``is_latest = 1``.
+"""
+
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from .risk_buckets import OVERCONCENTRATION_THRESHOLD
+
+# Grouping dimensions and the SQL expression producing their label.
+DIMENSION_COLUMNS: Dict[str, str] = {
+    "sector": "i.sector",
+    "country_code": "i.country_code",
+    "currency": "UPPER(i.currency)",
+    "instrument": "i.instrument_name",
+    "asset_class": "ac.class_name",
+    "asset_sub_class": "asc.sub_class_name",
+}
+
+_CLASS_JOINS = """
+    LEFT JOIN AssetSubClasses asc ON asc.sub_class_id = i.sub_class_id
+    LEFT JOIN AssetClasses ac ON ac.class_id = asc.class_id"""
+
+
+def _valued_positions(label_expr: str, joins: str, session_id: Optional[int]) -> Tuple[str, Tuple]:
+    """Return a CTE valuing every priced position in CHF (NULL if no rate)."""
+    where = "pr.current_price IS NOT NULL"
+    params: Tuple = ()
+    if session_id is not None:
+        where += " AND pr.import_session_id = ?"
+        params = (session_id,)
+    sql = f"""
+        WITH latest_fx AS (
+            SELECT currency_code, rate_to_chf, MAX(rate_date)
+              FROM ExchangeRates
+             WHERE is_latest = 1
+             GROUP BY currency_code
+        ),
+        valued AS (
+            SELECT pr.position_id AS position_id,
+                   UPPER(i.currency) AS currency,
+                   {label_expr} AS label,
+                   pr.quantity * pr.current_price *
+                       CASE WHEN UPPER(i.currency) = 'CHF' THEN 1.0 ELSE fx.rate_to_chf END AS value_chf
+              FROM PositionReports pr
+              JOIN Instruments i ON i.instrument_id = pr.instrument_id{joins}
+              LEFT JOIN latest_fx fx ON fx.currency_code = UPPER(i.currency)
+             WHERE {where}
+        )"""
+    return sql, params
+
+
+def currency_exposure_sql(
+    conn: sqlite3.Connection, top_n: int = 6, session_id: Optional[int] = None
+) -> List[Dict[str, float]]:
+    """Return the breakdown of ``currency_exposure`` computed in SQLite.
+
+    ``session_id`` restricts the positions to one import session.
+    Raises ``KeyError`` if a priced non-CHF position has no latest rate.
+    """
+    cte, params = _valued_positions("NULL", "", session_id)
+    rows = conn.execute(
+        cte
+        + """
+        SELECT currency, value_chf, missing_rate,
+               SUM(value_chf) OVER () AS total_chf,
+               SUM(missing_rate) OVER () AS missing_total,
+               COUNT(*) OVER () AS currency_count
+          FROM (
+            SELECT currency,
+                   TOTAL(value_chf) AS value_chf,
+                   MAX(value_chf IS NULL) AS missing_rate,
+                   MIN(position_id) AS first_position
+              FROM valued
+             GROUP BY currency
+          )
+         ORDER BY missing_rate DESC, value_chf DESC, first_position
+         LIMIT ?
+        """,
+        params + (top_n if top_n > 0 else 1,),
+    ).fetchall()
+    if not rows:
+        return []
+    if rows[0][4]:
+        raise KeyError(rows[0][0])
+
+    total_chf = rows[0][3]
+    breakdown = [
+        {
+            "currency": code,
+            "percentage": (val / total_chf * 100) if total_chf else 0.0,
+            "value_chf": val,
+        }
+        for code, val, *_ in rows[:top_n]
+    ]
+    currency_count = rows[0][5]
+    if currency_count > top_n:
+        other_value = total_chf - sum(item["value_chf"] for item in breakdown)
+        breakdown.append(
+            {
+                "currency": "Other",
+                "percentage": (other_value / total_chf * 100) if total_chf else 0.0,
+                "value_chf": other_value,
+            }
+        )
+    return breakdown
+
+
+def top_risk_buckets_sql(
+    conn: sqlite3.Connection,
+    dimension: str = "sector",
+    top_n: int = 5,
+    session_id: Optional[int] = None,
+) -> List[Dict[str, float]]:
+    """Return the buckets of ``top_risk_buckets`` computed in SQLite.
+
+    ``dimension`` must be a key of ``DIMENSION_COLUMNS``; ``ValueError`` is
+    raised otherwise. Positions in currencies without a latest rate are
+    ignored.
+    """
+    label_expr = DIMENSION_COLUMNS.get(dimension)
+    if label_expr is None:
+        raise ValueError(f"Unsupported dimension: {dimension}")
+    joins = _CLASS_JOINS if label_expr.startswith(("ac.", "asc.")) else ""
+    cte, params = _valued_positions(label_expr, joins, session_id)
+    rows = conn.execute(
+        cte
+        + """
+        SELECT label, value_chf, SUM(value_chf) OVER () AS portfolio_total
+          FROM (
+            SELECT COALESCE(CAST(label AS TEXT), 'Unknown') AS label,
+                   SUM(value_chf) AS value_chf,
+                   MIN(position_id) AS first_position
+              FROM valued
+             WHERE value_chf IS NOT NULL
+             GROUP BY 1
+          )
+         ORDER BY value_chf DESC, first_position
+         LIMIT ?
+        """,
+        params + (top_n,),
+    ).fetchall()
+    if not rows or rows[0][2] == 0:
+        return []
+
+    portfolio_total = rows[0][2]
+    return [
+        {
+            "label": label,
+            "value_chf": value,
+            "exposure_pct": value / portfolio_total,
+            "is_overconcentrated": (value / portfolio_total) > OVERCONCENTRATION_THRESHOLD,
+        }
+        for label, value, _ in rows
+    ]
+
+
+__all__ = ["currency_exposure_sql", "top_risk_buckets_sql", "DIMENSION_COLUMNS"]
@@ -0,0 +1,165 @@
+"""FX stress-test valuation over many scenarios at once."""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from operator import mul
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from .position_frame import PositionFrame
+
+Matrix = List[List[float]]
+
+
+@dataclass
+class ScenarioResult:
+    """Valuation of one FX scenario."""
+
+    index: int
+    total_chf: float
+    currency_exposure: Dict[str, float]
+    bucket_values: Dict[str, float]
+
+
+class FxScenarioEngine:
+    """Revalue a portfolio under relative FX shocks.
+
+    The positions are collapsed once into a per-currency CHF exposure vector
+    (and, with ``dimension``, a bucket x currency matrix) at the base
+    ``rates``. A scenario maps currency codes to relative rate changes, e.g.
+    ``{"USD": -0.10, "EUR": 0.05}``; CHF, the base currency, ignores any
+    shock and unlisted currencies are unchanged. Each scenario is then one row of a scenario x currency factor
+    matrix, and totals and bucket values are products of that matrix with the
+    exposure vector and the bucket matrix.
+
+    Positions follow ``calculate_total_asset_value``: missing prices are
+    skipped and a missing non-CHF rate raises ``KeyError``.
+    """
+
+    def __init__(
+        self,
+        positions: Union[Iterable[Mapping], PositionFrame],
+        rates: Mapping[str, float],
+        dimension: Optional[str] = None,
+    ):
+        self.dimension = dimension
+        exposure: Dict[str, float] = {}
+        buckets: Dict[str, Dict[str, float]] = {}
+        for currency, label, value in _valued(positions, rates, dimension):
+            exposure[currency] = exposure.get(currency, 0.0) + value
+            if dimension is not None:
+                row = buckets.setdefault(label, {})
+                row[currency] = row.get(currency, 0.0) + value
+        self.currencies: List[str] = list(exposure)
+        self.exposure: List[float] = [exposure[c] for c in self.currencies]
+        self.bucket_labels: List[str] = list(buckets)
+        self.bucket_matrix: Matrix = [[row.get(c, 0.0) for c in self.currencies] for row in buckets.values()]
+
+    def factor_row(self, shocks: Mapping[str, float]) -> List[float]:
+        """Return ``1 + shock`` per currency of the engine; CHF stays at 1."""
+        upper = {str(c).upper(): s for c, s in shocks.items()}
+        upper.pop("CHF", None)
+        return [1.0 + upper.get(c, 0.0) for c in self.currencies]
+
+    def run(self, scenarios: Iterable[Mapping[str, float]]) -> List[ScenarioResult]:
+        """Value every scenario and return the results in order."""
+        return list(self.iter_results(scenarios))
+
+    def iter_results(
+        self,
+        scenarios: Iterable[Mapping[str, float]],
+        chunk_size: int = 1000,
+        workers: int = 1,
+    ) -> Iterator[ScenarioResult]:
+        """Yield scenario results, valuing ``chunk_size`` scenarios at a time.
+
+        Only one chunk of factor rows and results is held per worker. With
+        ``workers > 1`` chunks are valued in a process pool with at most two
+        chunks queued per worker; results are still yielded in input order.
+        """
+        chunks = self._factor_chunks(scenarios, chunk_size)
+        if workers <= 1:
+            computed = (_value_chunk(self.exposure, self.bucket_matrix, chunk) for chunk in chunks)
+            yield from self._results(computed)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from self._results(self._pooled(pool, chunks, 2 * workers))
+
+    def _pooled(
+        self, pool: ProcessPoolExecutor, chunks: Iterator[Matrix], max_pending: int
+    ) -> Iterator[Tuple[List[float], Matrix, Matrix]]:
+        pending: deque = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_value_chunk, self.exposure, self.bucket_matrix, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _factor_chunks(self, scenarios: Iterable[Mapping[str, float]], chunk_size: int) -> Iterator[Matrix]:
+        rows = (self.factor_row(s) for s in scenarios)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _results(self, computed: Iterable[Tuple[List[float], Matrix, Matrix]]) -> Iterator[ScenarioResult]:
+        index = 0
+        for totals, exposures, bucket_values in computed:
+            for total, exposure, buckets in zip(totals, exposures, bucket_values):
+                yield ScenarioResult(
+                    index=index,
+                    total_chf=total,
+                    currency_exposure=dict(zip(self.currencies, exposure)),
+                    bucket_values=dict(zip(self.bucket_labels, buckets)),
+                )
+                index += 1
+
+
+def _value_chunk(exposure: List[float], bucket_matrix: Matrix, factors: Matrix) -> Tuple[List[float], Matrix, Matrix]:
+    """Multiply a chunk of factor rows with the exposure vector and bucket matrix."""
+    totals: List[float] = []
+    exposures: Matrix = []
+    bucket_values: Matrix = []
+    for row in factors:
+        shocked = list(map(mul, exposure, row))
+        exposures.append(shocked)
+        totals.append(sum(shocked))
+        bucket_values.append([sum(map(mul, bucket, row)) for bucket in bucket_matrix])
+    return totals, exposures, bucket_values
+
+
+def _valued(
+    positions: Union[Iterable[Mapping], PositionFrame], rates: Mapping[str, float], dimension: Optional[str]
+) -> Iterator[Tuple[str, Optional[str], float]]:
+    if isinstance(positions, PositionFrame):
+        codes, labels = positions.labels(dimension) if dimension is not None else (None, None)
+        for idx, (qty, price, code) in enumerate(zip(positions.quantity, positions.price, positions.currency_codes)):
+            if price != price:
+                continue
+            currency = positions.currencies[code]
+            value = qty * price
+            if currency != "CHF":
+                value *= rates[currency]
+            yield currency, labels[codes[idx]] if codes is not None else None, value
+        return
+
+    for pos in positions:
+        price = pos.get("current_price")
+        if price is None:
+            continue
+        currency = str(pos.get("currency", "CHF")).upper()
+        value = pos.get("quantity", 0) * price
+        if currency != "CHF":
+            value *= rates[currency]
+        label = None
+        if dimension is not None:
+            label = str(pos.get(dimension)) if dimension != "currency" else currency
+            if label == "None":
+                label = "Unknown"
+        yield currency, label, value
+
+
+__all__ = ["FxScenarioEngine", "ScenarioResult"]
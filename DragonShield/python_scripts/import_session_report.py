@@ -5,6 +5,8 @@ import argparse
 import sqlite3
 from typing import Any, Dict, List
 
+from money_sum import SUMMATION_MODES, summation_factory
+
 DB_PATH = (
     "/Users/renekeller/Library/Containers/com.rene.DragonShield/Data/Library/Application Support/DragonShield"
     "/dragonshield.sqlite"
@@ -45,11 +47,14 @@ def fetch_positions(conn: sqlite3.Connection, session_id: int) -> List[Dict[str,
     return result
 
 
-def summarize_positions(conn: sqlite3.Connection, positions: List[Dict[str, Any]]) -> Dict[str, Any]:
-    totals: Dict[str, float] = {}
+def summarize_positions(
+    conn: sqlite3.Connection, positions: List[Dict[str, Any]], summation: str = "float"
+) -> Dict[str, Any]:
+    new_sum = summation_factory(summation)
+    totals: Dict[str, Any] = {}
     items: List[Dict[str, Any]] = []
     rates: Dict[str, float] = {}
-    total_chf = 0.0
+    total_chf = new_sum()
     for p in positions:
         price = p.get("price")
         if price is None:
@@ -73,11 +78,13 @@ def summarize_positions(conn: sqlite3.Connection, positions: List[Dict[str, Any]
                 "value_chf": value_chf,
             }
         )
-        totals[currency] = totals.get(currency, 0.0) + value_chf
-        total_chf += value_chf
+        if currency not in totals:
+            totals[currency] = new_sum()
+        totals[currency].add(value_chf)
+        total_chf.add(value_chf)
     return {
-        "total_chf": total_chf,
-        "breakdown": totals,
+        "total_chf": total_chf.value,
+        "breakdown": {cur: acc.value for cur, acc in totals.items()},
         "positions": items,
         "fx_rates": rates,
     }
@@ -121,11 +128,17 @@ def main(argv: List[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="Summarize import session values")
     parser.add_argument("session_id", type=int, help="Import session id")
     parser.add_argument("--db", default=DB_PATH, help="Path to database")
+    parser.add_argument(
+        "--summation",
+        choices=sorted(SUMMATION_MODES),
+        default="float",
+        help="How CHF amounts are added up",
+    )
     args = parser.parse_args(argv)
 
     conn = sqlite3.connect(args.db)
     positions = fetch_positions(conn, args.session_id)
-    summary = summarize_positions(conn, positions)
+    summary = summarize_positions(conn, positions, args.summation)
     save_total(conn, args.session_id, summary["total_chf"])
     save_report(conn, args.session_id, summary["positions"])
 
@@ -1,7 +1,10 @@
 # python_scripts/import_tool.py
 
-# MARK: - Version 1.3
+# MARK: - Version 1.6
 # MARK: - History
+# - 1.5 -> 1.6: Refresh the shared InstrumentIndex after each committed import.
+# - 1.4 -> 1.5: Share one InstrumentIndex across the files of a run.
+# - 1.3 -> 1.4: Parse in-process via credit_suisse_parser.parse_statement.
 # - 1.2 -> 1.3: Updated default database path to production container location.
 # - 1.1 -> 1.2: Support importing multiple files in one run and print summary.
 # - 1.0 -> 1.1: Replace builtin generics with typing equivalents for
@@ -12,8 +15,6 @@ import os
 import sqlite3
 import hashlib
 import json
-import io
-import contextlib
 from typing import Any, Dict, Tuple, Optional
 
 import credit_suisse_parser  # existing parser in the same folder
@@ -109,11 +110,10 @@ def update_session(conn: sqlite3.Connection, sess_id: int, status: str,
     conn.commit()
 
 
-def parse_file(path: str) -> Dict[str, Any]:
-    buf = io.StringIO()
-    with contextlib.redirect_stdout(buf):
-        credit_suisse_parser.process_file(path)
-    return json.loads(buf.getvalue())
+def parse_file(path: str,
+               instrument_index: Optional[credit_suisse_parser.InstrumentIndex] = None) -> Dict[str, Any]:
+    data, _ = credit_suisse_parser.parse_statement(path, instrument_index=instrument_index)
+    return data
 
 
 def preview_records(data: Dict[str, Any], limit: int = 3):
@@ -125,7 +125,8 @@ def preview_records(data: Dict[str, Any], limit: int = 3):
         print("Error during parsing:", err)
 
 
-def process_file_path(conn: sqlite3.Connection, institution_id: int, file_path: str) -> Dict[str, Any]:
+def process_file_path(conn: sqlite3.Connection, institution_id: int, file_path: str,
+                      instrument_index: Optional[credit_suisse_parser.InstrumentIndex] = None) -> Dict[str, Any]:
     if not os.path.isfile(file_path):
         print("File not found.")
         return {}
@@ -145,7 +146,7 @@ def process_file_path(conn: sqlite3.Connection, institution_id: int, file_path:
         institution_id,
     )
     print("Import session", session_id, "created. Parsing...")
-    data = parse_file(file_path)
+    data = parse_file(file_path, instrument_index)
     preview_records(data)
     proceed = input("Commit import? [y/N]: ").strip().lower() == 'y'
     if proceed:
@@ -161,6 +162,9 @@ def process_file_path(conn: sqlite3.Connection, institution_id: int, file_path:
             None,
         )
         print("Import committed.")
+        if instrument_index is not None:
+            # Commits through the index's own connection leave data_version unchanged.
+            instrument_index.refresh()
     else:
         update_session(conn, session_id, 'CANCELLED', 0, 0, 0, 0, 'User cancelled')
         print("Import cancelled.")
@@ -172,11 +176,14 @@ def main():
     summaries = []
     try:
         institution_id = choose_institution(conn)
+        # Shares conn: process_file_path refreshes it after each committed import,
+        # since commits on this connection do not change PRAGMA data_version.
+        instrument_index = credit_suisse_parser.InstrumentIndex(conn)
         while True:
             file_path = input("Enter path to statement file: ").strip()
             if not file_path:
                 break
-            summary = process_file_path(conn, institution_id, file_path)
+            summary = process_file_path(conn, institution_id, file_path, instrument_index)
             if summary:
                 summaries.append((file_path, summary))
             again = input("Import another file? [y/N]: ").strip().lower() == 'y'
@@ -0,0 +1,255 @@
+"""Portfolio aggregates maintained incrementally from position and FX updates."""
+
+import heapq
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .currency_exposure import currency_breakdown
+from .portfolio_aggregator import DEFAULT_BUCKET_DIMENSIONS
+from .risk_buckets import rank_buckets
+
+
+class _Entry(NamedTuple):
+    instrument: Any
+    currency: str
+    local_value: Optional[float]
+    labels: Tuple[str, ...]
+    seq: int
+    token: int
+
+
+class IncrementalAggregator:
+    """Keep total value, currency exposure, risk buckets and top positions current.
+
+    Positions are keyed by ``position_id`` and carry the fields used by the
+    analytics helpers. Values are held per currency in local terms, so an FX
+    change only swaps one rate. Each currency also keeps a heap of its
+    positions by local value; replaced and deleted entries stay in the heap
+    until they outnumber the live ones and are skipped when read. Upserts and
+    deletes therefore cost O(log n) amortised plus a fixed number of running
+    sums. Queries combine the per-currency totals with the current rates and
+    return the shapes of ``calculate_total_asset_value``, ``currency_exposure``,
+    ``top_risk_buckets`` and ``top_positions_by_chf``. Positions that tie keep
+    the order in which they were first upserted, and replacing a position
+    keeps its currency and labels where they were.
+    """
+
+    def __init__(
+        self,
+        rates: Mapping[str, float],
+        positions: Iterable[Mapping] = (),
+        dimensions: Sequence[str] = DEFAULT_BUCKET_DIMENSIONS,
+    ):
+        self.dimensions: Tuple[str, ...] = tuple(d for d in dimensions if d != "currency")
+        self._rates: Dict[str, float] = {str(c).upper(): r for c, r in rates.items()}
+        self._entries: Dict[Any, _Entry] = {}
+        self._next_seq = 0
+        self._next_token = 0
+        # currency -> [local sum, priced position count]
+        self._currency_totals: Dict[str, List[float]] = {}
+        # dimension -> label -> currency -> [local sum, priced position count]
+        self._label_totals: Dict[str, Dict[str, Dict[str, List[float]]]] = {d: {} for d in self.dimensions}
+        # currency -> heap of (-local value, seq, token, position_id); entries
+        # whose token is no longer the position's current one are stale
+        self._ranked: Dict[str, List[Tuple[float, int, int, Any]]] = {}
+        self._stale: Dict[str, int] = {}
+        for pos in positions:
+            self.apply_upsert(pos)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Updates
+
+    def apply_upsert(self, position: Mapping) -> None:
+        """Insert or replace the position identified by ``position["position_id"]``."""
+        position_id = position["position_id"]
+        previous = self._entries.get(position_id)
+        if previous is not None:
+            self._remove(previous, prune=False)
+            seq = previous.seq
+        else:
+            seq = self._next_seq
+            self._next_seq += 1
+
+        price = position.get("current_price")
+        local_value = None if price is None else position.get("quantity", 0) * price
+        labels = []
+        for dim in self.dimensions:
+            label = str(position.get(dim))
+            labels.append("Unknown" if label == "None" else label)
+        entry = _Entry(
+            position.get("instrument", ""),
+            str(position.get("currency", "CHF")).upper(),
+            local_value,
+            tuple(labels),
+            seq,
+            self._next_token,
+        )
+        self._next_token += 1
+        self._entries[position_id] = entry
+        self._add(position_id, entry)
+        if previous is not None:
+            self._prune(previous)
+
+    def apply_delete(self, position_id: Any) -> None:
+        """Remove a position; unknown ids raise ``KeyError``."""
+        entry = self._entries.pop(position_id)
+        self._remove(entry)
+
+    def apply_fx_change(self, currency: str, rate: Optional[float]) -> None:
+        """Set ``rate_to_chf`` for ``currency``; ``None`` removes the rate."""
+        currency = currency.upper()
+        if rate is None:
+            self._rates.pop(currency, None)
+        else:
+            self._rates[currency] = rate
+
+    # Queries
+
+    def total_chf(self) -> float:
+        """Return the CHF total like ``calculate_total_asset_value``."""
+        return sum(local * self._rate_strict(currency) for currency, (local, _) in self._currency_totals.items())
+
+    def currency_exposure(self, top_n: int = 6) -> List[Dict[str, float]]:
+        """Return the breakdown of ``currency_exposure.currency_exposure``."""
+        totals = {currency: local * self._rate_strict(currency) for currency, (local, _) in self._currency_totals.items()}
+        return currency_breakdown(totals, sum(totals.values()), top_n)
+
+    def top_risk_buckets(self, dimension: str = "sector", top_n: int = 5) -> List[Dict[str, float]]:
+        """Return the buckets of ``risk_buckets.top_risk_buckets``; unknown currencies are ignored."""
+        portfolio_total = 0.0
+        for currency, (local, _) in self._currency_totals.items():
+            rate = self._rate(currency)
+            if rate is not None:
+                portfolio_total += local * rate
+
+        totals: Dict[str, float] = {}
+        if dimension == "currency":
+            for currency, (local, _) in self._currency_totals.items():
+                rate = self._rate(currency)
+                if rate is not None:
+                    totals[currency] = local * rate
+        else:
+            for label, by_currency in self._label_totals[dimension].items():
+                value = 0.0
+                known = False
+                for currency, (local, _) in by_currency.items():
+                    rate = self._rate(currency)
+                    if rate is not None:
+                        value += local * rate
+                        known = True
+                if known:
+                    totals[label] = value
+        return rank_buckets(totals, portfolio_total, top_n)
+
+    def top_positions(self, top_n: int = 10) -> List[Dict[str, float]]:
+        """Return the positions of ``top_positions_by_chf``; unknown currencies are ignored."""
+        streams = []
+        for currency, ranked in self._ranked.items():
+            rate = self._rate(currency)
+            if rate is not None:
+                streams.append(self._scaled(self._live_in_order(ranked), rate))
+        result = []
+        for neg_value, _, position_id in islice(heapq.merge(*streams), top_n):
+            entry = self._entries[position_id]
+            result.append({"instrument": entry.instrument, "value_chf": -neg_value, "currency": entry.currency})
+        return result
+
+    # Internals
+
+    def _rate(self, currency: str) -> Optional[float]:
+        return 1.0 if currency == "CHF" else self._rates.get(currency)
+
+    def _rate_strict(self, currency: str) -> float:
+        return 1.0 if currency == "CHF" else self._rates[currency]
+
+    @staticmethod
+    def _scaled(ranked: Iterable[Tuple[float, int, int, Any]], rate: float) -> Iterator[Tuple[float, int, Any]]:
+        # Scaling by a positive rate keeps each currency's order.
+        for neg_local, seq, _, position_id in ranked:
+            yield neg_local * rate, seq, position_id
+
+    def _live_in_order(self, heap: List[Tuple[float, int, int, Any]]) -> Iterator[Tuple[float, int, int, Any]]:
+        # Walk the heap best-first without popping it, skipping stale entries.
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            item, idx = heapq.heappop(frontier)
+            if self._is_live(item):
+                yield item
+            for child in (2 * idx + 1, 2 * idx + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def _is_live(self, item: Tuple[float, int, int, Any]) -> bool:
+        entry = self._entries.get(item[3])
+        return entry is not None and entry.token == item[2]
+
+    def _add(self, position_id: Any, entry: _Entry) -> None:
+        if entry.local_value is None:
+            return
+        currency = entry.currency
+        _bump(self._currency_totals, currency, entry.local_value, 1)
+        for dim, label in zip(self.dimensions, entry.labels):
+            _bump(self._label_totals[dim].setdefault(label, {}), currency, entry.local_value, 1)
+        heapq.heappush(self._ranked.setdefault(currency, []), (-entry.local_value, entry.seq, entry.token, position_id))
+
+    def _remove(self, entry: _Entry, prune: bool = True) -> None:
+        """Take ``entry`` out of the sums; without ``prune`` emptied slots stay in place."""
+        if entry.local_value is None:
+            return
+        currency = entry.currency
+        _bump(self._currency_totals, currency, -entry.local_value, -1, prune)
+        for dim, label in zip(self.dimensions, entry.labels):
+            by_label = self._label_totals[dim]
+            _bump(by_label[label], currency, -entry.local_value, -1, prune)
+            if not by_label[label]:
+                del by_label[label]
+        slot = self._currency_totals.get(currency)
+        live = int(slot[1]) if slot is not None else 0
+        if not live:
+            del self._ranked[currency]
+            self._stale.pop(currency, None)
+            return
+        stale = self._stale.get(currency, 0) + 1
+        if stale > live:
+            ranked = [item for item in self._ranked[currency] if item[2] != entry.token and self._is_live(item)]
+            heapq.heapify(ranked)
+            self._ranked[currency] = ranked
+            stale = 0
+        self._stale[currency] = stale
+
+    def _prune(self, entry: _Entry) -> None:
+        if entry.local_value is None:
+            return
+        currency = entry.currency
+        slot = self._currency_totals.get(currency)
+        if slot is not None and slot[1] == 0:
+            del self._currency_totals[currency]
+        for dim, label in zip(self.dimensions, entry.labels):
+            by_label = self._label_totals[dim]
+            by_currency = by_label.get(label)
+            if by_currency is None:
+                continue
+            slot = by_currency.get(currency)
+            if slot is not None and slot[1] == 0:
+                del by_currency[currency]
+            if not by_currency:
+                del by_label[label]
+
+
+def _bump(totals: Dict[str, List[float]], key: str, value: float, count: int, prune: bool = True) -> None:
+    slot = totals.get(key)
+    if slot is None:
+        totals[key] = [value, count]
+        return
+    slot[0] += value
+    slot[1] += count
+    if slot[1] == 0:
+        if prune:
+            del totals[key]
+        else:
+            slot[0] = 0.0  # drop the float residue of the removed values
+
+
+__all__ = ["IncrementalAggregator"]
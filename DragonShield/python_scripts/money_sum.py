@@ -0,0 +1,88 @@
+"""Accumulators for summing CHF amounts with a selectable precision.
+
+``float`` adds plain floats, as the analytics helpers always did.
+``compensated`` uses Neumaier summation, which keeps the rounding error of
+long sums near a single ulp. ``fixed`` rounds every amount to
+``FIXED_POINT_SCALE`` units (micro-CHF) and adds integers, so totals are
+exact for the rounded amounts and independent of the order of the positions.
+"""
+
+from typing import Callable, Dict, Union
+
+FIXED_POINT_SCALE = 1_000_000
+
+
+class FloatSum:
+    __slots__ = ("total",)
+
+    def __init__(self) -> None:
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        self.total += value
+
+    @property
+    def value(self) -> float:
+        return self.total
+
+
+class CompensatedSum:
+    __slots__ = ("total", "compensation")
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def add(self, value: float) -> None:
+        total = self.total + value
+        if abs(self.total) >= abs(value):
+            self.compensation += (self.total - total) + value
+        else:
+            self.compensation += (value - total) + self.total
+        self.total = total
+
+    @property
+    def value(self) -> float:
+        return self.total + self.compensation
+
+
+class FixedPointSum:
+    __slots__ = ("units",)
+
+    def __init__(self) -> None:
+        self.units = 0
+
+    def add(self, value: float) -> None:
+        self.units += round(value * FIXED_POINT_SCALE)
+
+    @property
+    def value(self) -> float:
+        return self.units / FIXED_POINT_SCALE
+
+
+Accumulator = Union[FloatSum, CompensatedSum, FixedPointSum]
+
+SUMMATION_MODES: Dict[str, Callable[[], Accumulator]] = {
+    "float": FloatSum,
+    "compensated": CompensatedSum,
+    "fixed": FixedPointSum,
+}
+
+
+def summation_factory(mode: str) -> Callable[[], Accumulator]:
+    """Return the accumulator class for ``mode``; raises ``ValueError`` if unknown."""
+    try:
+        return SUMMATION_MODES[mode]
+    except KeyError:
+        raise ValueError(f"Unknown summation mode: {mode}") from None
+
+
+__all__ = [
+    "FloatSum",
+    "CompensatedSum",
+    "FixedPointSum",
+    "Accumulator",
+    "SUMMATION_MODES",
+    "FIXED_POINT_SCALE",
+    "summation_factory",
+]
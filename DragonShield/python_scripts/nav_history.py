@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Rebuild the daily CHF portfolio value series from stored history.
+
+Holdings come from ``PositionReports`` (each account keeps the quantities of
+its latest report), prices from ``InstrumentPrice`` with the report's
+``current_price`` as an older fallback, and FX rates from ``ExchangeRates``
+by ``rate_date``. All three are read once, sorted by date and swept together
+as as-of joins, so the whole series is produced in a single pass instead of
+one query per day. The result can backfill ``PortfolioValueHistory``.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+DB_PATH = (
+    "/Users/renekeller/Library/Containers/com.rene.DragonShield/Data/Library/Application Support/DragonShield"
+    "/dragonshield.sqlite"
+)
+
+# Event kinds in the order they are applied on the same date: holdings first,
+# then report prices, then InstrumentPrice rows which override them.
+_HOLDINGS, _REPORT_PRICE, _PRICE, _FX = range(4)
+
+
+class _NavState:
+    """Running holdings, prices and per-currency local values.
+
+    Whether a currency is held is decided by counting the priced instruments
+    held in it, never by the size of its running float sum, so closing every
+    position drops the currency however large the rounding residue would be.
+    """
+
+    def __init__(self) -> None:
+        self.account_holdings: Dict[int, Dict[int, float]] = {}
+        self.quantity: Dict[int, float] = {}
+        # Accounts with a nonzero quantity per instrument.
+        self.holders: Dict[int, int] = {}
+        self.price: Dict[int, Tuple[float, str]] = {}
+        self.local: Dict[str, float] = {}
+        # Held, priced instruments per currency.
+        self.held_in: Dict[str, int] = {}
+        self.fx: Dict[str, float] = {"CHF": 1.0}
+
+    def set_holdings(self, account_id: int, holdings: Dict[int, float]) -> None:
+        previous = self.account_holdings.get(account_id, {})
+        for instrument_id, qty in previous.items():
+            if qty:
+                self._change_holding(instrument_id, -qty, -1)
+        for instrument_id, qty in holdings.items():
+            if qty:
+                self._change_holding(instrument_id, qty, 1)
+        self.account_holdings[account_id] = holdings
+
+    def set_price(self, instrument_id: int, price: float, currency: str) -> None:
+        old = self.price.get(instrument_id)
+        self.price[instrument_id] = (price, currency)
+        qty = self.quantity.get(instrument_id)
+        if qty is None:
+            return
+        if old is not None:
+            self._release(old[1], qty * old[0])
+        self._hold(currency, qty * price)
+
+    def value_chf(self, skip_missing_rates: bool, missing: Set[str]) -> float:
+        total = 0.0
+        for currency, local in self.local.items():
+            if not local:
+                continue
+            rate = self.fx.get(currency)
+            if rate is None:
+                if not skip_missing_rates:
+                    raise KeyError(currency)
+                missing.add(currency)
+                continue
+            total += local * rate
+        return total
+
+    def _change_holding(self, instrument_id: int, delta: float, holders_delta: int) -> None:
+        was_held = instrument_id in self.holders
+        old_qty = self.quantity.get(instrument_id, 0.0)
+        holders = self.holders.get(instrument_id, 0) + holders_delta
+        if holders:
+            self.holders[instrument_id] = holders
+            self.quantity[instrument_id] = old_qty + delta
+        else:
+            del self.holders[instrument_id]
+            del self.quantity[instrument_id]
+        priced = self.price.get(instrument_id)
+        if priced is None:
+            return
+        price, currency = priced
+        if not was_held:
+            self._hold(currency, delta * price)
+        elif not holders:
+            self._release(currency, old_qty * price)
+        else:
+            self.local[currency] += delta * price
+
+    def _hold(self, currency: str, value: float) -> None:
+        self.held_in[currency] = self.held_in.get(currency, 0) + 1
+        self.local[currency] = self.local.get(currency, 0.0) + value
+
+    def _release(self, currency: str, value: float) -> None:
+        count = self.held_in[currency] - 1
+        if count:
+            self.held_in[currency] = count
+            self.local[currency] -= value
+        else:
+            del self.held_in[currency]
+            del self.local[currency]
+
+
+def _holding_events(conn: sqlite3.Connection) -> Iterator[Tuple[str, int, int, Dict[int, float]]]:
+    rows = conn.execute(
+        """
+        SELECT substr(report_date, 1, 10) AS d, account_id, instrument_id, SUM(quantity)
+          FROM PositionReports
+         WHERE report_date IS NOT NULL
+         GROUP BY d, account_id, instrument_id
+         ORDER BY d, account_id
+        """
+    )
+    current: Optional[Tuple[str, int]] = None
+    holdings: Dict[int, float] = {}
+    for date, account_id, instrument_id, qty in rows:
+        if (date, account_id) != current:
+            if current is not None:
+                yield current[0], _HOLDINGS, current[1], holdings
+            current, holdings = (date, account_id), {}
+        holdings[instrument_id] = qty or 0.0
+    if current is not None:
+        yield current[0], _HOLDINGS, current[1], holdings
+
+
+def load_events(conn: sqlite3.Connection) -> List[Tuple]:
+    """Return all valuation events sorted by date and kind."""
+    currencies = dict(conn.execute("SELECT instrument_id, UPPER(currency) FROM Instruments"))
+    events: List[Tuple] = list(_holding_events(conn))
+    for date, instrument_id, price in conn.execute(
+        """
+        SELECT substr(report_date, 1, 10), instrument_id, current_price
+          FROM PositionReports
+         WHERE current_price IS NOT NULL AND report_date IS NOT NULL
+         ORDER BY position_id
+        """
+    ):
+        events.append((date, _REPORT_PRICE, instrument_id, (price, currencies.get(instrument_id, "CHF"))))
+    for date, instrument_id, price, currency in conn.execute(
+        "SELECT substr(as_of, 1, 10), instrument_id, price, UPPER(currency) FROM InstrumentPrice ORDER BY as_of, id"
+    ):
+        events.append((date, _PRICE, instrument_id, (price, currency or currencies.get(instrument_id, "CHF"))))
+    for date, currency, rate in conn.execute(
+        "SELECT substr(rate_date, 1, 10), UPPER(currency_code), rate_to_chf FROM ExchangeRates ORDER BY rate_date"
+    ):
+        events.append((date, _FX, currency, rate))
+    # Stable sort keeps the query order for events of one kind on the same date.
+    events.sort(key=lambda e: (e[0], e[1]))
+    return events
+
+
+def nav_series(
+    conn: sqlite3.Connection,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    skip_missing_rates: bool = False,
+    missing_rates: Optional[Set[str]] = None,
+) -> List[Tuple[str, float]]:
+    """Return ``(value_date, total_value_chf)`` for every event date.
+
+    Dates are the union of report dates, price dates and rate dates from the
+    first report onwards, limited to ``start``/``end`` (inclusive,
+    ``YYYY-MM-DD``). A held currency without a rate on or before a date
+    raises ``KeyError`` unless ``skip_missing_rates`` is set, in which case
+    those holdings are left out of that day's value and the currency is
+    added to ``missing_rates`` when given.
+    """
+    state = _NavState()
+    missing = missing_rates if missing_rates is not None else set()
+    series: List[Tuple[str, float]] = []
+    have_holdings = False
+    events = load_events(conn)
+    idx = 0
+    while idx < len(events):
+        date = events[idx][0]
+        while idx < len(events) and events[idx][0] == date:
+            _, kind, key, payload = events[idx]
+            if kind == _HOLDINGS:
+                state.set_holdings(key, payload)
+                have_holdings = True
+            elif kind == _FX:
+                state.fx[key] = payload
+            else:
+                state.set_price(key, payload[0], payload[1])
+            idx += 1
+        if end is not None and date > end:
+            break
+        if not have_holdings or (start is not None and date < start):
+            continue
+        series.append((date, state.value_chf(skip_missing_rates, missing)))
+    return series
+
+
+def backfill_value_history(
+    conn: sqlite3.Connection, series: Sequence[Tuple[str, float]], overwrite: bool = False
+) -> int:
+    """Store ``series`` in ``PortfolioValueHistory`` and return the rows written.
+
+    Existing dates are kept unless ``overwrite`` is set.
+    """
+    if overwrite:
+        sql = """
+            INSERT INTO PortfolioValueHistory (value_date, total_value_chf)
+            VALUES (?, ?)
+            ON CONFLICT(value_date) DO UPDATE
+               SET total_value_chf = excluded.total_value_chf,
+                   updated_at = CURRENT_TIMESTAMP
+        """
+    else:
+        sql = "INSERT OR IGNORE INTO PortfolioValueHistory (value_date, total_value_chf) VALUES (?, ?)"
+    before = conn.total_changes
+    conn.executemany(sql, series)
+    conn.commit()
+    return conn.total_changes - before
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild the daily CHF portfolio value series")
+    parser.add_argument("--db", default=DB_PATH, help="Path to database")
+    parser.add_argument("--start", help="First value date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last value date (YYYY-MM-DD)")
+    parser.add_argument("--skip-missing-rates", action="store_true", help="Leave out holdings without an FX rate")
+    parser.add_argument("--write", action="store_true", help="Backfill PortfolioValueHistory instead of printing")
+    parser.add_argument("--overwrite", action="store_true", help="Replace existing PortfolioValueHistory rows")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    missing: Set[str] = set()
+    try:
+        series = nav_series(conn, args.start, args.end, args.skip_missing_rates, missing)
+        if missing:
+            print(f"Left out holdings without an exchange rate in: {', '.join(sorted(missing))}", file=sys.stderr)
+        if args.write:
+            written = backfill_value_history(conn, series, args.overwrite)
+            print(f"Computed {len(series)} daily values; wrote {written} rows to PortfolioValueHistory")
+        else:
+            print(json.dumps([{"value_date": d, "total_value_chf": v} for d, v in series]))
+    except KeyError as exc:
+        print(f"Missing exchange rate for {exc.args[0]}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
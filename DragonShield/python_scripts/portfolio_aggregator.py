@@ -0,0 +1,143 @@
+"""Single-pass computation of the dashboard portfolio analytics."""
+
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple, Union
+
+from .currency_exposure import currency_breakdown
+from .position_frame import PositionFrame
+from .risk_buckets import rank_buckets
+from .top_k import TopK
+
+DEFAULT_BUCKET_DIMENSIONS: Tuple[str, ...] = ("sector", "issuer", "country_code")
+
+
+@dataclass
+class PortfolioAggregates:
+    """Results of one :class:`PortfolioAggregator` pass."""
+
+    total_chf: float
+    top_positions: List[Dict[str, float]]
+    currency_exposure: List[Dict[str, float]]
+    risk_buckets: Dict[str, List[Dict[str, float]]] = field(default_factory=dict)
+
+
+class PortfolioAggregator:
+    """Compute total value, top positions, currency exposure and risk buckets together.
+
+    Each position is valued in CHF exactly once. The outputs equal those of
+    ``calculate_total_asset_value``, ``top_positions_by_chf``,
+    ``currency_exposure`` and ``top_risk_buckets`` for the same input.
+    Like the total value and currency exposure helpers, ``aggregate`` raises
+    ``KeyError`` when a priced position uses a non-CHF currency missing from
+    ``rates``.
+    """
+
+    def __init__(
+        self,
+        rates: Mapping[str, float],
+        top_positions_n: int = 10,
+        currency_top_n: int = 6,
+        bucket_top_n: int = 5,
+        dimensions: Sequence[str] = DEFAULT_BUCKET_DIMENSIONS,
+    ):
+        self.rates = rates
+        self.top_positions_n = top_positions_n
+        self.currency_top_n = currency_top_n
+        self.bucket_top_n = bucket_top_n
+        self.dimensions = tuple(dimensions)
+
+    def aggregate(self, positions: Union[Iterable[Mapping], PositionFrame]) -> PortfolioAggregates:
+        """Scan ``positions`` once and return all aggregates."""
+        if isinstance(positions, PositionFrame):
+            return self._aggregate_frame(positions)
+
+        rates = self.rates
+        dimensions = self.dimensions
+        best = TopK(self.top_positions_n, key=itemgetter(0))
+        currency_totals: Dict[str, float] = {}
+        label_totals: Dict[str, Dict[str, float]] = {d: {} for d in dimensions}
+        total = 0.0
+
+        for pos in positions:
+            price = pos.get("current_price")
+            if price is None:
+                continue
+            value = pos.get("quantity", 0) * price
+            currency = str(pos.get("currency", "CHF")).upper()
+            if currency != "CHF":
+                value *= rates[currency]
+            total += value
+            currency_totals[currency] = currency_totals.get(currency, 0.0) + value
+            for dim in dimensions:
+                label = str(pos.get(dim)) if dim != "currency" else currency
+                if label == "None":
+                    label = "Unknown"
+                totals = label_totals[dim]
+                totals[label] = totals.get(label, 0) + value
+            best.push((value, pos.get("instrument", ""), currency))
+
+        return self._result(total, best, currency_totals, label_totals)
+
+    def _aggregate_frame(self, frame: PositionFrame) -> PortfolioAggregates:
+        rate_by_code = frame.rate_table(self.rates)
+        currencies = frame.currencies
+        instruments = frame.instruments
+        label_columns = [frame.labels(d) for d in self.dimensions]
+        label_sums = [[0.0] * len(labels) for _, labels in label_columns]
+        label_order: List[List[int]] = [[] for _ in label_columns]
+        label_seen = [bytearray(len(labels)) for _, labels in label_columns]
+        currency_sums = [0.0] * len(currencies)
+        currency_order: List[int] = []
+        currency_seen = bytearray(len(currencies))
+        best = TopK(self.top_positions_n, key=itemgetter(0))
+        total = 0.0
+
+        for idx, (qty, price, code) in enumerate(zip(frame.quantity, frame.price, frame.currency_codes)):
+            if price != price:
+                continue
+            rate = rate_by_code[code]
+            if rate != rate:
+                raise KeyError(currencies[code])
+            value = qty * price * rate
+            total += value
+            if not currency_seen[code]:
+                currency_seen[code] = 1
+                currency_order.append(code)
+            currency_sums[code] += value
+            for (codes, _), sums, seen, order in zip(label_columns, label_sums, label_seen, label_order):
+                label_code = codes[idx]
+                if not seen[label_code]:
+                    seen[label_code] = 1
+                    order.append(label_code)
+                sums[label_code] += value
+            best.push((value, instruments[idx], currencies[code]))
+
+        currency_totals = {currencies[c]: currency_sums[c] for c in currency_order}
+        label_totals = {
+            dim: {labels[c]: sums[c] for c in order}
+            for dim, (_, labels), sums, order in zip(self.dimensions, label_columns, label_sums, label_order)
+        }
+        return self._result(total, best, currency_totals, label_totals)
+
+    def _result(
+        self,
+        total: float,
+        best: TopK,
+        currency_totals: Dict[str, float],
+        label_totals: Dict[str, Dict[str, float]],
+    ) -> PortfolioAggregates:
+        return PortfolioAggregates(
+            total_chf=total,
+            top_positions=[
+                {"instrument": instrument, "value_chf": value, "currency": currency}
+                for value, instrument, currency in best.results()
+            ],
+            currency_exposure=currency_breakdown(currency_totals, total, self.currency_top_n),
+            risk_buckets={
+                dim: rank_buckets(totals, total, self.bucket_top_n) for dim, totals in label_totals.items()
+            },
+        )
+
+
+__all__ = ["PortfolioAggregator", "PortfolioAggregates", "DEFAULT_BUCKET_DIMENSIONS"]
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Parametric portfolio VaR with marginal and component VaR per holding.
+
+Instrument prices from ``InstrumentPrice`` are aligned on a common daily
+grid (last price per day, carried forward) and turned into return series.
+Holdings come from each account's latest ``PositionReports`` valued in CHF.
+
+The portfolio figures never need the full covariance matrix: with CHF
+exposures ``e`` the portfolio P&L series is ``p = R e``, the portfolio
+variance is ``var(p)`` and the covariance of each instrument with the
+portfolio, ``(S e)_i = cov(r_i, p)``, is one dot product per instrument. That
+keeps the work at O(T * N) for T days and N instruments. Optional EWMA
+weighting and shrinkage towards the diagonal fit into the same sums. The
+full covariance or correlation matrix (O(T * N^2)) is only built on request.
+
+Returns are in each instrument's price currency; FX moves of the holdings
+are not modelled. VaR figures are CHF P&L and negative for losses, like
+``risk_metrics.value_at_risk``.
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+from dataclasses import asdict, dataclass, field
+from itertools import repeat
+from operator import add, mul, sub
+from statistics import NormalDist
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from risk_metrics import DB_PATH
+
+Matrix = List[List[float]]
+
+# Fewest daily returns an instrument and the aligned sample need for a VaR.
+MIN_RETURNS = 20
+
+
+@dataclass
+class HoldingRisk:
+    """Risk contribution of one instrument."""
+
+    instrument_id: int
+    exposure_chf: float
+    marginal_var: float
+    component_var: float
+    contribution_pct: float
+
+
+@dataclass
+class PortfolioVaR:
+    """Parametric VaR of the portfolio and its holdings."""
+
+    confidence: float
+    horizon: int
+    observations: int
+    exposure_chf: float
+    volatility_chf: float
+    var_chf: float
+    holdings: List[HoldingRisk] = field(default_factory=list)
+    unmodelled: List[int] = field(default_factory=list)
+
+
+def observation_weights(count: int, ewma_lambda: Optional[float] = None) -> List[float]:
+    """Weights summing to 1, equal or decaying by ``ewma_lambda`` into the past."""
+    if count == 0:
+        return []
+    if ewma_lambda is None:
+        return [1.0 / count] * count
+    raw = [ewma_lambda ** (count - 1 - t) for t in range(count)]
+    total = math.fsum(raw)
+    return [w / total for w in raw]
+
+
+def _centered(series: Sequence[float], weights: Sequence[float]) -> List[float]:
+    mean = math.fsum(map(mul, series, weights))
+    return list(map(sub, series, repeat(mean)))
+
+
+def parametric_var(
+    returns: Mapping[int, Sequence[float]],
+    exposures: Mapping[int, float],
+    confidence: float = 0.95,
+    horizon: int = 1,
+    ewma_lambda: Optional[float] = None,
+    shrinkage: float = 0.0,
+    min_returns: int = MIN_RETURNS,
+) -> PortfolioVaR:
+    """Return portfolio, marginal and component VaR for CHF ``exposures``.
+
+    ``returns`` maps instrument ids to aligned daily return series of equal
+    length. ``shrinkage`` in [0, 1] blends the sample covariance with its
+    diagonal. Component VaRs add up to the portfolio VaR. Raises
+    ``ValueError`` when the modelled instruments have fewer than
+    ``min_returns`` aligned returns.
+    """
+    if not 0.0 <= shrinkage <= 1.0:
+        raise ValueError("shrinkage must be between 0 and 1")
+    ids = [i for i in exposures if i in returns]
+    unmodelled = [i for i in exposures if i not in returns]
+    count = len(returns[ids[0]]) if ids else 0
+    if ids and count < min_returns:
+        raise ValueError(f"Only {count} aligned returns, at least {min_returns} are needed")
+    weights = observation_weights(count, ewma_lambda)
+    z = NormalDist().inv_cdf(confidence) * math.sqrt(max(1, horizon))
+
+    centered = [_centered(returns[i], weights) for i in ids]
+    pnl = [0.0] * count
+    for exposure, column in zip((exposures[i] for i in ids), centered):
+        pnl = list(map(add, pnl, map(mul, column, repeat(exposure))))
+    weighted_pnl = list(map(mul, pnl, weights))
+
+    variance = math.fsum(map(mul, weighted_pnl, pnl)) * (1 - shrinkage)
+    with_portfolio: List[float] = []
+    for i, column in zip(ids, centered):
+        cov_p = math.fsum(map(mul, column, weighted_pnl))
+        if shrinkage:
+            own = math.fsum(map(mul, map(mul, column, column), weights))
+            variance += shrinkage * exposures[i] * exposures[i] * own
+            cov_p = (1 - shrinkage) * cov_p + shrinkage * own * exposures[i]
+        with_portfolio.append(cov_p)
+
+    volatility = math.sqrt(max(variance, 0.0))
+    var = -z * volatility
+    holdings = []
+    for i, cov_p in zip(ids, with_portfolio):
+        marginal = -z * cov_p / volatility if volatility else 0.0
+        component = exposures[i] * marginal
+        holdings.append(
+            HoldingRisk(
+                instrument_id=i,
+                exposure_chf=exposures[i],
+                marginal_var=marginal,
+                component_var=component,
+                contribution_pct=component / var if var else 0.0,
+            )
+        )
+    return PortfolioVaR(
+        confidence=confidence,
+        horizon=max(1, horizon),
+        observations=count,
+        exposure_chf=math.fsum(exposures[i] for i in ids),
+        volatility_chf=volatility,
+        var_chf=var,
+        holdings=holdings,
+        unmodelled=unmodelled,
+    )
+
+
+def covariance_matrix(
+    returns: Mapping[int, Sequence[float]],
+    ewma_lambda: Optional[float] = None,
+    shrinkage: float = 0.0,
+) -> Tuple[List[int], Matrix]:
+    """Return ``(ids, matrix)`` of the (weighted, shrunk) return covariance."""
+    ids = list(returns)
+    count = len(returns[ids[0]]) if ids else 0
+    weights = observation_weights(count, ewma_lambda)
+    centered = [_centered(returns[i], weights) for i in ids]
+    weighted = [list(map(mul, column, weights)) for column in centered]
+    matrix: Matrix = [[0.0] * len(ids) for _ in ids]
+    for a, left in enumerate(weighted):
+        for b in range(a, len(ids)):
+            value = math.fsum(map(mul, left, centered[b]))
+            if a != b:
+                value *= 1 - shrinkage
+            matrix[a][b] = matrix[b][a] = value
+    return ids, matrix
+
+
+def correlation_matrix(
+    returns: Mapping[int, Sequence[float]], ewma_lambda: Optional[float] = None
+) -> Tuple[List[int], Matrix]:
+    ids, cov = covariance_matrix(returns, ewma_lambda)
+    scale = [math.sqrt(cov[k][k]) for k in range(len(ids))]
+    return ids, [
+        [cov[a][b] / (scale[a] * scale[b]) if scale[a] and scale[b] else 0.0 for b in range(len(ids))]
+        for a in range(len(ids))
+    ]
+
+
+def load_aligned_returns(
+    conn: sqlite3.Connection,
+    instrument_ids: Sequence[int],
+    days: Optional[int] = None,
+    min_returns: int = MIN_RETURNS,
+) -> Dict[int, List[float]]:
+    """Return daily returns of ``instrument_ids`` on a common date grid.
+
+    The last ``InstrumentPrice`` of a day is that day's price and is carried
+    forward over days without a quote. The grid starts on the first day on
+    which every kept instrument has a price. Instruments quoted on fewer than
+    ``min_returns + 1`` days are left out, so a recent listing cannot cut the
+    other series short. ``days`` keeps only the last ``days`` returns.
+    """
+    wanted = list(dict.fromkeys(instrument_ids))
+    if not wanted:
+        return {}
+    rows = conn.execute(
+        f"""SELECT substr(as_of, 1, 10), instrument_id, price FROM InstrumentPrice
+             WHERE price IS NOT NULL AND instrument_id IN ({','.join('?' * len(wanted))})
+             ORDER BY as_of, id""",
+        wanted,
+    ).fetchall()
+    quote_days: Dict[int, Set[str]] = {}
+    for date, instrument_id, _ in rows:
+        quote_days.setdefault(instrument_id, set()).add(date)
+    ids = [i for i in wanted if len(quote_days.get(i, ())) > min_returns]
+    kept = set(ids)
+    rows = [r for r in rows if r[1] in kept]
+    current: Dict[int, float] = {}
+    prices: Dict[int, List[float]] = {i: [] for i in ids}
+    idx = 0
+    while idx < len(rows):
+        date = rows[idx][0]
+        while idx < len(rows) and rows[idx][0] == date:
+            current[rows[idx][1]] = rows[idx][2]
+            idx += 1
+        if len(current) == len(ids):
+            for i in ids:
+                prices[i].append(current[i])
+    returns = {i: [b / a - 1 if a else 0.0 for a, b in zip(p, p[1:])] for i, p in prices.items()}
+    if days is not None:
+        returns = {i: r[-days:] for i, r in returns.items()}
+    return returns
+
+
+def current_exposures(conn: sqlite3.Connection) -> Dict[int, float]:
+    """Return CHF exposure per instrument from each account's latest report.
+
+    The latest ``InstrumentPrice`` is used where available, otherwise the
+    report's ``current_price``. Positions without a price are skipped; a
+    missing ``ExchangeRates`` rate raises ``KeyError``.
+    """
+    rates = {
+        str(c).upper(): r
+        for c, r in conn.execute("SELECT currency_code, rate_to_chf FROM ExchangeRates WHERE is_latest = 1")
+    }
+    rates["CHF"] = 1.0
+    latest_prices: Dict[int, Tuple[float, Optional[str]]] = {}
+    for instrument_id, price, currency in conn.execute(
+        "SELECT instrument_id, price, currency FROM InstrumentPrice WHERE price IS NOT NULL ORDER BY as_of, id"
+    ):
+        latest_prices[instrument_id] = (price, currency)
+
+    exposures: Dict[int, float] = {}
+    for instrument_id, quantity, report_price, instrument_currency in conn.execute(
+        """
+        SELECT pr.instrument_id, pr.quantity, pr.current_price, i.currency
+          FROM PositionReports pr
+          JOIN Instruments i ON i.instrument_id = pr.instrument_id
+         WHERE pr.report_date = (
+               SELECT MAX(p2.report_date) FROM PositionReports p2 WHERE p2.account_id = pr.account_id
+         )
+        """
+    ):
+        price, currency = latest_prices.get(instrument_id, (report_price, None))
+        if price is None or not quantity:
+            continue
+        currency = str(currency or instrument_currency or "CHF").upper()
+        exposures[instrument_id] = exposures.get(instrument_id, 0.0) + quantity * price * rates[currency]
+    return exposures
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Parametric portfolio VaR from InstrumentPrice history")
+    parser.add_argument("--db", default=DB_PATH, help="Path to database")
+    parser.add_argument("--days", type=int, default=252, help="Number of daily returns used")
+    parser.add_argument("--confidence", type=float, default=0.95, help="VaR confidence level")
+    parser.add_argument("--horizon", type=int, default=1, help="Horizon in trading days")
+    parser.add_argument("--ewma", type=float, metavar="LAMBDA", help="EWMA decay, e.g. 0.94")
+    parser.add_argument("--shrinkage", type=float, default=0.0, help="Shrinkage towards the diagonal (0-1)")
+    parser.add_argument("--matrix", choices=["covariance", "correlation"], help="Also output this matrix")
+    parser.add_argument(
+        "--min-returns", type=int, default=MIN_RETURNS, help="Fewest daily returns an instrument needs to be modelled"
+    )
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        exposures = current_exposures(conn)
+        returns = load_aligned_returns(conn, list(exposures), args.days, args.min_returns)
+    except KeyError as exc:
+        print(f"Missing exchange rate for {exc.args[0]}")
+        return 1
+    finally:
+        conn.close()
+
+    try:
+        result = parametric_var(
+            returns, exposures, args.confidence, args.horizon, args.ewma, args.shrinkage, args.min_returns
+        )
+    except ValueError as exc:
+        print(str(exc))
+        return 1
+    output = asdict(result)
+    if args.matrix == "covariance":
+        output["matrix_ids"], output["matrix"] = covariance_matrix(returns, args.ewma, args.shrinkage)
+    elif args.matrix == "correlation":
+        output["matrix_ids"], output["matrix"] = correlation_matrix(returns, args.ewma)
+    print(json.dumps(output))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
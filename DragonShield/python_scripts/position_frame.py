@@ -0,0 +1,213 @@
+"""Column-oriented position snapshot shared by the portfolio analytics helpers."""
+
+from array import array
+from operator import mul
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from .money_sum import summation_factory
+
+DEFAULT_DIMENSIONS: Tuple[str, ...] = ("sector", "issuer", "country_code", "asset_class")
+
+_NAN = float("nan")
+
+
+class PositionFrame:
+    """Parallel arrays describing a set of positions.
+
+    Quantities and prices are stored in ``array('d')`` columns; a missing
+    ``current_price`` is stored as NaN. Currencies are normalised to upper case
+    once and stored as integer codes into ``currencies``. Grouping dimensions
+    listed in ``dimensions`` are encoded the same way, using the label rules of
+    ``risk_buckets.top_risk_buckets`` (``None`` becomes ``"Unknown"``).
+
+    ``calculate_total_asset_value``, ``top_positions_by_chf``,
+    ``currency_exposure`` and ``top_risk_buckets`` accept a frame in place of
+    an iterable of mappings.
+    """
+
+    __slots__ = (
+        "instruments",
+        "quantity",
+        "price",
+        "currency_codes",
+        "currencies",
+        "dimensions",
+        "_currency_index",
+        "_label_codes",
+        "_labels",
+        "_label_index",
+    )
+
+    def __init__(self, dimensions: Sequence[str] = DEFAULT_DIMENSIONS):
+        self.instruments: List[Any] = []
+        self.quantity = array("d")
+        self.price = array("d")
+        self.currency_codes = array("i")
+        self.currencies: List[str] = []
+        self.dimensions: Tuple[str, ...] = tuple(d for d in dimensions if d != "currency")
+        self._currency_index: Dict[str, int] = {}
+        self._label_codes: Dict[str, array] = {d: array("i") for d in self.dimensions}
+        self._labels: Dict[str, List[str]] = {d: [] for d in self.dimensions}
+        self._label_index: Dict[str, Dict[str, int]] = {d: {} for d in self.dimensions}
+
+    @classmethod
+    def from_positions(
+        cls, positions: Iterable[Mapping], dimensions: Sequence[str] = DEFAULT_DIMENSIONS
+    ) -> "PositionFrame":
+        """Build a frame from position mappings as used by the analytics helpers."""
+        frame = cls(dimensions)
+        dims = frame.dimensions
+        for pos in positions:
+            frame.append(
+                pos.get("instrument", ""),
+                pos.get("quantity", 0),
+                pos.get("current_price"),
+                pos.get("currency", "CHF"),
+                [pos.get(d) for d in dims],
+            )
+        return frame
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Sequence],
+        columns: Sequence[str],
+        dimensions: Sequence[str] = DEFAULT_DIMENSIONS,
+    ) -> "PositionFrame":
+        """Build a frame from query rows such as a ``sqlite3`` cursor.
+
+        ``columns`` names each row field. ``quantity``, ``current_price`` and
+        ``currency`` are used for valuation, ``instrument`` for labelling and
+        any encoded dimension is read from the column of the same name. Fields
+        not present in ``columns`` take the defaults of the mapping helpers.
+        """
+        frame = cls(dimensions)
+        index = {name: i for i, name in enumerate(columns)}
+
+        def getter(name: str, default: Any = None):
+            i = index.get(name)
+            if i is None:
+                return lambda row: default
+            return lambda row: row[i]
+
+        get_instrument = getter("instrument", "")
+        get_quantity = getter("quantity", 0)
+        get_price = getter("current_price")
+        get_currency = getter("currency", "CHF")
+        dim_getters = [getter(d) for d in frame.dimensions]
+        for row in rows:
+            frame.append(
+                get_instrument(row),
+                get_quantity(row),
+                get_price(row),
+                get_currency(row),
+                [g(row) for g in dim_getters],
+            )
+        return frame
+
+    def append(
+        self,
+        instrument: Any,
+        quantity: Any,
+        price: Any,
+        currency: Any,
+        labels: Sequence[Any] = (),
+    ) -> None:
+        """Append one position; ``labels`` follow the order of ``dimensions``."""
+        self.instruments.append(instrument)
+        self.quantity.append(float(quantity or 0))
+        self.price.append(_NAN if price is None else float(price))
+        self.currency_codes.append(self._currency_code(str(currency).upper()))
+        for dim, raw in zip(self.dimensions, labels):
+            label = str(raw)
+            if label == "None":
+                label = "Unknown"
+            index = self._label_index[dim]
+            code = index.get(label)
+            if code is None:
+                code = index[label] = len(self._labels[dim])
+                self._labels[dim].append(label)
+            self._label_codes[dim].append(code)
+        for dim in self.dimensions[len(labels):]:
+            self._label_codes[dim].append(self._unknown_code(dim))
+
+    def __len__(self) -> int:
+        return len(self.quantity)
+
+    def rate_table(self, rates: Mapping[str, float]) -> array:
+        """Return ``rate_to_chf`` per currency code, NaN where ``rates`` has none."""
+        table = array("d", [_NAN]) * len(self.currencies)
+        for code, currency in enumerate(self.currencies):
+            if currency == "CHF":
+                table[code] = 1.0
+            else:
+                rate = rates.get(currency)
+                if rate is not None:
+                    table[code] = rate
+        return table
+
+    def labels(self, dimension: str) -> Tuple[array, List[str]]:
+        """Return ``(codes, labels)`` for ``dimension``.
+
+        ``currency`` is always available; other dimensions must have been
+        encoded when the frame was built, otherwise ``KeyError`` is raised.
+        """
+        if dimension == "currency":
+            return self.currency_codes, self.currencies
+        return self._label_codes[dimension], self._labels[dimension]
+
+    def local_totals(self) -> Tuple[array, bytearray]:
+        """Return the summed ``quantity * price`` per currency code.
+
+        Positions without a price are skipped. The second element flags each
+        currency code that has at least one priced position.
+        """
+        totals = array("d", [0.0]) * len(self.currencies)
+        priced = bytearray(len(self.currencies))
+        for qty, price, code in zip(self.quantity, self.price, self.currency_codes):
+            if price == price:
+                totals[code] += qty * price
+                priced[code] = 1
+        return totals, priced
+
+    def chf_totals(self, rates: Mapping[str, float], summation: str = "float") -> Tuple[array, bytearray]:
+        """Return the summed CHF value per currency code, flagged like ``local_totals``.
+
+        ``summation`` selects a ``money_sum`` mode. Except for ``float``, each
+        position is converted to CHF before it is added, so amounts are
+        rounded at the same point as in the mapping-based helpers. Currencies
+        without a rate in ``rates`` have a NaN total.
+        """
+        table = self.rate_table(rates)
+        if summation == "float":
+            local, priced = self.local_totals()
+            return array("d", map(mul, local, table)), priced
+
+        new_sum = summation_factory(summation)
+        sums = [new_sum() for _ in self.currencies]
+        priced = bytearray(len(self.currencies))
+        for qty, price, code in zip(self.quantity, self.price, self.currency_codes):
+            if price == price:
+                priced[code] = 1
+                rate = table[code]
+                if rate == rate:
+                    sums[code].add(qty * price * rate)
+        return array("d", [s.value if r == r else _NAN for s, r in zip(sums, table)]), priced
+
+    def _currency_code(self, currency: str) -> int:
+        code = self._currency_index.get(currency)
+        if code is None:
+            code = self._currency_index[currency] = len(self.currencies)
+            self.currencies.append(currency)
+        return code
+
+    def _unknown_code(self, dimension: str) -> int:
+        index = self._label_index[dimension]
+        code = index.get("Unknown")
+        if code is None:
+            code = index["Unknown"] = len(self._labels[dimension])
+            self._labels[dimension].append("Unknown")
+        return code
+
+
+__all__ = ["PositionFrame", "DEFAULT_DIMENSIONS"]
@@ -1,24 +1,62 @@
 """Utilities for computing risk concentration buckets."""
 
-from typing import Iterable, Mapping, List, Dict
+from typing import Iterable, Mapping, List, Dict, Tuple, Union
+
+from .money_sum import Accumulator, summation_factory
+from .position_frame import PositionFrame
+from .top_k import top_k
+
+# Share of the portfolio above which a bucket is flagged as over-concentrated.
+OVERCONCENTRATION_THRESHOLD = 0.25
 
 
 def top_risk_buckets(
-    positions: Iterable[Mapping],
+    positions: Union[Iterable[Mapping], PositionFrame],
     rates: Mapping[str, float],
     dimension: str = "sector",
     top_n: int = 5,
+    summation: str = "float",
 ) -> List[Dict[str, float]]:
     """Return top ``top_n`` groups by CHF value.
 
     Each position should provide ``quantity``, ``current_price`` and ``currency``
     plus fields corresponding to the grouping dimension such as ``sector``,
     ``issuer``, or ``country_code``. Rates map currency codes to ``rate_to_chf``.
-    Unknown currencies are ignored.
+    Unknown currencies are ignored. ``positions`` may also be a
+    :class:`PositionFrame` that encodes ``dimension``. ``summation`` selects
+    how values are added up (see ``money_sum``).
     """
 
-    totals: Dict[str, float] = {}
-    portfolio_total = 0.0
+    if isinstance(positions, PositionFrame):
+        totals, portfolio_total = _totals_from_frame(positions, rates, dimension, summation)
+        return rank_buckets(totals, portfolio_total, top_n)
+
+    if summation == "float":
+        # Plain float addition, without the accumulator calls per position.
+        float_totals: Dict[str, float] = {}
+        portfolio_total = 0.0
+        for pos in positions:
+            price = pos.get("current_price")
+            if price is None:
+                continue
+            qty = pos.get("quantity", 0)
+            currency = str(pos.get("currency", "CHF")).upper()
+            value = qty * price
+            if currency != "CHF":
+                rate = rates.get(currency)
+                if rate is None:
+                    continue
+                value *= rate
+            portfolio_total += value
+            label = str(pos.get(dimension)) if dimension != "currency" else currency
+            if label == "None":
+                label = "Unknown"
+            float_totals[label] = float_totals.get(label, 0) + value
+        return rank_buckets(float_totals, portfolio_total, top_n)
+
+    new_sum = summation_factory(summation)
+    sums: Dict[str, Accumulator] = {}
+    total = new_sum()
 
     for pos in positions:
         price = pos.get("current_price")
@@ -32,27 +70,72 @@ def top_risk_buckets(
             if rate is None:
                 continue
             value *= rate
-        portfolio_total += value
+        total.add(value)
         label = str(pos.get(dimension)) if dimension != "currency" else currency
         if label == "None":
             label = "Unknown"
-        totals[label] = totals.get(label, 0) + value
+        acc = sums.get(label)
+        if acc is None:
+            acc = sums[label] = new_sum()
+        acc.add(value)
+
+    totals = {label: acc.value for label, acc in sums.items()}
+    return rank_buckets(totals, total.value, top_n)
+
 
+def _totals_from_frame(
+    frame: PositionFrame, rates: Mapping[str, float], dimension: str, summation: str
+) -> Tuple[Dict[str, float], float]:
+    codes, labels = frame.labels(dimension)
+    rate_by_code = frame.rate_table(rates)
+    seen = bytearray(len(labels))
+    order: List[int] = []
+    if summation == "float":
+        float_sums = [0.0] * len(labels)
+        portfolio_total = 0.0
+        for qty, price, currency_code, code in zip(frame.quantity, frame.price, frame.currency_codes, codes):
+            value = qty * price * rate_by_code[currency_code]
+            # NaN marks a missing price or an unknown rate
+            if value != value:
+                continue
+            if not seen[code]:
+                seen[code] = 1
+                order.append(code)
+            float_sums[code] += value
+            portfolio_total += value
+        return {labels[code]: float_sums[code] for code in order}, portfolio_total
+
+    new_sum = summation_factory(summation)
+    sums: List[Accumulator] = [new_sum() for _ in labels]
+    total = new_sum()
+    for qty, price, currency_code, code in zip(frame.quantity, frame.price, frame.currency_codes, codes):
+        value = qty * price * rate_by_code[currency_code]
+        # NaN marks a missing price or an unknown rate
+        if value != value:
+            continue
+        if not seen[code]:
+            seen[code] = 1
+            order.append(code)
+        sums[code].add(value)
+        total.add(value)
+    return {labels[code]: sums[code].value for code in order}, total.value
+
+
+def rank_buckets(totals: Mapping[str, float], portfolio_total: float, top_n: int) -> List[Dict[str, float]]:
+    """Format per-label CHF ``totals`` as returned by :func:`top_risk_buckets`."""
     if portfolio_total == 0:
         return []
 
-    buckets = [
+    top = top_k(totals.items(), top_n, key=lambda item: item[1])
+    return [
         {
             "label": label,
             "value_chf": value,
             "exposure_pct": value / portfolio_total,
-            "is_overconcentrated": (value / portfolio_total) > 0.25,
+            "is_overconcentrated": (value / portfolio_total) > OVERCONCENTRATION_THRESHOLD,
         }
-        for label, value in totals.items()
+        for label, value in top
     ]
 
-    buckets.sort(key=lambda b: b["value_chf"], reverse=True)
-    return buckets[:top_n]
-
 
-__all__ = ["top_risk_buckets"]
+__all__ = ["top_risk_buckets", "rank_buckets", "OVERCONCENTRATION_THRESHOLD"]
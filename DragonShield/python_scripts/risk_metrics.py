@@ -1,74 +1,444 @@
 # risk_metrics.py
-# MARK: - Version 1.0
+# MARK: - Version 1.11
 # MARK: - History
 # - 1.0: Initial implementation of portfolio risk metrics calculations.
+# - 1.1: Compute each standard deviation once in Sharpe and Sortino ratios.
+# - 1.2: Selection-based VaR with interpolation, expected shortfall and multi-level tail risk.
+# - 1.3: Compute every lookback period from one load with --all-periods.
+# - 1.4: Read only the tail of date-sorted CSV files in load_returns.
+# - 1.5: Derive returns from PortfolioValueHistory with --db and an incremental on-disk cache.
+# - 1.6: Single-pass max_drawdown without intermediate series.
+# - 1.7: Tail-only CSV reads require --assume-sorted.
+# - 1.8: Validate the --db returns cache against a fingerprint of the whole history.
+# - 1.9: Opt-in --cache under the user cache directory, keyed on the last date and row count; read only the history tail.
+# - 1.10: Order the tail once in tail_risk for every VaR and CVaR.
+# - 1.11: Decode CSV tails only from the first complete line.
 
 import argparse
+import csv
+import hashlib
+import heapq
 import json
+import os
 import pandas as pd
 import math
-from typing import Dict
+import sqlite3
+from bisect import bisect_right
+from datetime import datetime
+from itertools import accumulate
+from operator import mul
+from typing import Any, BinaryIO, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+DB_PATH = (
+    "/Users/renekeller/Library/Containers/com.rene.DragonShield/Data/Library/Application Support/DragonShield"
+    "/dragonshield.sqlite"
+)
+
+TAIL_CONFIDENCES = (0.90, 0.95, 0.975, 0.99)
+
+# Quantile interpolations accepted by tail_risk, as in pandas.
+INTERPOLATIONS = ("lower", "higher", "nearest", "midpoint", "linear")
+# tail_risk selects the tail with a heap while it needs at most
+# 1/TAIL_SELECT_DIVISOR of the returns; beyond that one sort is faster.
+TAIL_SELECT_DIVISOR = 8
+
+PERIOD_MAP: Dict[str, int] = {
+    "3M": 63,
+    "6M": 126,
+    "1Y": 252,
+    "3Y": 756,
+    "5Y": 1260,
+}
+
+# Relative size below which a variance from running sums is treated as zero.
+VARIANCE_EPS = 1e-12
+
+# Bytes read per step when scanning a CSV backwards from its end.
+TAIL_BLOCK_SIZE = 64 * 1024
 
 
 def sharpe_ratio(returns: pd.Series, risk_free_rate: float = 0.0) -> float:
     excess = returns - risk_free_rate / 252
-    if excess.std() == 0:
+    std = excess.std()
+    if std == 0:
         return 0.0
-    return (excess.mean() / excess.std()) * math.sqrt(252)
+    return (excess.mean() / std) * math.sqrt(252)
 
 
 def sortino_ratio(returns: pd.Series, risk_free_rate: float = 0.0) -> float:
     downside = returns[returns < 0]
-    if downside.std() == 0:
+    downside_std = downside.std()
+    if downside_std == 0:
         return 0.0
     excess = returns - risk_free_rate / 252
-    return (excess.mean() / downside.std()) * math.sqrt(252)
+    return (excess.mean() / downside_std) * math.sqrt(252)
 
 
 def max_drawdown(returns: pd.Series) -> float:
-    cumulative = (1 + returns).cumprod()
-    peak = cumulative.cummax()
-    drawdown = (cumulative - peak) / peak
-    return drawdown.min()
+    cumulative = 1.0
+    peak = -math.inf
+    worst = 0.0
+    for r in returns:
+        cumulative *= 1 + r
+        if cumulative > peak:
+            peak = cumulative
+        else:
+            worst = min(worst, (cumulative - peak) / peak)
+    return worst
+
+
+def value_at_risk(returns: pd.Series, confidence: float = 0.95, interpolation: str = "lower") -> float:
+    return returns.quantile(1 - confidence, interpolation=interpolation)
+
+
+def expected_shortfall(returns: pd.Series, confidence: float = 0.95, interpolation: str = "lower") -> float:
+    """Mean of the returns at or below the VaR for ``confidence`` (CVaR)."""
+    return tail_risk(returns, (confidence,), interpolation)[confidence]["cvar"]
+
+
+def _order_quantile(ordered: Sequence[float], n: int, q: float, interpolation: str) -> float:
+    """Quantile ``q`` of ``n`` values whose smallest ones are ``ordered``, like pandas."""
+    pos = (n - 1) * q
+    lo = int(pos)
+    fraction = pos - lo
+    lower = ordered[lo]
+    higher = ordered[min(lo + 1, n - 1)]
+    if fraction == 0 or interpolation == "lower":
+        return lower
+    if interpolation == "higher":
+        return higher
+    if interpolation == "nearest":
+        return higher if fraction > 0.5 or (fraction == 0.5 and lo % 2) else lower
+    if interpolation == "midpoint":
+        return (lower + higher) / 2
+    return lower + (higher - lower) * fraction
+
 
+def tail_risk(
+    returns: pd.Series,
+    confidences: Sequence[float] = TAIL_CONFIDENCES,
+    interpolation: str = "lower",
+) -> Dict[float, Dict[str, float]]:
+    """Return ``{confidence: {"var": ..., "cvar": ...}}`` for every level.
 
-def value_at_risk(returns: pd.Series, confidence: float = 0.95) -> float:
-    return returns.quantile(1 - confidence)
+    The smallest returns up to the least extreme VaR are ordered once, by
+    ``heapq.nsmallest`` while they are at most ``1 / TAIL_SELECT_DIVISOR``
+    of the series and by one full sort otherwise. Every VaR is read from
+    that array and every CVaR from its prefix sums.
+    """
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(f"Unknown interpolation: {interpolation}")
+    if not len(returns):
+        return {c: {"var": 0.0, "cvar": 0.0} for c in confidences}
+    values = list(returns)
+    n = len(values)
+    levels = list(confidences)
+    # Order statistics up to the upper neighbour of the highest quantile position.
+    needed = max(min(int((n - 1) * (1 - c)) + 1, n - 1) for c in levels) + 1
+    ordered = heapq.nsmallest(needed, values) if needed * TAIL_SELECT_DIVISOR <= n else sorted(values)
+    var_values = [_order_quantile(ordered, n, 1 - c, interpolation) for c in levels]
+    worst_var = max(var_values)
+    if len(ordered) < n and ordered[-1] <= worst_var:
+        # Returns tied with the VaR may lie past the selected ones.
+        ordered = sorted(values)
+    prefix = list(accumulate(ordered[: bisect_right(ordered, worst_var)]))
+    result = {}
+    for confidence, var in zip(levels, var_values):
+        count = bisect_right(ordered, var)
+        result[confidence] = {"var": var, "cvar": prefix[count - 1] / count if count else var}
+    return result
 
 
 def calculate_metrics(returns: pd.Series, risk_free_rate: float = 0.0) -> Dict[str, float]:
+    tail = tail_risk(returns, (0.95,))[0.95]
     return {
         "sharpe": sharpe_ratio(returns, risk_free_rate),
         "sortino": sortino_ratio(returns, risk_free_rate),
         "max_drawdown": max_drawdown(returns),
-        "var": value_at_risk(returns),
+        "var": tail["var"],
+        "cvar": tail["cvar"],
     }
 
 
-def load_returns(csv_path: str, days: int) -> pd.Series:
-    df = pd.read_csv(csv_path, parse_dates=[0])
-    df = df.sort_values(df.columns[0])
-    returns = df[df.columns[1]].astype(float)
-    if len(returns) > days:
-        returns = returns.iloc[-days:]
-    return returns
+def std_from_sums(count: int, total: float, squares: float) -> float:
+    """Population std from (shifted) running sums, with round-off clamped to 0."""
+    if count == 0:
+        return 0.0
+    mean = total / count
+    variance = squares / count - mean * mean
+    if variance <= VARIANCE_EPS * (squares / count):
+        return 0.0
+    return math.sqrt(variance)
+
+
+def calculate_period_metrics(
+    returns: pd.Series, periods: Mapping[str, int] = PERIOD_MAP, risk_free_rate: float = 0.0
+) -> Dict[str, Dict[str, float]]:
+    """Return ``calculate_metrics`` for the trailing ``days`` of every period.
+
+    The periods are suffixes of one series, so a single backward sweep
+    accumulates the sums for Sharpe and Sortino and the worst drawdown of
+    every suffix; only the VaR selection runs once per period.
+    """
+    values = list(returns)
+    n = len(values)
+    by_start: Dict[int, List[str]] = {}
+    for name, days in periods.items():
+        by_start.setdefault(max(n - days, 0), []).append(name)
+
+    wealth = list(accumulate((1 + r for r in values), mul))
+    daily_rf = risk_free_rate / 252
+    shift = values[-1] if values else 0.0
+    total = squares = 0.0
+    down_count = 0
+    down_total = down_squares = 0.0
+    trough = math.inf
+    worst = 1.0
+    result: Dict[str, Dict[str, float]] = {}
+    for start in range(n - 1, -1, -1):
+        r = values[start]
+        d = r - shift
+        total += d
+        squares += d * d
+        if r < 0:
+            down_count += 1
+            down_total += r
+            down_squares += r * r
+        # Prepending a day: its own drawdown is 0, the days after it fall to
+        # at worst the lowest later wealth relative to it.
+        w = wealth[start]
+        worst = min(worst, trough / w)
+        trough = min(trough, w)
+        names = by_start.get(start)
+        if not names:
+            continue
+        count = n - start
+        excess_mean = shift + total / count - daily_rf
+        std = std_from_sums(count, total, squares)
+        down_std = std_from_sums(down_count, down_total, down_squares)
+        tail = tail_risk(returns.iloc[start:], (0.95,))[0.95]
+        metrics = {
+            "sharpe": excess_mean / std * math.sqrt(252) if std else 0.0,
+            "sortino": excess_mean / down_std * math.sqrt(252) if down_std else 0.0,
+            "max_drawdown": worst - 1.0,
+            "var": tail["var"],
+            "cvar": tail["cvar"],
+        }
+        for name in names:
+            result[name] = dict(metrics)
+
+    empty = {"sharpe": 0.0, "sortino": 0.0, "max_drawdown": 0.0, "var": 0.0, "cvar": 0.0}
+    return {name: result.get(name, dict(empty)) for name in periods}
+
+
+def _parse_date(text: str) -> Any:
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _parse_return(text: str) -> float:
+    text = text.strip()
+    return float(text) if text else math.nan
+
+
+def _parse_rows(lines: Iterable[str]) -> List[Tuple[Any, float]]:
+    return [(_parse_date(row[0]), _parse_return(row[1])) for row in csv.reader(lines) if row]
+
+
+def _tail_lines(fh: BinaryIO, body_start: int, count: int) -> List[str]:
+    """Return up to ``count`` trailing non-empty lines after ``body_start``."""
+    end = fh.seek(0, os.SEEK_END)
+    pos = end
+    blocks: List[bytes] = []
+    newlines = 0
+    # One more newline than lines wanted, so the oldest kept line is complete.
+    while pos > body_start and newlines <= count:
+        step = min(TAIL_BLOCK_SIZE, pos - body_start)
+        pos -= step
+        fh.seek(pos)
+        block = fh.read(step)
+        newlines += block.count(b"\n")
+        blocks.append(block)
+    data = b"".join(reversed(blocks))
+    if pos > body_start:
+        # The first line is partial and may start inside a multi-byte character.
+        data = data[data.index(b"\n") + 1 :]
+    lines = [line for line in data.decode("utf-8").splitlines() if line.strip()]
+    return lines[-count:]
+
+
+def load_returns(csv_path: str, days: int, assume_sorted: bool = False) -> pd.Series:
+    """Return the last ``days`` returns of a ``date,return`` CSV in date order.
+
+    The first row is a header. By default the whole file is parsed and
+    sorted by date. With ``assume_sorted`` the caller guarantees the file is
+    in ascending date order and only its last ``days + 1`` rows are read, by
+    seeking backwards from the end. Rows before the tail are not checked, so
+    a file that is out of order in the middle gives wrong results in that
+    mode; the whole file is still read if the tail itself is out of order or
+    starts before the first data row. Dates in ISO format are compared as
+    datetimes, anything else as text.
+    """
+    if assume_sorted and days > 0:
+        with open(csv_path, "rb") as fh:
+            fh.readline()
+            body_start = fh.tell()
+            first = _parse_rows([fh.readline().decode("utf-8")])
+            if not first:
+                return pd.Series([])
+            tail = _parse_rows(_tail_lines(fh, body_start, days + 1))
+            dates = [d for d, _ in tail]
+            if first[0][0] <= dates[0] and all(a <= b for a, b in zip(dates, dates[1:])):
+                return pd.Series(r for _, r in tail[-days:])
+
+    with open(csv_path, newline="", encoding="utf-8") as fh:
+        next(fh, None)
+        rows = _parse_rows(fh)
+    rows.sort(key=lambda row: row[0])
+    if days > 0:
+        rows = rows[-days:]
+    return pd.Series(r for _, r in rows)
+
+
+def default_cache_path(db_path: str) -> str:
+    """Cache file for ``db_path`` under the user cache directory."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    digest = hashlib.sha1(os.path.abspath(db_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(base, "dragonshield", f"risk_returns-{digest}.json")
+
+
+def _read_cache(cache_path: str | None) -> Dict[str, Any] | None:
+    if not cache_path or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(cache_path: str, cache: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    tmp = f"{cache_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(cache, fh)
+    os.replace(tmp, cache_path)
+
+
+def _history_key(conn: sqlite3.Connection, last_date: str) -> List[Any]:
+    """Row count up to ``last_date`` and the NAV stored on it."""
+    row = conn.execute(
+        """SELECT COUNT(*), (SELECT total_value_chf FROM PortfolioValueHistory WHERE value_date = ?)
+             FROM PortfolioValueHistory WHERE value_date <= ?""",
+        (last_date, last_date),
+    ).fetchone()
+    return list(row)
+
+
+def load_history_returns(conn: sqlite3.Connection, days: int, cache_path: str | None = None) -> pd.Series:
+    """Return the last ``days`` daily returns of ``PortfolioValueHistory``.
+
+    Returns are ``total_value_chf`` changes between consecutive value dates,
+    taken from the last NAVs of the history (enough for the longest
+    ``PERIOD_MAP`` period), so the table is never scanned in full. With
+    ``cache_path`` the last value date, its NAV, the row count up to that
+    date and the trailing returns are kept in a JSON file; later calls only
+    read and append the rows after the cached date. A backfilled or deleted
+    older date changes the row count and a rewritten last NAV no longer
+    matches, and either rebuilds the cache from the tail of the history.
+    NAVs rewritten in place on older dates are not detected; delete the
+    cache file after such a change.
+    """
+    window = max(days, max(PERIOD_MAP.values()))
+    cache = _read_cache(cache_path)
+    if cache is not None and cache.get("window", 0) >= window:
+        if _history_key(conn, cache["last_date"]) != [cache.get("row_count"), cache.get("last_nav")]:
+            cache = None
+    else:
+        cache = None
+
+    row_count: int | None
+    if cache is not None:
+        returns: List[float] = cache["returns"]
+        last_date, last_nav = cache["last_date"], cache["last_nav"]
+        rows = conn.execute(
+            """SELECT value_date, total_value_chf FROM PortfolioValueHistory
+               WHERE value_date > ? ORDER BY value_date""",
+            (last_date,),
+        ).fetchall()
+        row_count = cache["row_count"] + len(rows)
+    else:
+        returns, last_date, last_nav, row_count = [], None, None, None
+        rows = conn.execute(
+            """SELECT value_date, total_value_chf FROM (
+                   SELECT value_date, total_value_chf FROM PortfolioValueHistory
+                    WHERE total_value_chf IS NOT NULL ORDER BY value_date DESC LIMIT ?
+               ) ORDER BY value_date""",
+            (window + 1,),
+        ).fetchall()
+
+    for value_date, nav in rows:
+        if nav is None:
+            continue
+        if last_nav:
+            returns.append(nav / last_nav - 1)
+        last_date, last_nav = value_date, nav
+    del returns[:-window]
+
+    if cache_path and last_date is not None:
+        if row_count is None:
+            row_count = _history_key(conn, last_date)[0]
+        _write_cache(
+            cache_path,
+            {
+                "window": window,
+                "last_date": last_date,
+                "last_nav": last_nav,
+                "row_count": row_count,
+                "returns": returns,
+            },
+        )
+    return pd.Series(returns[-days:] if days > 0 else returns)
 
 
 def main(argv=None) -> int:
     parser = argparse.ArgumentParser(description="Compute risk metrics")
-    parser.add_argument("--csv", required=True, help="CSV file with date and return columns")
-    parser.add_argument("--period", default="1Y", choices=["3M", "6M", "1Y", "3Y", "5Y"], help="Lookback period")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV file with date and return columns")
+    source.add_argument(
+        "--db", nargs="?", const=DB_PATH, help="Derive returns from PortfolioValueHistory in this database"
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="Keep the --db returns in a cache file under the user cache directory"
+    )
+    parser.add_argument("--period", default="1Y", choices=list(PERIOD_MAP), help="Lookback period")
+    parser.add_argument(
+        "--all-periods", action="store_true", help="Compute every lookback period into one JSON object"
+    )
     parser.add_argument("--risk-free", type=float, default=0.0, help="Annual risk free rate")
+    parser.add_argument(
+        "--assume-sorted", action="store_true", help="CSV is sorted by date; read only its last rows"
+    )
     args = parser.parse_args(argv)
 
-    period_map = {
-        "3M": 63,
-        "6M": 126,
-        "1Y": 252,
-        "3Y": 756,
-        "5Y": 1260,
-    }
-    returns = load_returns(args.csv, period_map[args.period])
+    days = max(PERIOD_MAP.values()) if args.all_periods else PERIOD_MAP[args.period]
+    if args.db:
+        conn = sqlite3.connect(args.db)
+        try:
+            cache_path = default_cache_path(args.db) if args.cache else None
+            returns = load_history_returns(conn, days, cache_path)
+        finally:
+            conn.close()
+    else:
+        returns = load_returns(args.csv, days, args.assume_sorted)
+
+    if args.all_periods:
+        print(json.dumps(calculate_period_metrics(returns, PERIOD_MAP, args.risk_free)))
+        return 0
+
     metrics = calculate_metrics(returns, args.risk_free)
     print(json.dumps(metrics))
     return 0
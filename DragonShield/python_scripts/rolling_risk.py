@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Rolling Sharpe, Sortino, max drawdown, VaR and CVaR in a single sweep.
+
+Each window gives the same numbers as ``risk_metrics.calculate_metrics`` on
+that slice, but the whole series is processed in one pass:
+
+* Sharpe and Sortino come from running sums and sums of squares (of all
+  returns and of the negative ones), updated as days enter and leave.
+* Max drawdown uses a queue built from two stacks whose entries carry a
+  ``(max wealth, min wealth, worst ratio)`` aggregate, so the drawdown of
+  the current window is combined from two aggregates in O(1).
+* VaR reads the quantile from a sorted copy of the window kept up to date
+  with ``bisect``; CVaR averages the sorted returns at or below it, which
+  only touches the tail.
+"""
+
+import argparse
+import json
+import math
+import sys
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from risk_metrics import load_returns, std_from_sums
+
+# (max wealth, min wealth, min over s <= t of wealth[t] / wealth[s])
+_Segment = Tuple[float, float, float]
+
+
+def _combine(left: _Segment, right: _Segment) -> _Segment:
+    return (
+        max(left[0], right[0]),
+        min(left[1], right[1]),
+        min(left[2], right[2], right[1] / left[0]),
+    )
+
+
+class _DrawdownQueue:
+    """FIFO of wealth levels answering the window's max drawdown in O(1)."""
+
+    def __init__(self) -> None:
+        self._front: List[_Segment] = []
+        self._back: List[float] = []
+        self._back_total: Optional[_Segment] = None
+
+    def push(self, wealth: float) -> None:
+        segment = (wealth, wealth, 1.0)
+        self._back.append(wealth)
+        self._back_total = segment if self._back_total is None else _combine(self._back_total, segment)
+
+    def pop(self) -> None:
+        if not self._front:
+            suffix: Optional[_Segment] = None
+            while self._back:
+                wealth = self._back.pop()
+                segment = (wealth, wealth, 1.0)
+                suffix = segment if suffix is None else _combine(segment, suffix)
+                self._front.append(suffix)
+            self._back_total = None
+        self._front.pop()
+
+    def max_drawdown(self) -> float:
+        if not self._front:
+            total = self._back_total
+        elif self._back_total is None:
+            total = self._front[-1]
+        else:
+            total = _combine(self._front[-1], self._back_total)
+        return total[2] - 1.0 if total is not None else 0.0
+
+
+def rolling_metrics(
+    returns: Sequence[float],
+    window: int,
+    risk_free_rate: float = 0.0,
+    confidence: float = 0.95,
+) -> List[Dict[str, float]]:
+    """Return the risk metrics of every full ``window`` of ``returns``.
+
+    Entry ``i`` describes ``returns[i : i + window]`` and has the keys of
+    ``calculate_metrics`` plus ``end``, the index of the window's last day.
+    """
+    if window <= 0:
+        raise ValueError("window must be positive")
+    values = [float(r) for r in returns]
+    if len(values) < window:
+        return []
+
+    daily_rf = risk_free_rate / 252
+    shift = values[0]
+    var_index = int((window - 1) * (1 - confidence))
+    # Running sums of (r - shift) keep the variance well conditioned.
+    total = squares = 0.0
+    down_count = 0
+    down_total = down_squares = 0.0
+    ordered: List[float] = []
+    drawdowns = _DrawdownQueue()
+    wealth = [1.0]
+    for r in values:
+        wealth.append(wealth[-1] * (1 + r))
+
+    results: List[Dict[str, float]] = []
+    for end, r in enumerate(values):
+        d = r - shift
+        total += d
+        squares += d * d
+        if r < 0:
+            down_count += 1
+            down_total += r
+            down_squares += r * r
+        insort(ordered, r)
+        drawdowns.push(wealth[end + 1])
+
+        start = end - window
+        if start >= 0:
+            old = values[start]
+            d = old - shift
+            total -= d
+            squares -= d * d
+            if old < 0:
+                down_count -= 1
+                down_total -= old
+                down_squares -= old * old
+            del ordered[bisect_left(ordered, old)]
+            drawdowns.pop()
+        if end < window - 1:
+            continue
+
+        if down_count == 0:
+            down_total = down_squares = 0.0
+        excess_mean = shift + total / window - daily_rf
+        std = std_from_sums(window, total, squares)
+        down_std = std_from_sums(down_count, down_total, down_squares)
+        var = ordered[var_index]
+        tail_count = bisect_right(ordered, var, var_index)
+        results.append(
+            {
+                "end": end,
+                "sharpe": excess_mean / std * math.sqrt(252) if std else 0.0,
+                "sortino": excess_mean / down_std * math.sqrt(252) if down_std else 0.0,
+                "max_drawdown": drawdowns.max_drawdown(),
+                "var": var,
+                "cvar": sum(ordered[:tail_count]) / tail_count,
+            }
+        )
+    return results
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compute rolling risk metrics")
+    parser.add_argument("--csv", required=True, help="CSV file with date and return columns")
+    parser.add_argument("--window", type=int, default=252, help="Window length in trading days")
+    parser.add_argument("--days", type=int, help="Only use the last N days (default: all)")
+    parser.add_argument("--risk-free", type=float, default=0.0, help="Annual risk free rate")
+    parser.add_argument("--confidence", type=float, default=0.95, help="VaR confidence level")
+    parser.add_argument("--assume-sorted", action="store_true", help="CSV is sorted by date; read only its last rows")
+    args = parser.parse_args(argv)
+
+    returns = load_returns(args.csv, args.days or sys.maxsize, args.assume_sorted)
+    print(json.dumps(rolling_metrics(returns, args.window, args.risk_free, args.confidence)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import Iterable, List, Optional
+
+from .top_k import top_k
 
 @dataclass
 class Account:
@@ -8,11 +10,13 @@ class Account:
     earliest_instrument_last_updated_at: datetime | None
 
 
-def top_stale_accounts(accounts: List[Account]) -> List[Account]:
+def top_stale_accounts(accounts: Iterable[Account], limit: Optional[int] = None) -> List[Account]:
     def sort_key(a: Account):
         return (
             a.earliest_instrument_last_updated_at or datetime.max,
             a.name.lower(),
         )
 
-    return sorted(accounts, key=sort_key)
+    if limit is None:
+        return sorted(accounts, key=sort_key)
+    return top_k(accounts, limit, key=sort_key, reverse=False)
@@ -0,0 +1,104 @@
+"""Bounded-memory streaming selection of the top ``k`` items."""
+
+import heapq
+from typing import Any, Callable, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Descending:
+    """Key wrapper inverting the ordering so a min-heap keeps the smallest keys."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: Any):
+        self.key = key
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.key < self.key
+
+    def __gt__(self, other: "_Descending") -> bool:
+        return self.key < other.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.key == other.key
+
+
+class TopK(Generic[T]):
+    """Keep the ``k`` best items seen so far in a heap of size ``k``.
+
+    ``reverse=True`` keeps the largest keys, ``reverse=False`` the smallest,
+    so ``results()`` equals ``sorted(items, key=key, reverse=reverse)[:k]``:
+    among equal keys the item seen first ranks higher. Any iterable can be
+    fed, including a live ``sqlite3`` cursor; memory stays O(k) and each item
+    costs O(log k).
+
+    If ``rank_for`` is given, ``rank`` reports the 1-based position that key
+    would take among all items seen, counting only items whose key ranks
+    strictly ahead of it. This works even when it falls outside the top ``k``.
+    """
+
+    def __init__(
+        self,
+        k: int,
+        key: Optional[Callable[[T], Any]] = None,
+        reverse: bool = True,
+        rank_for: Any = None,
+    ):
+        self.k = k
+        self.key = key
+        self.reverse = reverse
+        self.rank_for = rank_for
+        self.count = 0
+        self._ahead = 0
+        self._heap: List[Tuple[Any, int, T]] = []
+
+    def push(self, item: T) -> None:
+        """Offer one item to the selection."""
+        seq = self.count
+        self.count += 1
+        key = item if self.key is None else self.key(item)
+        if self.rank_for is not None:
+            if (key > self.rank_for) if self.reverse else (key < self.rank_for):
+                self._ahead += 1
+        if self.k <= 0:
+            return
+        entry = (key if self.reverse else _Descending(key), -seq, item)
+        heap = self._heap
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    def extend(self, items: Iterable[T]) -> "TopK[T]":
+        """Offer every item of ``items``; returns ``self`` for chaining."""
+        for item in items:
+            self.push(item)
+        return self
+
+    @property
+    def rank(self) -> Optional[int]:
+        """1-based rank of ``rank_for`` among the items seen, or ``None``."""
+        if self.rank_for is None:
+            return None
+        return self._ahead + 1
+
+    def results(self) -> List[T]:
+        """Return the retained items, best first."""
+        return [item for _, _, item in sorted(self._heap, reverse=True)]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+def top_k(
+    items: Iterable[T],
+    k: int,
+    key: Optional[Callable[[T], Any]] = None,
+    reverse: bool = True,
+) -> List[T]:
+    """Return ``sorted(items, key=key, reverse=reverse)[:k]`` without materialising ``items``."""
+    return TopK(k, key=key, reverse=reverse).extend(items).results()
+
+
+__all__ = ["TopK", "top_k"]
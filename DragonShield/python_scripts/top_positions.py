@@ -1,19 +1,28 @@
 """Utility to compute top positions by CHF value."""
 
-from typing import Iterable, Mapping, List, Dict
+from operator import itemgetter
+from typing import Iterable, Mapping, List, Dict, Union
+
+from .position_frame import PositionFrame
+from .top_k import TopK
 
 
 def top_positions_by_chf(
-    positions: Iterable[Mapping], rates: Mapping[str, float], top_n: int = 10
+    positions: Union[Iterable[Mapping], PositionFrame],
+    rates: Mapping[str, float],
+    top_n: int = 10,
 ) -> List[Dict[str, float]]:
     """Return ``top_n`` positions sorted by value in CHF descending.
 
     Each position mapping must provide ``quantity``, ``current_price``, ``currency``
-    and ``instrument`` keys. ``rates`` maps currency codes to ``rate_to_chf``. If
+    and ``instrument`` keys. ``positions`` may also be a :class:`PositionFrame`.
+    ``rates`` maps currency codes to ``rate_to_chf``. If
     a non-CHF currency is missing from ``rates`` the position is ignored.
     """
+    if isinstance(positions, PositionFrame):
+        return _top_from_frame(positions, rates, top_n)
 
-    results: List[Dict[str, float]] = []
+    best = TopK(top_n, key=itemgetter(0))
 
     for pos in positions:
         qty = pos.get("quantity", 0)
@@ -30,16 +39,33 @@ def top_positions_by_chf(
                 continue
             value *= rate
 
-        results.append(
-            {
-                "instrument": pos.get("instrument", ""),
-                "value_chf": value,
-                "currency": currency,
-            }
-        )
+        best.push((value, pos.get("instrument", ""), currency))
+
+    return [
+        {"instrument": instrument, "value_chf": value, "currency": currency}
+        for value, instrument, currency in best.results()
+    ]
+
+
+def _top_from_frame(frame: PositionFrame, rates: Mapping[str, float], top_n: int) -> List[Dict[str, float]]:
+    rate_by_code = frame.rate_table(rates)
+
+    def values():
+        for idx, (qty, price, code) in enumerate(zip(frame.quantity, frame.price, frame.currency_codes)):
+            value = qty * price * rate_by_code[code]
+            # NaN marks a missing price or an unknown rate
+            if value == value:
+                yield value, idx
 
-    results.sort(key=lambda r: r["value_chf"], reverse=True)
-    return results[:top_n]
+    top = TopK(top_n, key=itemgetter(0)).extend(values()).results()
+    return [
+        {
+            "instrument": frame.instruments[idx],
+            "value_chf": value,
+            "currency": frame.currencies[frame.currency_codes[idx]],
+        }
+        for value, idx in top
+    ]
 
 
 __all__ = ["top_positions_by_chf"]
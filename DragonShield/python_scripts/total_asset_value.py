@@ -1,17 +1,46 @@
 """Utility to calculate total asset value in CHF."""
 
-from typing import Iterable, Mapping
+from typing import Iterable, Mapping, Union
 
+from .money_sum import summation_factory
+from .position_frame import PositionFrame
 
-def calculate_total_asset_value(positions: Iterable[Mapping], rates: Mapping[str, float]) -> float:
+
+def calculate_total_asset_value(
+    positions: Union[Iterable[Mapping], PositionFrame],
+    rates: Mapping[str, float],
+    summation: str = "float",
+) -> float:
     """Compute sum of position market values converted to CHF.
 
     Each position mapping must contain ``quantity``, ``current_price`` and ``currency`` keys.
+    ``positions`` may also be a :class:`PositionFrame`.
     ``rates`` maps a currency code to its rate_to_chf.
     ``current_price`` may be ``None`` which results in that position contributing 0.
     Raises ``KeyError`` if a non-CHF currency is missing from ``rates``.
+    ``summation`` selects how values are added up (see ``money_sum``).
     """
-    total = 0.0
+    if isinstance(positions, PositionFrame):
+        return _total_from_frame(positions, rates, summation)
+
+    if summation == "float":
+        # Plain float addition, without the accumulator call per position.
+        total = 0.0
+        for pos in positions:
+            qty = pos.get("quantity", 0)
+            price = pos.get("current_price")
+            if price is None:
+                continue
+            value = qty * price
+            currency = str(pos.get("currency", "CHF")).upper()
+            if currency != "CHF":
+                rate = rates[currency]
+                value *= rate
+            total += value
+        return total
+
+    acc = summation_factory(summation)()
+    add = acc.add
     for pos in positions:
         qty = pos.get("quantity", 0)
         price = pos.get("current_price")
@@ -22,7 +51,19 @@ def calculate_total_asset_value(positions: Iterable[Mapping], rates: Mapping[str
         if currency != "CHF":
             rate = rates[currency]
             value *= rate
-        total += value
-    return total
+        add(value)
+    return acc.value
+
+
+def _total_from_frame(frame: PositionFrame, rates: Mapping[str, float], summation: str) -> float:
+    chf, priced = frame.chf_totals(rates, summation)
+    total = summation_factory(summation)()
+    for currency, value, has_price in zip(frame.currencies, chf, priced):
+        if not has_price:
+            continue
+        if value != value:
+            raise KeyError(currency)
+        total.add(value)
+    return total.value
 
 __all__ = ["calculate_total_asset_value"]
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Simulated VaR and expected shortfall from historical daily returns.
+
+Paths of ``horizon`` days are drawn by circular block bootstrap of the
+history, or from a normal or Student-t distribution fitted to its mean and
+standard deviation. Paths are generated in chunks of ``chunk_size``; each
+chunk has its own generator seeded with ``"{seed}:{chunk}"``, so results do
+not depend on the number of workers. A chunk only returns its worst
+outcomes (as many as the VaR needs) and its own VaR/CVaR estimate, so memory
+is bounded by the tail, not by the number of paths. The spread of the
+per-chunk estimates gives batch-means confidence intervals.
+"""
+
+import argparse
+import heapq
+import json
+import math
+import random
+import sqlite3
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import islice
+from statistics import NormalDist, fmean, stdev
+from typing import Iterator, List, Sequence, Tuple
+
+from risk_metrics import DB_PATH, PERIOD_MAP, default_cache_path, load_history_returns, load_returns
+
+METHODS = ("bootstrap", "normal", "student_t")
+
+
+@dataclass
+class SimulationResult:
+    """VaR/CVaR of simulated ``horizon``-day returns."""
+
+    method: str
+    paths: int
+    horizon: int
+    confidence: float
+    var: float
+    cvar: float
+    var_ci: Tuple[float, float]
+    cvar_ci: Tuple[float, float]
+
+
+@dataclass(frozen=True)
+class _Model:
+    method: str
+    history: Tuple[float, ...]
+    horizon: int
+    block_size: int
+    df: float
+    mean: float
+    std: float
+    seed: int
+
+
+def _draw(model: _Model, rng: random.Random) -> float:
+    """Return the compounded return of one simulated path."""
+    growth = 1.0
+    if model.method == "bootstrap":
+        history = model.history
+        n = len(history)
+        day = 0
+        while day < model.horizon:
+            start = rng.randrange(n)
+            for offset in range(min(model.block_size, model.horizon - day)):
+                growth *= 1 + history[(start + offset) % n]
+            day += model.block_size
+        return growth - 1
+    if model.method == "normal":
+        for _ in range(model.horizon):
+            growth *= 1 + rng.gauss(model.mean, model.std)
+        return growth - 1
+    # Student-t scaled to the historical variance.
+    scale = model.std * math.sqrt((model.df - 2) / model.df)
+    for _ in range(model.horizon):
+        t = rng.gauss(0.0, 1.0) / math.sqrt(rng.gammavariate(model.df / 2, 2) / model.df)
+        growth *= 1 + model.mean + scale * t
+    return growth - 1
+
+
+def _tail_estimates(tail: Sequence[float], count: int, confidence: float) -> Tuple[float, float]:
+    """VaR and CVaR from the sorted worst outcomes of ``count`` paths."""
+    idx = int((count - 1) * (1 - confidence))
+    var = tail[idx]
+    below = bisect_right(tail, var)
+    return var, math.fsum(tail[:below]) / below
+
+
+def _simulate_chunk(
+    model: _Model, chunk: int, count: int, keep: int, confidence: float
+) -> Tuple[List[float], float, float]:
+    rng = random.Random(f"{model.seed}:{chunk}")
+    outcomes = [_draw(model, rng) for _ in range(count)]
+    worst = heapq.nsmallest(max(keep, int((count - 1) * (1 - confidence)) + 1), outcomes)
+    var, cvar = _tail_estimates(worst, count, confidence)
+    return worst[:keep], var, cvar
+
+
+def simulate_var(
+    returns: Sequence[float],
+    paths: int = 100_000,
+    horizon: int = 1,
+    method: str = "bootstrap",
+    confidence: float = 0.95,
+    block_size: int = 5,
+    df: float = 5.0,
+    seed: int = 0,
+    chunk_size: int = 10_000,
+    workers: int = 1,
+    ci_level: float = 0.95,
+) -> SimulationResult:
+    """Simulate ``paths`` outcomes and return VaR/CVaR with confidence intervals.
+
+    ``paths`` and ``chunk_size`` must be positive and ``confidence`` and
+    ``ci_level`` lie strictly between 0 and 1, otherwise ``ValueError`` is
+    raised. ``block_size`` applies to the bootstrap, ``df`` (> 2) to Student-t. The
+    point estimates use the worst outcomes across all paths; the intervals
+    are ``estimate ± z * stdev / sqrt(chunks)`` over the per-chunk estimates
+    and collapse to the estimate when there is only one chunk.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    if paths < 1:
+        raise ValueError("paths must be positive")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    if not 0.0 < confidence < 1.0:
+        raise ValueError("confidence must be between 0 and 1")
+    if not 0.0 < ci_level < 1.0:
+        raise ValueError("ci_level must be between 0 and 1")
+    history = tuple(float(r) for r in returns)
+    if not history:
+        raise ValueError("No returns to simulate from")
+    if method == "student_t" and df <= 2:
+        raise ValueError("Student-t needs df > 2")
+    mean = fmean(history)
+    std = math.sqrt(fmean((r - mean) ** 2 for r in history))
+    model = _Model(method, history, max(1, horizon), max(1, block_size), df, mean, std, seed)
+
+    keep = int((paths - 1) * (1 - confidence)) + 1
+    worst: List[float] = []
+    var_estimates: List[float] = []
+    cvar_estimates: List[float] = []
+    for chunk_worst, var, cvar in _run_chunks(model, paths, chunk_size, keep, confidence, workers):
+        worst = list(islice(heapq.merge(worst, chunk_worst), keep))
+        var_estimates.append(var)
+        cvar_estimates.append(cvar)
+
+    var, cvar = _tail_estimates(worst, paths, confidence)
+    z = NormalDist().inv_cdf(0.5 + ci_level / 2)
+    return SimulationResult(
+        method=method,
+        paths=paths,
+        horizon=model.horizon,
+        confidence=confidence,
+        var=var,
+        cvar=cvar,
+        var_ci=_interval(var, var_estimates, z),
+        cvar_ci=_interval(cvar, cvar_estimates, z),
+    )
+
+
+def _interval(estimate: float, batches: Sequence[float], z: float) -> Tuple[float, float]:
+    if len(batches) < 2:
+        return estimate, estimate
+    half = z * stdev(batches) / math.sqrt(len(batches))
+    return estimate - half, estimate + half
+
+
+def _run_chunks(
+    model: _Model, paths: int, chunk_size: int, keep: int, confidence: float, workers: int
+) -> Iterator[Tuple[List[float], float, float]]:
+    sizes = [(i, min(chunk_size, paths - start)) for i, start in enumerate(range(0, paths, chunk_size))]
+    if workers <= 1:
+        for chunk, count in sizes:
+            yield _simulate_chunk(model, chunk, count, keep, confidence)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for chunk, count in sizes:
+            pending.append(pool.submit(_simulate_chunk, model, chunk, count, keep, confidence))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate VaR and expected shortfall")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV file with date and return columns")
+    source.add_argument("--db", nargs="?", const=DB_PATH, help="Derive returns from PortfolioValueHistory")
+    parser.add_argument("--period", default="5Y", choices=list(PERIOD_MAP), help="History used for the model")
+    parser.add_argument("--method", default="bootstrap", choices=METHODS, help="Path generator")
+    parser.add_argument("--paths", type=int, default=100_000, help="Number of simulated paths")
+    parser.add_argument("--horizon", type=int, default=1, help="Path length in trading days")
+    parser.add_argument("--confidence", type=float, default=0.95, help="VaR confidence level")
+    parser.add_argument("--block-size", type=int, default=5, help="Bootstrap block length in days")
+    parser.add_argument("--df", type=float, default=5.0, help="Student-t degrees of freedom")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Paths per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--assume-sorted", action="store_true", help="CSV is sorted by date; read only its last rows")
+    parser.add_argument("--cache", action="store_true", help="Keep the --db returns in the risk_metrics cache file")
+    args = parser.parse_args(argv)
+
+    days = PERIOD_MAP[args.period]
+    if args.csv:
+        returns = load_returns(args.csv, days, args.assume_sorted)
+    else:
+        conn = sqlite3.connect(args.db)
+        try:
+            returns = load_history_returns(conn, days, default_cache_path(args.db) if args.cache else None)
+        finally:
+            conn.close()
+
+    try:
+        result = simulate_var(
+            list(returns),
+            paths=args.paths,
+            horizon=args.horizon,
+            method=args.method,
+            confidence=args.confidence,
+            block_size=args.block_size,
+            df=args.df,
+            seed=args.seed,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(json.dumps(asdict(result)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
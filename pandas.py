@@ -1,76 +1,258 @@
-class Series(list):
-    def __init__(self, data):
-        super().__init__(float(x) for x in data)
+"""Minimal stand-in for the parts of pandas used by ``risk_metrics``.
+
+``Series`` keeps its values in a contiguous ``array('d')``. Element-wise
+operations run through ``map``/``itertools`` with ``operator`` functions,
+so the per-element work stays in C. ``mean`` and ``std`` are cached and
+the cache is dropped whenever the values change in place.
+"""
+
+import heapq
+import math
+from array import array
+from itertools import accumulate, compress, repeat
+from operator import add, ge, gt, le, lt, mul, sub, truediv
+
+INTERPOLATIONS = ("lower", "higher", "nearest", "midpoint", "linear")
+# Heap selection is used while a quantile needs at most 1/HEAP_SELECT_DIVISOR
+# of the order statistics; beyond that a full sort is faster.
+HEAP_SELECT_DIVISOR = 8
+
+
+def interpolate(lower, higher, fraction, lower_rank, interpolation):
+    """Combine the order statistics around a quantile position like pandas."""
+    if fraction == 0 or interpolation == "lower":
+        return lower
+    if interpolation == "higher":
+        return higher
+    if interpolation == "nearest":
+        if fraction > 0.5 or (fraction == 0.5 and lower_rank % 2):
+            return higher
+        return lower
+    if interpolation == "midpoint":
+        return (lower + higher) / 2
+    return lower + (higher - lower) * fraction
+
+
+class Series:
+    __slots__ = ("_data", "_mean", "_std")
+
+    def __init__(self, data=()):
+        if isinstance(data, Series):
+            data = data._data
+        self._data = array("d", data)
+        self._mean = None
+        self._std = None
+
+    @classmethod
+    def _wrap(cls, data):
+        series = cls.__new__(cls)
+        series._data = data
+        series._mean = None
+        series._std = None
+        return series
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __repr__(self):
+        return f"Series({self._data.tolist()!r})"
+
+    def __eq__(self, other):
+        if isinstance(other, Series):
+            return self._data == other._data
+        try:
+            return self._data.tolist() == list(other)
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Series._wrap(self._data[key])
+        if isinstance(key, (list, tuple, bytearray, bytes)):
+            return Series._wrap(array("d", compress(self._data, key)))
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            self._data[key] = array("d", value)
+        else:
+            self._data[key] = value
+        self._invalidate()
+
+    @property
+    def iloc(self):
+        return self
+
+    def tolist(self):
+        return self._data.tolist()
+
+    def copy(self):
+        return Series._wrap(array("d", self._data))
+
+    def astype(self, dtype):
+        if dtype is not float:
+            raise TypeError("Series only holds floats")
+        return self.copy()
+
+    def sum(self):
+        return sum(self._data)
 
     def mean(self):
-        return sum(self) / len(self) if self else 0.0
+        if self._mean is None:
+            self._mean = sum(self._data) / len(self._data) if self._data else 0.0
+        return self._mean
 
     def std(self):
-        m = self.mean()
-        return (sum((x - m) ** 2 for x in self) / len(self)) ** 0.5 if self else 0.0
+        """Population standard deviation (``ddof=0``)."""
+        if self._std is None:
+            n = len(self._data)
+            if n:
+                self._std = math.dist(self._data, repeat(self.mean(), n)) / math.sqrt(n)
+            else:
+                self._std = 0.0
+        return self._std
+
+    def min(self):
+        return min(self._data) if self._data else 0.0
+
+    def max(self):
+        return max(self._data) if self._data else 0.0
+
+    def quantile(self, q, interpolation="lower"):
+        """Return the ``q`` quantile, or a Series of them when ``q`` is a list.
+
+        A single tail level selects only the order statistics it needs with
+        ``heapq`` (O(n log k)). Levels that need more than ``n / 8`` order
+        statistics, and lists of levels, sort the series once instead.
+        ``interpolation`` is one of ``INTERPOLATIONS``.
+        """
+        if isinstance(q, (int, float)):
+            return self._quantiles([q], interpolation)[0]
+        return Series(self._quantiles(list(q), interpolation))
+
+    def _quantiles(self, qs, interpolation):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation: {interpolation}")
+        n = len(self._data)
+        if not n:
+            return [0.0] * len(qs)
+        ranks = set()
+        for q in qs:
+            lo = int((n - 1) * q)
+            ranks.update((lo, min(lo + 1, n - 1)))
+        low = [r for r in ranks if r < n // 2]
+        high = [r for r in ranks if r >= n // 2]
+        k_low = max(low) + 1 if low else 0
+        k_high = n - min(high) if high else 0
+
+        if len(qs) > 1 or (k_low + k_high) * HEAP_SELECT_DIVISOR > n:
+            ordered = sorted(self._data)
+            order_stat = ordered.__getitem__
+        else:
+            smallest = heapq.nsmallest(k_low, self._data) if low else []
+            largest = heapq.nlargest(k_high, self._data) if high else []
+
+            def order_stat(rank):
+                return smallest[rank] if rank < n // 2 else largest[n - 1 - rank]
 
-    def cumprod(self):
         out = []
-        total = 1.0
-        for x in self:
-            total *= x
-            out.append(total)
-        return Series(out)
+        for q in qs:
+            pos = (n - 1) * q
+            lo = int(pos)
+            hi = min(lo + 1, n - 1)
+            out.append(interpolate(order_stat(lo), order_stat(hi), pos - lo, lo, interpolation))
+        return out
+
+    def cumsum(self):
+        return Series._wrap(array("d", accumulate(self._data, add)))
+
+    def cumprod(self):
+        return Series._wrap(array("d", accumulate(self._data, mul)))
 
     def cummax(self):
-        out = []
-        m = float('-inf')
-        for x in self:
-            m = max(m, x)
-            out.append(m)
-        return Series(out)
-
-    def quantile(self, q):
-        data = sorted(self)
-        if not data:
-            return 0.0
-        idx = int((len(data) - 1) * q)
-        return data[idx]
+        return Series._wrap(array("d", accumulate(self._data, max)))
 
-    def min(self):
-        return min(x for x in self) if self else 0.0
+    def cummin(self):
+        return Series._wrap(array("d", accumulate(self._data, min)))
 
-    def __sub__(self, other):
+    def _binary(self, op, other):
         if isinstance(other, (int, float)):
-            return Series([x - other for x in self])
-        return Series([a - b for a, b in zip(self, other)])
+            return array("d", map(op, self._data, repeat(other)))
+        if isinstance(other, Series):
+            other = other._data
+        return array("d", map(op, self._data, other))
 
-    def __rsub__(self, other):
+    def _reflected(self, op, other):
         if isinstance(other, (int, float)):
-            return Series([other - x for x in self])
-        return Series([a - b for a, b in zip(other, self)])
+            return array("d", map(op, repeat(other), self._data))
+        return array("d", map(op, other, self._data))
+
+    def _inplace(self, op, other):
+        self._data = self._binary(op, other)
+        self._invalidate()
+        return self
+
+    def _invalidate(self):
+        self._mean = None
+        self._std = None
 
     def __add__(self, other):
-        if isinstance(other, (int, float)):
-            return Series([x + other for x in self])
-        return Series([a + b for a, b in zip(self, other)])
+        return Series._wrap(self._binary(add, other))
 
     __radd__ = __add__
 
+    def __sub__(self, other):
+        return Series._wrap(self._binary(sub, other))
+
+    def __rsub__(self, other):
+        return Series._wrap(self._reflected(sub, other))
+
     def __mul__(self, other):
-        if isinstance(other, (int, float)):
-            return Series([x * other for x in self])
-        return Series([a * b for a, b in zip(self, other)])
+        return Series._wrap(self._binary(mul, other))
+
+    __rmul__ = __mul__
 
     def __truediv__(self, other):
-        if isinstance(other, (int, float)):
-            return Series([x / other for x in self])
-        return Series([a / b for a, b in zip(self, other)])
+        return Series._wrap(self._binary(truediv, other))
+
+    def __rtruediv__(self, other):
+        return Series._wrap(self._reflected(truediv, other))
+
+    def __neg__(self):
+        return Series._wrap(array("d", map(sub, repeat(0.0), self._data)))
 
-    __rtruediv__ = __truediv__
+    def __iadd__(self, other):
+        return self._inplace(add, other)
+
+    def __isub__(self, other):
+        return self._inplace(sub, other)
+
+    def __imul__(self, other):
+        return self._inplace(mul, other)
+
+    def __itruediv__(self, other):
+        return self._inplace(truediv, other)
+
+    def _mask(self, op, value):
+        if isinstance(value, Series):
+            value = value._data
+        elif isinstance(value, (int, float)):
+            value = repeat(value)
+        return bytearray(map(op, self._data, value))
 
     def __lt__(self, value):
-        return [x < value for x in self]
+        return self._mask(lt, value)
 
-    def __getitem__(self, key):
-        if isinstance(key, list):
-            return Series([x for x, k in zip(self, key) if k])
-        result = super().__getitem__(key)
-        if isinstance(result, list):
-            return Series(result)
-        return result
+    def __le__(self, value):
+        return self._mask(le, value)
+
+    def __gt__(self, value):
+        return self._mask(gt, value)
+
+    def __ge__(self, value):
+        return self._mask(ge, value)